@@ -0,0 +1,51 @@
+"""Add ECL input fingerprint and carry-forward reference
+
+Revision ID: add_ecl_input_fingerprint
+Revises: add_portfolio_runs
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "add_ecl_input_fingerprint"
+down_revision = "add_portfolio_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "ecl_calculation", sa.Column("input_fingerprint", sa.String(length=64), nullable=True)
+    )
+    op.add_column(
+        "ecl_calculation", sa.Column("carried_forward_from", sa.String(length=50), nullable=True)
+    )
+    op.create_foreign_key(
+        "fk_ecl_calculation_carried_forward_from",
+        "ecl_calculation",
+        "ecl_calculation",
+        ["carried_forward_from"],
+        ["calculation_id"],
+    )
+    op.create_index(
+        "ix_ecl_calculation_input_fingerprint", "ecl_calculation", ["input_fingerprint"]
+    )
+
+    op.add_column(
+        "portfolio_run",
+        sa.Column("incremental", sa.Boolean(), server_default="false", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("portfolio_run", "incremental")
+
+    op.drop_index("ix_ecl_calculation_input_fingerprint", table_name="ecl_calculation")
+    op.drop_constraint(
+        "fk_ecl_calculation_carried_forward_from", "ecl_calculation", type_="foreignkey"
+    )
+    op.drop_column("ecl_calculation", "carried_forward_from")
+    op.drop_column("ecl_calculation", "input_fingerprint")
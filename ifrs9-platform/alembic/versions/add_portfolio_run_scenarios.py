@@ -0,0 +1,24 @@
+"""Add scenario set to portfolio runs
+
+Revision ID: add_portfolio_run_scenarios
+Revises: add_ecl_input_fingerprint
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "add_portfolio_run_scenarios"
+down_revision = "add_ecl_input_fingerprint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("portfolio_run", sa.Column("scenarios", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("portfolio_run", "scenarios")
@@ -0,0 +1,86 @@
+"""Add portfolio run and shard checkpoint tables
+
+Revision ID: add_portfolio_runs
+Revises: update_ccf_config
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "add_portfolio_runs"
+down_revision = "update_ccf_config"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "portfolio_run",
+        sa.Column("run_id", sa.String(length=50), nullable=False),
+        sa.Column("reporting_date", sa.Date(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("shard_by", sa.String(length=20), nullable=False),
+        sa.Column("chunk_size", sa.Integer(), nullable=False),
+        sa.Column("shards_total", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("shards_completed", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("instruments_total", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("instruments_calculated", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("total_ecl", sa.Numeric(precision=18, scale=2), nullable=True),
+        sa.Column("stage_totals", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("submitted_by", sa.String(length=50), nullable=False),
+        sa.Column("submitted_at", sa.DateTime(), server_default=sa.text("now()")),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("run_id"),
+    )
+
+    op.create_table(
+        "portfolio_run_shard",
+        sa.Column("shard_id", sa.String(length=60), nullable=False),
+        sa.Column("run_id", sa.String(length=50), nullable=False),
+        sa.Column("shard_index", sa.Integer(), nullable=False),
+        sa.Column("instrument_ids", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("chunks_total", sa.Integer(), nullable=False),
+        sa.Column("chunks_completed", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("instruments_calculated", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "total_ecl", sa.Numeric(precision=18, scale=2), server_default="0", nullable=False
+        ),
+        sa.Column("stage_totals", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()")),
+        sa.ForeignKeyConstraint(
+            ["run_id"],
+            ["portfolio_run.run_id"],
+        ),
+        sa.PrimaryKeyConstraint("shard_id"),
+    )
+    op.create_index("ix_portfolio_run_shard_run_id", "portfolio_run_shard", ["run_id"])
+
+    op.add_column(
+        "ecl_calculation", sa.Column("portfolio_run_id", sa.String(length=50), nullable=True)
+    )
+    op.create_foreign_key(
+        "fk_ecl_calculation_portfolio_run",
+        "ecl_calculation",
+        "portfolio_run",
+        ["portfolio_run_id"],
+        ["run_id"],
+    )
+    op.create_index("ix_ecl_calculation_portfolio_run_id", "ecl_calculation", ["portfolio_run_id"])
+
+
+def downgrade():
+    op.drop_index("ix_ecl_calculation_portfolio_run_id", table_name="ecl_calculation")
+    op.drop_constraint("fk_ecl_calculation_portfolio_run", "ecl_calculation", type_="foreignkey")
+    op.drop_column("ecl_calculation", "portfolio_run_id")
+
+    op.drop_index("ix_portfolio_run_shard_run_id", table_name="portfolio_run_shard")
+    op.drop_table("portfolio_run_shard")
+    op.drop_table("portfolio_run")
@@ -0,0 +1,24 @@
+"""Add frozen parameter version to portfolio runs
+
+Revision ID: add_run_parameter_version
+Revises: add_portfolio_run_scenarios
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "add_run_parameter_version"
+down_revision = "add_portfolio_run_scenarios"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("portfolio_run", sa.Column("parameter_version", sa.String(20), nullable=True))
+
+
+def downgrade():
+    op.drop_column("portfolio_run", "parameter_version")
@@ -0,0 +1,45 @@
+"""Add versioned SICR rule table
+
+Revision ID: add_sicr_rules
+Revises: add_run_parameter_version
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "add_sicr_rules"
+down_revision = "add_run_parameter_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sicr_rule",
+        sa.Column("rule_id", sa.String(length=50), nullable=False),
+        sa.Column("indicator", sa.String(length=50), nullable=False),
+        sa.Column("field", sa.String(length=50), nullable=False),
+        sa.Column("operator", sa.String(length=10), nullable=False),
+        sa.Column("threshold", sa.Numeric(precision=18, scale=6), nullable=True),
+        sa.Column("value_list", sa.JSON(), nullable=True),
+        sa.Column("priority", sa.Integer(), server_default="100", nullable=False),
+        sa.Column("is_active", sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column("effective_date", sa.Date(), nullable=False),
+        sa.Column("expiry_date", sa.Date(), nullable=True),
+        sa.Column("version", sa.String(length=20), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("created_by", sa.String(length=50), nullable=True),
+        sa.Column("approved_by", sa.String(length=50), nullable=True),
+        sa.Column("approval_date", sa.Date(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()")),
+        sa.PrimaryKeyConstraint("rule_id"),
+    )
+    op.create_index("ix_sicr_rule_effective_date", "sicr_rule", ["effective_date"])
+
+
+def downgrade():
+    op.drop_index("ix_sicr_rule_effective_date", table_name="sicr_rule")
+    op.drop_table("sicr_rule")
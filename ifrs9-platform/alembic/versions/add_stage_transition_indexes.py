@@ -0,0 +1,31 @@
+"""Add stage transition indexes for range queries and keyset pagination
+
+Revision ID: add_stage_transition_indexes
+Revises: add_sicr_rules
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "add_stage_transition_indexes"
+down_revision = "add_sicr_rules"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_stage_transition_instrument_date",
+        "stage_transition",
+        ["instrument_id", "transition_date", "transition_id"],
+    )
+    op.create_index(
+        "ix_stage_transition_date", "stage_transition", ["transition_date", "transition_id"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_stage_transition_date", table_name="stage_transition")
+    op.drop_index("ix_stage_transition_instrument_date", table_name="stage_transition")
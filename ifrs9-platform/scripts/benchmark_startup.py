@@ -0,0 +1,137 @@
+"""
+Startup Benchmark - Import time of the API, worker and service entry points
+This script:
+1. Imports each entry module in a fresh interpreter with ``-X importtime``
+2. Records the cumulative import time of every module it loads
+3. Reports the slowest modules and whether sklearn/scipy/pandas were loaded
+4. Optionally saves the results, or compares them with a saved baseline
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --output startup.json
+    python scripts/benchmark_startup.py --baseline startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).parent.parent
+
+# Modules every API worker or CLI invocation imports
+ENTRY_MODULES = [
+    "src.api.main",
+    "src.services",
+    "src.services.worker",
+    "src.services.ecl_engine",
+]
+
+# Dependencies that should only load when a service needs them
+HEAVY_MODULES = ["sklearn", "scipy", "pandas"]
+
+
+def measure(module: str) -> Dict[str, float]:
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module: Module to import
+
+    Returns:
+        Cumulative import time (ms) of each module loaded
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = timings.get(name.strip(), 0.0) + int(cumulative) / 1000
+    return timings
+
+
+def benchmark(module: str, repeat: int) -> Dict[str, float]:
+    """Median of each module's cumulative import time over several runs"""
+    runs = [measure(module) for _ in range(repeat)]
+    names = set().union(*runs)
+    return {name: statistics.median(run.get(name, 0.0) for run in runs) for name in names}
+
+
+def report(module: str, timings: Dict[str, float], top: int):
+    total = timings.get(module, 0.0)
+    heavy = [name for name in HEAVY_MODULES if name in timings]
+    print(f"\n{module}: {total:.0f} ms, {len(timings)} modules")
+    print(f"  heavy dependencies loaded: {', '.join(heavy) if heavy else 'none'}")
+    for name, ms in sorted(timings.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {ms:9.1f} ms  {name}")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[str]:
+    """Entry modules that got slower than the baseline, or newly load a heavy dependency"""
+    regressions = []
+    for module, timings in results.items():
+        before = baseline.get(module)
+        if before is None:
+            continue
+        total, previous = timings.get(module, 0.0), before.get(module, 0.0)
+        if previous and total > previous * (1 + tolerance):
+            regressions.append(f"{module}: {previous:.0f} ms -> {total:.0f} ms")
+        for name in HEAVY_MODULES:
+            if name in timings and name not in before:
+                regressions.append(f"{module}: now imports {name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the platform entry points")
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES, help="Modules to import")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per module (median is reported)"
+    )
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--output", help="Save per-module timings as JSON")
+    parser.add_argument("--baseline", help="Compare with timings saved by --output")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline (fraction)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = benchmark(module, args.repeat)
+        report(module, results[module], args.top)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"\nSaved timings to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("\nStartup regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo startup regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 """FastAPI main application"""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
 import os
+import time
 
 from src.utils.logging_config import setup_logging
 from src.api.routes import imports, classification, staging, ecl, audit, instruments, parameters, scenarios, reporting, auth, staging_overrides, ead
@@ -59,11 +63,57 @@ async def health_check():
     return {"status": "healthy"}
 
 
+def database_health() -> Dict[str, Any]:
+    """Readiness probe: SELECT 1 on a pooled database connection"""
+    from sqlalchemy import text
+    from src.db.session import engine
+    
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return {"status": "up", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"status": "down", "error": str(e)}
+
+
+def _readiness_probes() -> Dict[str, Callable[[], Dict[str, Any]]]:
+    from src.utils.cache import redis_health
+    from src.utils.queue import get_queue_manager
+    from src.utils.storage import get_storage_manager
+    
+    return {
+        "database": database_health,
+        "redis": redis_health,
+        "rabbitmq": lambda: get_queue_manager().health(),
+        "storage": lambda: get_storage_manager().health(),
+    }
+
+
+# Dependencies that must be up for the API to be ready; others only degrade it
+READINESS_REQUIRED = [
+    name.strip() for name in os.getenv("READINESS_REQUIRED", "database").split(",") if name.strip()
+]
+
+
 @app.get("/health/ready")
-async def readiness_check():
-    """Readiness check endpoint"""
-    # TODO: Check database, redis, rabbitmq connections
-    return {"status": "ready"}
+def readiness_check():
+    """
+    Readiness check endpoint.
+    
+    Probes the database, Redis, RabbitMQ and object storage in parallel
+    (each with its client's connect timeout). Returns 503 if a dependency in
+    READINESS_REQUIRED is down, and status "degraded" if another one is.
+    """
+    probes = _readiness_probes()
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        futures = {name: executor.submit(probe) for name, probe in probes.items()}
+        checks = {name: future.result() for name, future in futures.items()}
+    
+    down = [name for name, check in checks.items() if check["status"] != "up"]
+    if any(name in READINESS_REQUIRED for name in down):
+        return JSONResponse(status_code=503, content={"status": "not_ready", "checks": checks})
+    return {"status": "degraded" if down else "ready", "checks": checks}
 
 
 @app.get("/api/v1/info")
@@ -218,10 +218,11 @@ async def list_off_balance_sheet_exposures(
         
         instruments = query.offset(skip).limit(limit).all()
         
+        ccf_map = ead_calculation_service.load_ccf_map(db)
         exposures = []
         for instrument in instruments:
             if instrument.facility_type:
-                ccf = ead_calculation_service._get_ccf(db, instrument)
+                ccf = ead_calculation_service._get_ccf(db, instrument, ccf_map)
                 undrawn = instrument.undrawn_commitment_amount or Decimal("0")
                 ead_off_balance = undrawn * ccf
                 
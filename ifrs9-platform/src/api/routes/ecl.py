@@ -8,6 +8,7 @@ from decimal import Decimal
 
 from src.api.dependencies import get_db, get_current_user_id, get_client_ip
 from src.services.ecl_engine import ECLCalculationService
+from src.services.portfolio_runner import portfolio_runner
 from src.services.audit_trail import AuditTrailService
 from src.db.models import FinancialInstrument, ECLCalculation
 from src.utils.logging_config import get_logger
@@ -78,19 +79,9 @@ def calculate_ecl(
             scenarios=request.scenarios
         )
         
-        # Save calculation to database
-        ecl_calculation = ECLCalculation(
-            calculation_id=result.calculation_id,
-            instrument_id=instrument.instrument_id,
-            reporting_date=request.reporting_date,
-            stage=instrument.current_stage,
-            ecl_amount=result.ecl_amount,
-            pd=result.pd,
-            lgd=result.lgd,
-            ead=result.ead,
-            discount_rate=ecl_service.default_discount_rate,
-            calculation_method='STANDARD',
-            time_horizon=result.time_horizon
+        # Save calculation to database (including base/upside/downside scenario ECL)
+        ecl_calculation = ecl_service.build_calculation_record(
+            instrument, result, request.reporting_date
         )
         
         db.add(ecl_calculation)
@@ -134,16 +125,23 @@ class CalculatePortfolioRequest(BaseModel):
     """Request to calculate ECL for portfolio"""
     reporting_date: date
     instrument_ids: Optional[List[str]] = None  # If None, calculate for all active instruments
+    incremental: bool = True  # Carry forward results whose inputs are unchanged
+    scenarios: Optional[List[Dict[str, Any]]] = None  # Probability-weighted ECL scenarios
+    parameter_version: Optional[str] = None  # Frozen ParameterSet version (reproducible runs)
 
 
-@router.post("/calculate-portfolio", response_model=Dict[str, Any])
+@router.post("/calculate-portfolio", response_model=Dict[str, Any], status_code=202)
 def calculate_portfolio_ecl(
     request: CalculatePortfolioRequest,
     db: Session = Depends(get_db),
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Calculate ECL for portfolio of instruments.
+    Start a sharded ECL calculation for a portfolio of instruments.
+    
+    The run and its shards are persisted and dispatched to the ECL workers;
+    the request returns the run ID immediately. Poll /portfolio-runs/{run_id}
+    for progress and the merged stage totals.
     
     Args:
         request: Portfolio calculation request
@@ -151,50 +149,70 @@ def calculate_portfolio_ecl(
         user_id: Current user ID
         
     Returns:
-        Portfolio ECL calculation summary
+        Run ID and initial run status
     """
     try:
-        # Get instruments
-        query = db.query(FinancialInstrument).filter(
-            FinancialInstrument.status == 'ACTIVE'
+        run_id = portfolio_runner.submit(
+            db,
+            reporting_date=request.reporting_date,
+            user_id=user_id,
+            instrument_ids=request.instrument_ids,
+            incremental=request.incremental,
+            scenarios=request.scenarios,
+            parameter_version=request.parameter_version,
         )
         
-        if request.instrument_ids:
-            query = query.filter(FinancialInstrument.instrument_id.in_(request.instrument_ids))
-        
-        instruments = query.all()
-        
-        logger.info(f"Calculating ECL for {len(instruments)} instruments")
-        
-        # Calculate ECL for each instrument
-        ecl_service = ECLCalculationService()
-        results = ecl_service.recalculate_portfolio(instruments, request.reporting_date)
+        return portfolio_runner.get_run(db, run_id)
         
-        # Calculate totals
-        total_ecl = Decimal("0")
-        stage_totals = {
-            'STAGE_1': Decimal("0"),
-            'STAGE_2': Decimal("0"),
-            'STAGE_3': Decimal("0")
-        }
+    except Exception as e:
+        logger.error(f"Error starting portfolio ECL run: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/portfolio-runs/{run_id}", response_model=Dict[str, Any])
+def get_portfolio_run(run_id: str, db: Session = Depends(get_db)):
+    """
+    Get status of a portfolio ECL run.
+    
+    Args:
+        run_id: Run ID returned by /calculate-portfolio
+        db: Database session
         
-        for instrument_id, result in results.items():
-            total_ecl += result.ecl_amount
-            
-            # Get instrument stage
-            instrument = next(i for i in instruments if i.instrument_id == instrument_id)
-            stage_totals[instrument.current_stage.value] += result.ecl_amount
+    Returns:
+        Run status, shard progress and, once completed, the portfolio summary
+    """
+    run = portfolio_runner.get_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Portfolio run {run_id} not found")
+    return run
+
+
+@router.post("/portfolio-runs/{run_id}/resume", response_model=Dict[str, Any], status_code=202)
+def resume_portfolio_run(run_id: str, db: Session = Depends(get_db)):
+    """
+    Resume an interrupted or failed portfolio ECL run.
+    
+    Shards that did not complete continue from their last committed chunk.
+    
+    Args:
+        run_id: Run ID
+        db: Database session
         
-        return {
-            'reporting_date': request.reporting_date.isoformat(),
-            'instruments_calculated': len(results),
-            'total_ecl': float(total_ecl),
-            'stage_totals': {k: float(v) for k, v in stage_totals.items()},
-            'user_id': user_id
-        }
+    Returns:
+        Run status
+    """
+    try:
+        run = portfolio_runner.resume(db, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail=f"Portfolio run {run_id} not found")
+        return portfolio_runner.get_run(db, run_id)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error calculating portfolio ECL: {e}")
+        logger.error(f"Error resuming portfolio run {run_id}: {e}")
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
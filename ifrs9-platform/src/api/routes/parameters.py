@@ -8,6 +8,7 @@ import uuid
 
 from src.api.dependencies import get_db, get_current_user_id
 from src.db.models import ParameterSet, ParameterType
+from src.services.parameter_service import ParameterService
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -81,6 +82,9 @@ def create_parameter(
         db.add(parameter)
         db.commit()
         
+        # New parameters must be visible to cached lookups in every worker
+        ParameterService(db).invalidate_cache(parameter.parameter_type)
+        
         return {"parameter_id": parameter_id, "status": "created"}
         
     except Exception as e:
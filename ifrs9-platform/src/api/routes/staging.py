@@ -1,12 +1,17 @@
 """Staging API endpoints"""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import date
 
 from src.api.dependencies import get_db, get_current_user_id, get_client_ip
-from src.services.staging import StagingService
+from src.services.staging import (
+    StagingService,
+    transition_key,
+    format_transition_cursor,
+    parse_transition_cursor,
+)
 from src.services.audit_trail import AuditTrailService
 from src.db.models import FinancialInstrument, StageTransition
 from src.utils.logging_config import get_logger
@@ -15,6 +20,9 @@ logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/v1/staging", tags=["staging"])
 
+# Largest page of stage transitions
+MAX_TRANSITIONS_PAGE = 1000
+
 
 class DetermineStageRequest(BaseModel):
     """Request to determine stage for an instrument"""
@@ -171,55 +179,58 @@ def evaluate_sicr(
 
 @router.get("/transitions", response_model=List[Dict[str, Any]])
 def get_stage_transitions(
-    instrument_id: str = None,
-    start_date: date = None,
-    end_date: date = None,
+    response: Response,
+    instrument_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
 ):
     """
-    Get stage transition history.
+    Get stage transition history, newest first.
+    
+    Pages are read with keyset pagination: when more transitions may
+    follow, the X-Next-Cursor response header holds the cursor for the
+    next page.
     
     Args:
         instrument_id: Filter by instrument ID (optional)
         start_date: Filter by start date (optional)
         end_date: Filter by end date (optional)
-        limit: Maximum number of results
+        limit: Maximum number of results (at most 1000)
+        cursor: X-Next-Cursor of the previous page (optional)
         db: Database session
         
     Returns:
         List of stage transitions
     """
     try:
-        query = db.query(StageTransition)
-        
-        if instrument_id:
-            instrument = db.query(FinancialInstrument).filter(
-                FinancialInstrument.instrument_id == instrument_id
-            ).first()
-            if instrument:
-                query = query.filter(StageTransition.instrument_id == instrument.id)
-        
-        if start_date:
-            query = query.filter(StageTransition.transition_date >= start_date)
-        if end_date:
-            query = query.filter(StageTransition.transition_date <= end_date)
-        
-        query = query.order_by(StageTransition.transition_date.desc())
-        query = query.limit(limit)
-        
-        transitions = query.all()
+        after = parse_transition_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    limit = max(1, min(limit, MAX_TRANSITIONS_PAGE))
+    
+    try:
+        transitions = StagingService(db).get_stage_transitions(
+            instrument_id, start_date, end_date, limit=limit, after=after, descending=True
+        )
         
+        if len(transitions) == limit:
+            response.headers["X-Next-Cursor"] = format_transition_cursor(
+                transition_key(transitions[-1])
+            )
+
         return [
             {
-                'id': t.id,
-                'instrument_id': t.instrument.instrument_id,
-                'transition_date': t.transition_date.isoformat(),
-                'from_stage': t.from_stage.value,
-                'to_stage': t.to_stage.value,
-                'reason': t.reason,
-                'sicr_indicators': t.sicr_indicators,
-                'days_past_due': t.days_past_due
+                "id": t.transition_id,
+                "instrument_id": t.instrument_id,
+                "transition_date": t.transition_date.isoformat(),
+                "from_stage": t.from_stage.value,
+                "to_stage": t.to_stage.value,
+                "reason": t.transition_reason,
+                "sicr_indicators": t.sicr_indicators,
+                "days_past_due": t.days_past_due,
             }
             for t in transitions
         ]
@@ -1,5 +1,18 @@
 """Database models"""
-from sqlalchemy import Column, String, Integer, Numeric, Date, DateTime, Boolean, ForeignKey, JSON, Text, Enum as SQLEnum
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Numeric,
+    Date,
+    DateTime,
+    Boolean,
+    ForeignKey,
+    JSON,
+    Text,
+    Index,
+    Enum as SQLEnum,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, date
@@ -220,7 +233,16 @@ class ECLCalculation(Base):
     calculation_timestamp = Column(DateTime, server_default=func.now())
     calculation_duration_ms = Column(Integer)
     parameters_version = Column(String(50))
-    
+    portfolio_run_id = Column(
+        String(50), ForeignKey("portfolio_run.run_id"), nullable=True, index=True
+    )
+
+    # Incremental recalculation
+    input_fingerprint = Column(String(64), index=True)  # SHA-256 of ECL inputs
+    carried_forward_from = Column(
+        String(50), ForeignKey("ecl_calculation.calculation_id"), nullable=True
+    )
+
     # Relationships
     instrument = relationship("FinancialInstrument", back_populates="ecl_calculations")
 
@@ -249,6 +271,18 @@ class StageTransition(Base):
     
     # Relationships
     instrument = relationship("FinancialInstrument", back_populates="stage_transitions")
+    
+    __table_args__ = (
+        # Per-instrument history and keyset pagination (StagingService.get_stage_transitions)
+        Index(
+            "ix_stage_transition_instrument_date",
+            "instrument_id",
+            "transition_date",
+            "transition_id",
+        ),
+        # Portfolio-wide date ranges (migration-matrix reports)
+        Index("ix_stage_transition_date", "transition_date", "transition_id"),
+    )
 
 
 class ParameterSet(Base):
@@ -433,7 +467,6 @@ class StagedInstrument(Base):
     import_batch = relationship("ImportBatch", back_populates="staged_instruments")
 
 
-
 # ========================================
 # PHASE 1 ENHANCEMENTS - NEW MODELS
 # ========================================
@@ -782,3 +815,94 @@ class UserActivityLog(Base):
     
     # Relationships
     user = relationship("User", back_populates="activity_logs")
+
+
+# Portfolio ECL runs
+class PortfolioRun(Base):
+    """Portfolio ECL run (job) tracking"""
+
+    __tablename__ = "portfolio_run"
+    
+    run_id = Column(String(50), primary_key=True)
+    reporting_date = Column(Date, nullable=False)
+    status = Column(String(20), nullable=False)  # QUEUED, RUNNING, COMPLETED, FAILED
+    shard_by = Column(String(20), nullable=False)  # customer, segment
+    chunk_size = Column(Integer, nullable=False)
+    incremental = Column(Boolean, default=False, nullable=False)
+    scenarios = Column(JSON)  # Scenario set for probability-weighted ECL
+    parameter_version = Column(String(20))  # Frozen ParameterSet.version (None: defaults)
+    
+    # Progress
+    shards_total = Column(Integer, default=0, nullable=False)
+    shards_completed = Column(Integer, default=0, nullable=False)
+    instruments_total = Column(Integer, default=0, nullable=False)
+    
+    # Result
+    instruments_calculated = Column(Integer, default=0, nullable=False)
+    total_ecl = Column(Numeric(18, 2))
+    stage_totals = Column(JSON)
+    error = Column(Text, nullable=True)
+    
+    # Metadata
+    submitted_by = Column(String(50), nullable=False)
+    submitted_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    shards = relationship("PortfolioRunShard", back_populates="run", cascade="all, delete-orphan")
+
+
+class PortfolioRunShard(Base):
+    """Shard of a portfolio ECL run with chunk checkpoint"""
+
+    __tablename__ = "portfolio_run_shard"
+    
+    shard_id = Column(String(60), primary_key=True)
+    run_id = Column(String(50), ForeignKey("portfolio_run.run_id"), nullable=False, index=True)
+    shard_index = Column(Integer, nullable=False)
+    instrument_ids = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False)  # QUEUED, RUNNING, COMPLETED, FAILED
+    
+    # Checkpoint (chunks are committed together with their ECL results)
+    chunks_total = Column(Integer, nullable=False)
+    chunks_completed = Column(Integer, default=0, nullable=False)
+    
+    # Partial result
+    instruments_calculated = Column(Integer, default=0, nullable=False)
+    total_ecl = Column(Numeric(18, 2), default=0, nullable=False)
+    stage_totals = Column(JSON)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    
+    # Timestamps
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    run = relationship("PortfolioRun", back_populates="shards")
+
+
+# SICR rules
+class SICRRule(Base):
+    """Declarative SICR rule (versioned like ParameterSet; see services.sicr_rules)"""
+
+    __tablename__ = "sicr_rule"
+    
+    rule_id = Column(String(50), primary_key=True)
+    indicator = Column(String(50), nullable=False)  # SICR indicator raised, e.g. DPD_THRESHOLD
+    field = Column(String(50), nullable=False)  # Staging input, e.g. days_past_due
+    operator = Column(String(10), nullable=False)  # >, >=, <, <=, ==, !=, in, not_in, is_true
+    threshold = Column(Numeric(18, 6))  # Comparison operators
+    value_list = Column(JSON)  # in / not_in
+    priority = Column(Integer, default=100, nullable=False)  # Evaluation order
+    is_active = Column(Boolean, default=True, nullable=False)
+    effective_date = Column(Date, nullable=False, index=True)
+    expiry_date = Column(Date)
+    
+    # Metadata
+    version = Column(String(20))
+    description = Column(Text)
+    created_by = Column(String(50))
+    approved_by = Column(String(50))
+    approval_date = Column(Date)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,48 +1,52 @@
-"""Services module"""
-
-# Phase 1 services (no DB required for import)
-from src.services.authentication import authentication_service
-from src.services.authorization import authorization_service
-from src.services.maker_checker import maker_checker_service
-from src.services.staging_override import staging_override_service
-from src.services.ead_calculation import ead_calculation_service
-from src.services.facility_lgd import facility_lgd_service, collateral_revaluation_service
-from src.services.macro_regression import macro_regression_service
-from src.services.transition_matrix import transition_matrix_service
-from src.services.scorecard import scorecard_service
-
-# Core services (no DB required for import)
-from src.services.staging import staging_service
-
-# Services requiring DB session are imported as classes
-from src.services.ecl_engine import ECLCalculationService, ecl_calculation_service
-from src.services.parameter_service import ParameterService
-from src.services.macro_scenario_service import MacroScenarioService
-from src.services.data_import import DataImportService
-from src.services.classification import ClassificationService
-from src.services.audit_trail import AuditTrailService, AuditQueryService
-
-__all__ = [
-    # Phase 1 services
-    "authentication_service",
-    "authorization_service",
-    "maker_checker_service",
-    "staging_override_service",
-    "ead_calculation_service",
-    "facility_lgd_service",
-    "collateral_revaluation_service",
-    "macro_regression_service",
-    "transition_matrix_service",
-    "scorecard_service",
-    # Core services
-    "staging_service",
-    # Service classes
-    "ECLCalculationService",
-    "ecl_calculation_service",
-    "ParameterService",
-    "MacroScenarioService",
-    "DataImportService",
-    "ClassificationService",
-    "AuditTrailService",
-    "AuditQueryService",
-]
+"""Services module
+
+Services are registered by name and imported on first access
+(``from src.services import scorecard_service`` or
+``src.services.scorecard_service``), so importing the package - or one of
+its submodules - does not pull in sklearn, scipy or pandas for services
+the caller never uses.
+"""
+
+import importlib
+
+# Exported name -> defining module
+_EXPORTS = {
+    # Phase 1 services (no DB required for import)
+    "authentication_service": "src.services.authentication",
+    "authorization_service": "src.services.authorization",
+    "maker_checker_service": "src.services.maker_checker",
+    "staging_override_service": "src.services.staging_override",
+    "ead_calculation_service": "src.services.ead_calculation",
+    "facility_lgd_service": "src.services.facility_lgd",
+    "collateral_revaluation_service": "src.services.facility_lgd",
+    "macro_regression_service": "src.services.macro_regression",
+    "transition_matrix_service": "src.services.transition_matrix",
+    "scorecard_service": "src.services.scorecard",
+    # Core services (no DB required for import)
+    "staging_service": "src.services.staging",
+    # Services requiring DB session are imported as classes
+    "ECLCalculationService": "src.services.ecl_engine",
+    "ecl_calculation_service": "src.services.ecl_engine",
+    "ParameterService": "src.services.parameter_service",
+    "MacroScenarioService": "src.services.macro_scenario_service",
+    "DataImportService": "src.services.data_import",
+    "ClassificationService": "src.services.classification",
+    "AuditTrailService": "src.services.audit_trail",
+    "AuditQueryService": "src.services.audit_trail",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -12,6 +12,105 @@ from src.utils.logging_config import get_logger
 logger = get_logger(__name__)
 
 
+def build_audit_entry(
+    user_id: str,
+    action: str,
+    entity_type: str,
+    entity_id: str,
+    before_state: Optional[Dict],
+    after_state: Optional[Dict],
+    ip_address: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build audit entry column values with integrity hash.
+    
+    Used for single entries (AuditTrailService) and bulk inserts
+    (ECLResultsWriter). The timestamp hashed is the timestamp stored.
+    
+    Args:
+        user_id: User performing the action
+        action: Action performed
+        entity_type: Type of entity
+        entity_id: Entity ID
+        before_state: State before action
+        after_state: State after action
+        ip_address: Client IP address (optional)
+        session_id: Session ID (optional)
+        
+    Returns:
+        Dict of AuditEntry column values
+    """
+    timestamp = datetime.utcnow()
+    
+    # Generate integrity hash (SHA-256)
+    hash_input = {
+        "timestamp": timestamp.isoformat(),
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "before_state": before_state,
+        "after_state": after_state,
+    }
+    
+    hash_string = json.dumps(hash_input, sort_keys=True, default=str)
+    integrity_hash = hashlib.sha256(hash_string.encode()).hexdigest()
+    
+    return {
+        "audit_id": str(uuid.uuid4()),
+        "timestamp": timestamp,
+        "user_id": user_id,
+        "event_type": action,  # Set event_type to the action
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "before_state": before_state,
+        "after_state": after_state,
+        "ip_address": ip_address,
+        "session_id": session_id,
+        "hash": integrity_hash,
+    }
+
+
+def ecl_calculation_state(
+    calculation_id: str,
+    stage: str,
+    ecl_amount: float,
+    pd: float,
+    lgd: float,
+    ead: float,
+    reporting_date: str,
+) -> Dict[str, Any]:
+    """After-state recorded for an ECL calculation"""
+    return {
+        "calculation_id": calculation_id,
+        "stage": stage,
+        "ecl_amount": ecl_amount,
+        "pd": pd,
+        "lgd": lgd,
+        "ead": ead,
+        "reporting_date": reporting_date,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def staging_state(
+    stage: str,
+    reason: str,
+    sicr_indicators: Optional[List[str]] = None,
+    days_past_due: Optional[int] = None,
+) -> Dict[str, Any]:
+    """After-state recorded for a stage assignment or transition"""
+    return {
+        "stage": stage,
+        "reason": reason,
+        "sicr_indicators": sicr_indicators or [],
+        "days_past_due": days_past_due,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
 class AuditTrailService:
     """
     Service for logging all system actions to audit trail.
@@ -80,13 +179,7 @@ class AuditTrailService:
             Created audit entry
         """
         before_state = {'stage': from_stage} if from_stage else None
-        after_state = {
-            'stage': to_stage,
-            'reason': reason,
-            'sicr_indicators': sicr_indicators or [],
-            'days_past_due': days_past_due,
-            'timestamp': datetime.utcnow().isoformat()
-        }
+        after_state = staging_state(to_stage, reason, sicr_indicators, days_past_due)
         
         return self._create_audit_entry(
             action='STAGE_TRANSITION' if from_stage else 'STAGE_ASSIGNMENT',
@@ -115,16 +208,9 @@ class AuditTrailService:
         Returns:
             Created audit entry
         """
-        after_state = {
-            'calculation_id': calculation_id,
-            'stage': stage,
-            'ecl_amount': ecl_amount,
-            'pd': pd,
-            'lgd': lgd,
-            'ead': ead,
-            'reporting_date': reporting_date,
-            'timestamp': datetime.utcnow().isoformat()
-        }
+        after_state = ecl_calculation_state(
+            calculation_id, stage, ecl_amount, pd, lgd, ead, reporting_date
+        )
         
         return self._create_audit_entry(
             action='ECL_CALCULATION',
@@ -214,35 +300,19 @@ class AuditTrailService:
         Returns:
             Created audit entry
         """
-        # Generate integrity hash (SHA-256)
-        hash_input = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'user_id': self.user_id,
-            'action': action,
-            'entity_type': entity_type,
-            'entity_id': entity_id,
-            'before_state': before_state,
-            'after_state': after_state
-        }
-        
-        hash_string = json.dumps(hash_input, sort_keys=True, default=str)
-        integrity_hash = hashlib.sha256(hash_string.encode()).hexdigest()
-        
-        # Create audit entry
         audit_entry = AuditEntry(
-            audit_id=str(uuid.uuid4()),
-            user_id=self.user_id,
-            event_type=action,  # Set event_type to the action
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            before_state=before_state,
-            after_state=after_state,
-            ip_address=self.ip_address,
-            session_id=self.session_id,
-            hash=integrity_hash
+            **build_audit_entry(
+                user_id=self.user_id,
+                action=action,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                before_state=before_state,
+                after_state=after_state,
+                ip_address=self.ip_address,
+                session_id=self.session_id,
+            )
         )
-        
+
         self.db.add(audit_entry)
         self.db.flush()  # Get audit_entry.id
         
@@ -305,10 +375,10 @@ class AuditTrailService:
         hash_string = json.dumps(hash_input, sort_keys=True, default=str)
         computed_hash = hashlib.sha256(hash_string.encode()).hexdigest()
         
-        is_valid = computed_hash == audit_entry.integrity_hash
+        is_valid = computed_hash == audit_entry.hash
         
         if not is_valid:
-            logger.error(f"Integrity check failed for audit entry {audit_entry.id}")
+            logger.error(f"Integrity check failed for audit entry {audit_entry.audit_id}")
         
         return is_valid
 
@@ -3,9 +3,27 @@ from typing import Dict, Any, List, Optional
 from decimal import Decimal
 from datetime import date
 import uuid
+import numpy as np
 from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
 
-from src.db.models import FinancialInstrument, Stage, ECLCalculation
+from src.db.models import FinancialInstrument, Stage, ECLCalculation, InstrumentType, ParameterType
+from src.services.ecl_term_structure import (
+    TermStructureECLEngine,
+    PortfolioArrays,
+    STAGE_CODES,
+    remaining_months,
+    to_money,
+)
+from src.services.ecl_scenarios import (
+    ScenarioMatrix,
+    evaluate_scenarios,
+    scenario_breakdown,
+    BASE,
+    UPSIDE,
+    DOWNSIDE,
+)
+from src.services.parameter_snapshot import ParameterSnapshot, instrument_key
 from src.utils.logging_config import get_logger
 from src.utils.cache import get_cache, set_cache
 
@@ -14,9 +32,21 @@ logger = get_logger(__name__)
 
 class ECLResult:
     """ECL calculation result"""
-    def __init__(self, calculation_id: str, ecl_amount: Decimal, pd: Decimal, 
-                 lgd: Decimal, ead: Decimal, time_horizon: str, 
-                 scenario_results: Optional[Dict[str, Decimal]] = None):
+    def __init__(
+        self,
+        calculation_id: str,
+        ecl_amount: Decimal,
+        pd: Decimal,
+        lgd: Decimal,
+        ead: Decimal,
+        time_horizon: str,
+        scenario_results: Optional[Dict[str, Decimal]] = None,
+        discount_rate: Optional[Decimal] = None,
+        input_fingerprint: Optional[str] = None,
+        carried_forward_from: Optional[str] = None,
+        scenario_ecl_by_type: Optional[Dict[str, Decimal]] = None,
+        scenario_weights: Optional[Dict[str, float]] = None,
+    ):
         self.calculation_id = calculation_id
         self.ecl_amount = ecl_amount
         self.pd = pd
@@ -24,19 +54,50 @@ class ECLResult:
         self.ead = ead
         self.time_horizon = time_horizon
         self.scenario_results = scenario_results or {}
+        self.discount_rate = discount_rate
+        self.input_fingerprint = input_fingerprint
+        self.carried_forward_from = carried_forward_from  # prior calculation reused unchanged
+        self.scenario_ecl_by_type = scenario_ecl_by_type or {}  # BASE / UPSIDE / DOWNSIDE
+        self.scenario_weights = scenario_weights or {}
 
 
 class ECLCalculationService:
-    """Service for calculating Expected Credit Loss"""
+    """
+    Service for calculating Expected Credit Loss.
     
-    def __init__(self):
-        # Default parameters (in production, these would be loaded from database)
+    Without a parameter snapshot, the default PD/LGD apply to every
+    instrument. With one (ParameterSnapshot.load), PD, LGD and the EAD credit
+    conversion factor are resolved per segment from the snapshot.
+    """
+    
+    def __init__(self, parameter_snapshot: Optional[ParameterSnapshot] = None):
+        # Default parameters (used when no snapshot parameter applies)
         self.default_pd = Decimal("0.02")  # 2%
         self.default_lgd = Decimal("0.45")  # 45%
         self.default_discount_rate = Decimal("0.12")  # 12%
+        self.parameter_snapshot = parameter_snapshot
+        
+        # Monthly term-structure engine (discount factor tables are reused for the service lifetime)
+        self.term_structure_engine = TermStructureECLEngine()
     
-    def calculate_ecl(self, instrument: FinancialInstrument, stage: Stage, 
-                     reporting_date: date, scenarios: Optional[List[Dict]] = None) -> ECLResult:
+    @property
+    def parameters_version(self) -> str:
+        """
+        Version of the PD/LGD parameters used by this service.
+        
+        Stored on ECL calculations and part of the incremental input fingerprint.
+        """
+        if self.parameter_snapshot is not None:
+            return self.parameter_snapshot.parameters_version
+        return f"defaults:{self.default_pd}/{self.default_lgd}/{self.default_discount_rate}"
+
+    def calculate_ecl(
+        self,
+        instrument: FinancialInstrument,
+        stage: Stage,
+        reporting_date: date,
+        scenarios: Optional[List[Any]] = None,
+    ) -> ECLResult:
         """
         Calculate ECL for financial instrument.
         
@@ -76,10 +137,18 @@ class ECLCalculationService:
         
         # Apply scenario weighting if scenarios provided
         scenario_results = {}
+        scenario_ecl_by_type = {}
+        scenario_weights = {}
         if scenarios:
             # Property 12: Scenario Weighting
             ecl_amount = self._apply_scenario_weighting(
-                instrument, stage, reporting_date, scenarios, scenario_results
+                instrument,
+                stage,
+                reporting_date,
+                scenarios,
+                scenario_results,
+                scenario_ecl_by_type,
+                scenario_weights,
             )
         
         logger.info(f"ECL calculated: {ecl_amount} for instrument {instrument.instrument_id}")
@@ -91,14 +160,18 @@ class ECLCalculationService:
             lgd=lgd,
             ead=ead,
             time_horizon=time_horizon,
-            scenario_results=scenario_results
+            scenario_results=scenario_results,
+            discount_rate=self._get_discount_rate(instrument),
+            scenario_ecl_by_type=scenario_ecl_by_type,
+            scenario_weights=scenario_weights,
         )
     
     def calculate_12m_ecl(self, instrument: FinancialInstrument, reporting_date: date) -> Decimal:
         """
         Calculate 12-month ECL for Stage 1 instruments.
         
-        Property 11: ECL = Σ(PD_t × LGD_t × EAD_t × DF_t) for 12 months
+        Property 11: ECL = Σ(PD_t × LGD_t × EAD_t × DF_t) summed monthly over the
+        first 12 months (or to maturity if sooner)
         
         Args:
             instrument: Financial instrument
@@ -107,25 +180,17 @@ class ECLCalculationService:
         Returns:
             12-month ECL amount
         """
-        pd = self._get_pd(instrument)
-        lgd = self._get_lgd(instrument)
-        ead = self._get_ead(instrument)
-        discount_rate = self.default_discount_rate
-        
-        # Calculate ECL for 12 months
-        # Simplified: ECL = PD × LGD × EAD × DF
-        # In production, this would sum over monthly periods
-        discount_factor = Decimal("1") / (Decimal("1") + discount_rate)
+        arrays = self.build_portfolio_arrays([instrument], reporting_date)
+        ecl_12m, _ = self.term_structure_engine.calculate(arrays)
         
-        ecl = pd * lgd * ead * discount_factor
-        
-        return ecl.quantize(Decimal("0.01"))
+        return to_money(ecl_12m[0])
     
     def calculate_lifetime_ecl(self, instrument: FinancialInstrument, reporting_date: date) -> Decimal:
         """
         Calculate Lifetime ECL for Stage 2 and Stage 3 instruments.
         
-        Property 11: ECL = Σ(PD_t × LGD_t × EAD_t × DF_t) for lifetime
+        Property 11: ECL = Σ(PD_t × LGD_t × EAD_t × DF_t) summed monthly over the
+        remaining life of the instrument
         
         Args:
             instrument: Financial instrument
@@ -134,24 +199,64 @@ class ECLCalculationService:
         Returns:
             Lifetime ECL amount
         """
-        pd = self._get_pd(instrument)
-        lgd = self._get_lgd(instrument)
-        ead = self._get_ead(instrument)
-        discount_rate = self.default_discount_rate
+        arrays = self.build_portfolio_arrays([instrument], reporting_date)
+        _, ecl_lifetime = self.term_structure_engine.calculate(arrays)
         
-        # Calculate remaining term in years
-        remaining_term = (instrument.maturity_date - reporting_date).days / 365.0
-        remaining_term = max(remaining_term, 0.1)  # Minimum 0.1 years
+        return to_money(ecl_lifetime[0])
+
+    def build_portfolio_arrays(
+        self, instruments: List[FinancialInstrument], reporting_date: date
+    ) -> PortfolioArrays:
+        """
+        Load term-structure ECL inputs for instruments into NumPy arrays.
         
-        # Calculate lifetime ECL (simplified)
-        # In production, this would sum over all periods until maturity
-        total_ecl = Decimal("0")
-        for year in range(int(remaining_term) + 1):
-            discount_factor = Decimal("1") / ((Decimal("1") + discount_rate) ** year)
-            period_ecl = pd * lgd * ead * discount_factor
-            total_ecl += period_ecl
+        Each parameter lookup is performed exactly once per instrument; with a
+        parameter snapshot, PD, LGD and EAD are resolved for all instruments in
+        one join.
         
-        return total_ecl.quantize(Decimal("0.01"))
+        Args:
+            instruments: List of financial instruments
+            reporting_date: Reporting date
+            
+        Returns:
+            PortfolioArrays with one element per instrument
+        """
+        n = len(instruments)
+        stage = np.zeros(n, dtype=np.int8)
+        pd = np.empty(n)
+        lgd = np.empty(n)
+        ead = np.empty(n)
+        discount_rate = np.empty(n)
+        months = np.empty(n, dtype=np.int64)
+        amortising = np.zeros(n, dtype=bool)
+        
+        snapshot = self.parameter_snapshot
+        if snapshot is not None and n:
+            parameters = snapshot.resolve_portfolio(instruments)
+            pd[:] = parameters["pd"].to_numpy()
+            lgd[:] = parameters["lgd"].to_numpy()
+            ead[:] = parameters["ead"].to_numpy()
+        
+        for i, instrument in enumerate(instruments):
+            stage[i] = STAGE_CODES.get(instrument.current_stage, 0)
+            if snapshot is None:
+                pd[i] = float(self._get_pd(instrument))
+                lgd[i] = float(self._get_lgd(instrument))
+                ead[i] = float(self._get_ead(instrument))
+            discount_rate[i] = float(self._get_discount_rate(instrument))
+            months[i] = remaining_months(instrument.maturity_date, reporting_date)
+            amortising[i] = instrument.instrument_type == InstrumentType.TERM_LOAN
+        
+        return PortfolioArrays(
+            instrument_ids=[instrument.instrument_id for instrument in instruments],
+            stage=stage,
+            pd=pd,
+            lgd=lgd,
+            ead=ead,
+            discount_rate=discount_rate,
+            remaining_months=months,
+            amortising=amortising,
+        )
     
     def _get_pd(self, instrument: FinancialInstrument) -> Decimal:
         """
@@ -173,8 +278,7 @@ class ECLCalculationService:
         """
         Get Probability of Default for instrument.
         
-        For MVP, uses default PD values.
-        In production, this would query parameter_sets table.
+        Uses the parameter snapshot when set, otherwise the default PD.
         
         Args:
             instrument: Financial instrument
@@ -182,16 +286,13 @@ class ECLCalculationService:
         Returns:
             PD value
         """
-        # For MVP, use default PD
-        # In production, would query parameter_sets by customer_segment and stage
-        return self.default_pd
+        return self._snapshot_value(ParameterType.PD, instrument, self.default_pd)
     
     def _get_lgd(self, instrument: FinancialInstrument) -> Decimal:
         """
         Get Loss Given Default for instrument.
         
-        For MVP, uses default LGD values.
-        In production, this would query parameter_sets table.
+        Uses the parameter snapshot when set, otherwise the default LGD.
         
         Args:
             instrument: Financial instrument
@@ -199,10 +300,8 @@ class ECLCalculationService:
         Returns:
             LGD value
         """
-        # For MVP, use default LGD
-        # In production, would query parameter_sets by customer_segment
-        # and adjust for collateral (Property 26)
-        return self.default_lgd
+        # Collateral adjustment (Property 26) is applied by facility_lgd_service
+        return self._snapshot_value(ParameterType.LGD, instrument, self.default_lgd)
     
     def _get_ead(self, instrument: FinancialInstrument) -> Decimal:
         """
@@ -214,83 +313,216 @@ class ECLCalculationService:
         Returns:
             EAD value
         """
-        # For MVP, EAD = current principal amount
-        # In production, would consider:
+        # EAD = current principal amount × credit conversion factor (1 by default)
+        # In production, would also consider:
         # - Undrawn commitments
         # - Exposure profiles
-        # - Credit conversion factors
         
-        return instrument.principal_amount
+        ccf = self._snapshot_value(ParameterType.EAD, instrument, None)
+        if ccf is None:
+            return instrument.principal_amount
+        return instrument.principal_amount * ccf
+
+    def _snapshot_value(
+        self,
+        parameter_type: ParameterType,
+        instrument: FinancialInstrument,
+        default: Optional[Decimal],
+    ) -> Optional[Decimal]:
+        """Parameter for the instrument's segment from the snapshot, or the default"""
+        if self.parameter_snapshot is None:
+            return default
+        value = self.parameter_snapshot.resolve(parameter_type, *instrument_key(instrument))
+        return default if value is None else value
     
-    def _apply_scenario_weighting(self, instrument: FinancialInstrument, stage: Stage,
-                                  reporting_date: date, scenarios: List[Dict],
-                                  scenario_results: Dict) -> Decimal:
+    def _get_discount_rate(self, instrument: FinancialInstrument) -> Decimal:
+        """
+        Get discount rate (effective interest rate) for instrument.
+        
+        IFRS 9 discounts expected credit losses at the effective interest rate.
+        Instrument interest rates are stored in percent.
+        
+        Args:
+            instrument: Financial instrument
+            
+        Returns:
+            Annual discount rate
+        """
+        if instrument.interest_rate:
+            return instrument.interest_rate / Decimal("100")
+        return self.default_discount_rate
+
+    def _apply_scenario_weighting(
+        self,
+        instrument: FinancialInstrument,
+        stage: Stage,
+        reporting_date: date,
+        scenarios: List[Any],
+        scenario_results: Dict,
+        scenario_ecl_by_type: Optional[Dict] = None,
+        scenario_weights: Optional[Dict] = None,
+    ) -> Decimal:
         """
         Apply macroeconomic scenario weighting.
         
         Property 12: Scenario Weighting
-        For any probability-weighted ECL calculation with multiple scenarios, 
-        the weighted ECL must equal the sum of (scenario_weight * scenario_ECL) for all scenarios, 
+        For any probability-weighted ECL calculation with multiple scenarios,
+        the weighted ECL must equal the sum of (scenario_weight * scenario_ECL) for all scenarios,
         and the sum of all scenario weights must equal 1.0.
         
+        All scenarios are evaluated in one batched pass over the instrument's
+        term structure (see evaluate_scenarios).
+        
         Args:
             instrument: Financial instrument
             stage: Impairment stage
             reporting_date: Reporting date
-            scenarios: List of scenarios with weights
+            scenarios: Scenario dicts or ScenarioResult objects
             scenario_results: Dict to store individual scenario results
+            scenario_ecl_by_type: Dict to store BASE/UPSIDE/DOWNSIDE results (optional)
+            scenario_weights: Dict to store scenario weights (optional)
             
         Returns:
             Probability-weighted ECL
         """
-        total_weight = Decimal("0")
-        weighted_ecl = Decimal("0")
-        
-        for scenario in scenarios:
-            scenario_id = scenario.get("scenario_id", "unknown")
-            weight = Decimal(str(scenario.get("weight", 0)))
-            total_weight += weight
-            
-            # Calculate ECL under this scenario
-            # In production, would adjust PD/LGD based on macro indicators
-            if stage == Stage.STAGE_1:
-                scenario_ecl = self.calculate_12m_ecl(instrument, reporting_date)
-            else:
-                scenario_ecl = self.calculate_lifetime_ecl(instrument, reporting_date)
-            
-            # Apply scenario adjustment (simplified for MVP)
-            adjustment = Decimal(str(scenario.get("adjustment", 1.0)))
-            scenario_ecl = scenario_ecl * adjustment
-            
-            scenario_results[scenario_id] = scenario_ecl
-            weighted_ecl += weight * scenario_ecl
-        
-        # Property 12: Validate weights sum to 1.0
-        if abs(total_weight - Decimal("1.0")) > Decimal("0.001"):
-            logger.warning(f"Scenario weights sum to {total_weight}, not 1.0")
-        
-        return weighted_ecl.quantize(Decimal("0.01"))
-    
-    def recalculate_portfolio(self, instruments: List[FinancialInstrument], 
-                            reporting_date: date) -> Dict[str, ECLResult]:
+        matrix = ScenarioMatrix.from_scenarios(scenarios)
+        arrays = self.build_portfolio_arrays([instrument], reporting_date)
+        is_12m = np.array([stage == Stage.STAGE_1])
+
+        scenario_ecl, weighted = evaluate_scenarios(
+            self.term_structure_engine, arrays, matrix, is_12m
+        )
+
+        by_id, by_type = scenario_breakdown(matrix, scenario_ecl[:, 0].tolist())
+        scenario_results.update(by_id)
+        if scenario_ecl_by_type is not None:
+            scenario_ecl_by_type.update(by_type)
+        if scenario_weights is not None:
+            scenario_weights.update(zip(matrix.scenario_ids, matrix.weights.tolist()))
+        
+        return to_money(weighted[0])
+
+    def recalculate_portfolio(
+        self,
+        instruments: List[FinancialInstrument],
+        reporting_date: date,
+        vectorized: bool = True,
+        incremental: bool = False,
+        db: Optional[Session] = None,
+        scenarios: Optional[List[Any]] = None,
+    ) -> Dict[str, ECLResult]:
         """
         Calculate ECL for portfolio of instruments.
         
+        By default the portfolio is evaluated by the columnar engine
+        (VectorizedECLEngine), which matches the per-instrument path to the cent.
+        
+        In incremental mode only instruments whose input fingerprint differs
+        from their last ECL calculation are recomputed; the others are carried
+        forward (see IncrementalECLCalculator).
+        
         Args:
             instruments: List of financial instruments
             reporting_date: Reporting date
+            vectorized: Use the columnar engine instead of per-instrument calculation
+            incremental: Recompute changed instruments only (requires db)
+            db: Database session (incremental mode)
+            scenarios: Scenario dicts or ScenarioResult objects for
+                probability-weighted ECL (optional)
             
         Returns:
             Dict mapping instrument_id to ECLResult
         """
-        results = {}
-        for instrument in instruments:
-            result = self.calculate_ecl(instrument, instrument.current_stage, reporting_date)
-            results[instrument.instrument_id] = result
+        if incremental:
+            if db is None:
+                raise ValueError("Incremental recalculation requires a database session")
+            from src.services.ecl_incremental import IncrementalECLCalculator
+
+            return IncrementalECLCalculator(db, self, scenarios).calculate(
+                instruments, reporting_date, vectorized
+            )
+        
+        if vectorized:
+            from src.services.ecl_vectorized import VectorizedECLEngine
+
+            results = VectorizedECLEngine(self).calculate_portfolio(
+                instruments, reporting_date, scenarios
+            )
+        else:
+            results = {}
+            for instrument in instruments:
+                result = self.calculate_ecl(
+                    instrument, instrument.current_stage, reporting_date, scenarios
+                )
+                results[instrument.instrument_id] = result
         
         logger.info(f"Calculated ECL for {len(instruments)} instruments")
         return results
 
+    def build_calculation_record(
+        self,
+        instrument: FinancialInstrument,
+        result: ECLResult,
+        reporting_date: date,
+        portfolio_run_id: Optional[str] = None,
+    ) -> ECLCalculation:
+        """
+        Build the ECLCalculation row for a result.
+        
+        Args:
+            instrument: Financial instrument
+            result: ECL result
+            reporting_date: Reporting date
+            portfolio_run_id: Portfolio run that produced the result (optional)
+            
+        Returns:
+            ECLCalculation (not added to a session)
+        """
+        return ECLCalculation(
+            **self.build_calculation_values(instrument, result, reporting_date, portfolio_run_id)
+        )
+
+    def build_calculation_values(
+        self,
+        instrument: FinancialInstrument,
+        result: ECLResult,
+        reporting_date: date,
+        portfolio_run_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build ECLCalculation column values for a result (used for bulk inserts).
+        
+        Args:
+            instrument: Financial instrument
+            result: ECL result
+            reporting_date: Reporting date
+            portfolio_run_id: Portfolio run that produced the result (optional)
+            
+        Returns:
+            Dict of ECLCalculation column values
+        """
+        return {
+            "calculation_id": result.calculation_id,
+            "instrument_id": instrument.instrument_id,
+            "reporting_date": reporting_date,
+            "stage": instrument.current_stage,
+            "ecl_amount": result.ecl_amount,
+            "pd": result.pd,
+            "lgd": result.lgd,
+            "ead": result.ead,
+            "discount_rate": result.discount_rate or self.default_discount_rate,
+            "calculation_method": "STANDARD",
+            "time_horizon": result.time_horizon,
+            "base_scenario_ecl": result.scenario_ecl_by_type.get(BASE),
+            "upside_scenario_ecl": result.scenario_ecl_by_type.get(UPSIDE),
+            "downside_scenario_ecl": result.scenario_ecl_by_type.get(DOWNSIDE),
+            "scenario_weights": result.scenario_weights or None,
+            "parameters_version": self.parameters_version,
+            "portfolio_run_id": portfolio_run_id,
+            "input_fingerprint": result.input_fingerprint,
+            "carried_forward_from": result.carried_forward_from,
+        }
+
 
 # Global service instance
 ecl_engine = ECLCalculationService()
@@ -0,0 +1,270 @@
+"""Incremental ECL recalculation driven by input fingerprints"""
+
+from typing import Dict, Any, Iterable, List, Optional
+from decimal import Decimal
+from datetime import date
+from enum import Enum
+import hashlib
+import json
+import uuid
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.db.models import FinancialInstrument, ECLCalculation, Collateral
+from src.services.ecl_engine import ECLCalculationService, ECLResult
+from src.services.ecl_scenarios import ScenarioMatrix, BASE, UPSIDE, DOWNSIDE
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Maximum number of bound parameters per IN (...) lookup
+LOOKUP_BATCH_SIZE = 900
+
+
+def _canonical(value: Any) -> str:
+    """Stable text form of a fingerprint component"""
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, Decimal):
+        return format(value.normalize(), "f")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def scenario_set_key(scenarios: Optional[List[Any]]) -> str:
+    """
+    Canonical key for a scenario set (IDs, weights and multipliers).
+
+    Args:
+        scenarios: Scenario dicts or ScenarioResult objects (optional)
+
+    Returns:
+        Key string ("" when no scenarios are applied)
+    """
+    if not scenarios:
+        return ""
+    matrix = ScenarioMatrix.from_scenarios(scenarios)
+    items = sorted(
+        zip(
+            matrix.scenario_ids,
+            matrix.weights.tolist(),
+            matrix.pd_multipliers.tolist(),
+            matrix.lgd_multipliers.tolist(),
+            matrix.ecl_multipliers.tolist(),
+        )
+    )
+    return json.dumps(items)
+
+
+class IncrementalECLCalculator:
+    """
+    Recalculates ECL only for instruments whose inputs changed.
+
+    Each instrument's ECL inputs are hashed into a fingerprint: balance
+    (principal, outstanding, undrawn), stage and days past due, contractual
+    terms (type, maturity, interest rate), PD/LGD parameter version, scenario
+    set, collateral NRV and reporting date. If an ECLCalculation with the same
+    fingerprint exists, its result is carried forward with a reference to the
+    calculation that computed it; only the remaining instruments go through
+    the ECL engine.
+
+    Because the reporting date is part of the fingerprint, results carry
+    forward within a reporting date (re-runs after data corrections, resumed
+    or repeated month-end runs); a new reporting date recomputes every
+    instrument, as the remaining term and discounting have changed.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        ecl_service: Optional[ECLCalculationService] = None,
+        scenarios: Optional[List[Any]] = None,
+    ):
+        self.db = db
+        self.ecl_service = ecl_service or ECLCalculationService()
+        self.scenarios = scenarios
+        self.scenario_key = scenario_set_key(scenarios)
+
+    def fingerprint(
+        self,
+        instrument: FinancialInstrument,
+        reporting_date: date,
+        collateral_nrv: Optional[Decimal] = None,
+    ) -> str:
+        """
+        Fingerprint an instrument's ECL inputs.
+
+        Args:
+            instrument: Financial instrument
+            reporting_date: Reporting date
+            collateral_nrv: Total collateral net realizable value
+
+        Returns:
+            SHA-256 hex digest
+        """
+        components = [
+            instrument.instrument_id,
+            instrument.principal_amount,
+            instrument.outstanding_balance,
+            instrument.undrawn_commitment_amount,
+            instrument.current_stage,
+            instrument.days_past_due,
+            instrument.instrument_type,
+            instrument.maturity_date,
+            instrument.interest_rate,
+            self.ecl_service.parameters_version,
+            self.scenario_key,
+            collateral_nrv,
+            reporting_date,
+        ]
+        payload = "|".join(_canonical(component) for component in components)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def fingerprints(
+        self, instruments: List[FinancialInstrument], reporting_date: date
+    ) -> Dict[str, str]:
+        """
+        Fingerprint a list of instruments.
+
+        Args:
+            instruments: Financial instruments
+            reporting_date: Reporting date
+
+        Returns:
+            Dict mapping instrument_id to fingerprint
+        """
+        nrv = self.load_collateral_nrv([instrument.instrument_id for instrument in instruments])
+        return {
+            instrument.instrument_id: self.fingerprint(
+                instrument, reporting_date, nrv.get(instrument.instrument_id)
+            )
+            for instrument in instruments
+        }
+
+    def load_collateral_nrv(self, instrument_ids: List[str]) -> Dict[str, Decimal]:
+        """
+        Total collateral net realizable value per instrument.
+
+        Args:
+            instrument_ids: Instrument IDs
+
+        Returns:
+            Dict mapping instrument_id to NRV (instruments without collateral are omitted)
+        """
+        nrv = {}
+        for start in range(0, len(instrument_ids), LOOKUP_BATCH_SIZE):
+            batch = instrument_ids[start : start + LOOKUP_BATCH_SIZE]
+            rows = (
+                self.db.query(Collateral.instrument_id, func.sum(Collateral.net_realizable_value))
+                .filter(Collateral.instrument_id.in_(batch))
+                .group_by(Collateral.instrument_id)
+                .all()
+            )
+            for instrument_id, total in rows:
+                nrv[instrument_id] = Decimal(str(total)) if total is not None else None
+        return nrv
+
+    def load_matching_calculations(self, fingerprints: Iterable[str]) -> Dict[str, ECLCalculation]:
+        """
+        Find prior computed ECL calculations by input fingerprint.
+
+        Carried-forward rows are skipped: they share the fingerprint of the
+        calculation they reference.
+
+        Args:
+            fingerprints: Input fingerprints
+
+        Returns:
+            Dict mapping fingerprint to a prior calculation
+        """
+        fingerprints = list(set(fingerprints))
+        matches: Dict[str, ECLCalculation] = {}
+        for start in range(0, len(fingerprints), LOOKUP_BATCH_SIZE):
+            batch = fingerprints[start : start + LOOKUP_BATCH_SIZE]
+            rows = (
+                self.db.query(ECLCalculation)
+                .filter(
+                    ECLCalculation.input_fingerprint.in_(batch),
+                    ECLCalculation.carried_forward_from.is_(None),
+                )
+                .all()
+            )
+            for row in rows:
+                matches.setdefault(row.input_fingerprint, row)
+        return matches
+
+    def calculate(
+        self,
+        instruments: List[FinancialInstrument],
+        reporting_date: date,
+        vectorized: bool = True,
+        carry_forward: bool = True,
+    ) -> Dict[str, ECLResult]:
+        """
+        Calculate ECL, recomputing only instruments with changed inputs.
+
+        Args:
+            instruments: Financial instruments
+            reporting_date: Reporting date
+            vectorized: Use the columnar engine for changed instruments
+            carry_forward: Reuse prior calculations (False recomputes everything
+                but still fingerprints the results for later incremental runs)
+
+        Returns:
+            Dict mapping instrument_id to ECLResult
+        """
+        fingerprints = self.fingerprints(instruments, reporting_date)
+        prior = self.load_matching_calculations(fingerprints.values()) if carry_forward else {}
+
+        changed = [
+            instrument
+            for instrument in instruments
+            if fingerprints[instrument.instrument_id] not in prior
+        ]
+        computed = self.ecl_service.recalculate_portfolio(
+            changed, reporting_date, vectorized, scenarios=self.scenarios
+        )
+
+        results = {}
+        for instrument in instruments:
+            fingerprint = fingerprints[instrument.instrument_id]
+            result = computed.get(instrument.instrument_id)
+            if result is None and fingerprint in prior:
+                result = self._carry_forward(prior[fingerprint])
+            if result is None:
+                continue
+            result.input_fingerprint = fingerprint
+            results[instrument.instrument_id] = result
+
+        logger.info(
+            f"Incremental ECL: {len(changed)} recomputed, "
+            f"{len(instruments) - len(changed)} carried forward"
+        )
+        return results
+
+    @staticmethod
+    def _carry_forward(calculation: ECLCalculation) -> ECLResult:
+        """New result referencing the calculation that originally computed it"""
+        return ECLResult(
+            calculation_id=str(uuid.uuid4()),
+            ecl_amount=calculation.ecl_amount,
+            pd=calculation.pd,
+            lgd=calculation.lgd,
+            ead=calculation.ead,
+            time_horizon=calculation.time_horizon,
+            discount_rate=calculation.discount_rate,
+            carried_forward_from=calculation.calculation_id,
+            scenario_ecl_by_type={
+                scenario_type: amount
+                for scenario_type, amount in (
+                    (BASE, calculation.base_scenario_ecl),
+                    (UPSIDE, calculation.upside_scenario_ecl),
+                    (DOWNSIDE, calculation.downside_scenario_ecl),
+                )
+                if amount is not None
+            },
+            scenario_weights=calculation.scenario_weights,
+        )
@@ -0,0 +1,218 @@
+"""Bulk persistence of ECL results and their audit entries"""
+
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+import csv
+import io
+import json
+from sqlalchemy import insert, Enum as SQLEnum, JSON
+from sqlalchemy.orm import Session
+
+from src.db.models import ECLCalculation, AuditEntry, FinancialInstrument
+from src.services.audit_trail import build_audit_entry, ecl_calculation_state
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# NULL marker in COPY input
+COPY_NULL = "\\N"
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_value(value: Any, column) -> str:
+    """Render a value for COPY ... (FORMAT csv)"""
+    if value is None:
+        return COPY_NULL
+    if isinstance(column.type, JSON):
+        return json.dumps(value, default=str)
+    if isinstance(value, Enum):
+        # SQLAlchemy Enum columns store member names
+        return value.name if isinstance(column.type, SQLEnum) else str(value.value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return str(value)
+
+
+class ECLResultsWriter:
+    """
+    Bulk writer for ECLCalculation and AuditEntry rows.
+
+    Rows are written in chunks of chunk_size inside the caller's transaction
+    (nothing is committed here):
+
+    - "copy": PostgreSQL COPY ... FROM STDIN (psycopg2)
+    - "executemany": SQLAlchemy bulk INSERT (executemany / insertmanyvalues)
+    - "auto": COPY on PostgreSQL with psycopg2, bulk INSERT elsewhere (SQLite)
+    """
+
+    METHODS = ("auto", "copy", "executemany")
+
+    def __init__(self, db: Session, chunk_size: int = 5000, method: str = "auto"):
+        if method not in self.METHODS:
+            raise ValueError(f"Invalid write method: {method}. Must be one of {self.METHODS}")
+        self.db = db
+        self.chunk_size = chunk_size
+        self.method = method
+
+    def write(
+        self, calculations: Iterable[Dict[str, Any]], audit_entries: Iterable[Dict[str, Any]] = ()
+    ) -> Tuple[int, int]:
+        """
+        Write ECL calculations and their audit entries.
+
+        Args:
+            calculations: ECLCalculation column values
+                (see ECLCalculationService.build_calculation_values)
+            audit_entries: AuditEntry column values (see build_audit_entry)
+
+        Returns:
+            Tuple of (calculations written, audit entries written)
+        """
+        written = self.write_rows(ECLCalculation, calculations)
+        audited = self.write_rows(AuditEntry, audit_entries)
+        return written, audited
+
+    def write_results(
+        self,
+        ecl_service,
+        instruments: List[FinancialInstrument],
+        results: Dict[str, Any],
+        reporting_date: date,
+        user_id: str,
+        portfolio_run_id: Optional[str] = None,
+    ) -> int:
+        """
+        Write ECL results and one ECL_CALCULATION audit entry per result.
+
+        Args:
+            ecl_service: ECLCalculationService that produced the results
+            instruments: Calculated instruments
+            results: Dict mapping instrument_id to ECLResult
+            reporting_date: Reporting date
+            user_id: User the calculations are attributed to
+            portfolio_run_id: Portfolio run (optional)
+
+        Returns:
+            Number of calculations written
+        """
+        calculations = []
+        audit_entries = []
+        for instrument in instruments:
+            result = results.get(instrument.instrument_id)
+            if result is None:
+                continue
+            calculations.append(
+                ecl_service.build_calculation_values(
+                    instrument, result, reporting_date, portfolio_run_id
+                )
+            )
+            audit_entries.append(
+                build_audit_entry(
+                    user_id=user_id,
+                    action="ECL_CALCULATION",
+                    entity_type="FinancialInstrument",
+                    entity_id=instrument.instrument_id,
+                    before_state=None,
+                    after_state=ecl_calculation_state(
+                        calculation_id=result.calculation_id,
+                        stage=instrument.current_stage.value,
+                        ecl_amount=float(result.ecl_amount),
+                        pd=float(result.pd),
+                        lgd=float(result.lgd),
+                        ead=float(result.ead),
+                        reporting_date=reporting_date.isoformat(),
+                    ),
+                )
+            )
+
+        written, _ = self.write(calculations, audit_entries)
+        return written
+
+    def write_rows(self, model, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Write rows for a model in chunks.
+
+        Args:
+            model: ORM model class
+            rows: Column values per row (all rows must have the same keys)
+
+        Returns:
+            Number of rows written
+        """
+        use_copy = self._use_copy()
+        if use_copy:
+            # COPY bypasses the session; write pending ORM changes first
+            self.db.flush()
+
+        total = 0
+        for chunk in _chunks(rows, self.chunk_size):
+            if use_copy:
+                self._copy(model, chunk)
+            else:
+                # render_nulls keeps rows with different NULL columns in one executemany
+                self.db.execute(insert(model).execution_options(render_nulls=True), chunk)
+            total += len(chunk)
+
+        if total:
+            logger.debug(
+                f"Wrote {total} {model.__tablename__} rows "
+                f"({'COPY' if use_copy else 'executemany'}, chunk size {self.chunk_size})"
+            )
+        return total
+
+    def _use_copy(self) -> bool:
+        dialect = self.db.get_bind().dialect
+        supported = dialect.name == "postgresql" and dialect.driver == "psycopg2"
+        if self.method == "copy" and not supported:
+            raise ValueError(f"COPY is not supported on {dialect.name}+{dialect.driver}")
+        return supported and self.method in ("auto", "copy")
+
+    def _copy(self, model, rows: Sequence[Dict[str, Any]]):
+        """Stream rows with COPY ... FROM STDIN in the session's transaction"""
+        table = model.__table__
+        columns = list(rows[0].keys())
+        # COPY does not apply Python-side column defaults (e.g. is_deleted)
+        defaults = {
+            column.name: column.default.arg
+            for column in table.columns
+            if column.name not in rows[0]
+            and column.default is not None
+            and column.default.is_scalar
+        }
+        columns.extend(defaults)
+        preparer = self.db.get_bind().dialect.identifier_preparer
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(
+                [_copy_value(row.get(name, defaults.get(name)), table.c[name]) for name in columns]
+            )
+        buffer.seek(0)
+
+        statement = (
+            f"COPY {preparer.format_table(table)} "
+            f"({', '.join(preparer.quote(name) for name in columns)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        )
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(statement, buffer)
+        finally:
+            cursor.close()
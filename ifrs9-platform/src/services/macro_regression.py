@@ -1,10 +1,13 @@
 """Macro regression service for linking macroeconomic variables to PD/LGD"""
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from decimal import Decimal
 from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import uuid
 from sqlalchemy.orm import Session
 import numpy as np
-from sklearn.linear_model import LinearRegression
+import pandas as pd
 
 from src.db.models import MacroScenario, MacroRegressionModel, ParameterType
 from src.utils.logging_config import get_logger
@@ -31,6 +34,94 @@ class MacroAdjustmentResult:
         self.calculation_details = calculation_details
 
 
+class MacroAdjustmentFactors:
+    """Macro adjustment factors for several segments, scenarios and horizons"""
+
+    def __init__(
+        self,
+        segments: List[str],
+        scenario_names: List[str],
+        variables: List[str],
+        scenario_matrix: np.ndarray,
+        factors: np.ndarray,
+        models: Dict[str, MacroRegressionModel],
+    ):
+        self.segments = segments
+        self.scenario_names = scenario_names
+        self.variables = variables
+        self.scenario_matrix = scenario_matrix  # scenarios × horizons × variables
+        self.factors = factors  # segments × scenarios × horizons
+        self.models = models  # Segments without a model have factor 1.0
+
+
+def scenario_variable_path(value: Any, horizons: int) -> np.ndarray:
+    """
+    Values of one macro variable over the scenario horizons.
+    
+    Scenario indicators are scalars, lists (one value per period) or dicts
+    keyed by period (e.g. {"2026": 5.5, "2027": 5.8}); shorter paths are
+    extended with their last value.
+    
+    Args:
+        value: Indicator value from the scenario
+        horizons: Number of horizons
+        
+    Returns:
+        Array of length horizons
+    """
+    if value is None:
+        values = [0.0]
+    elif isinstance(value, dict):
+        values = [value[key] for key in sorted(value, key=str)] or [0.0]
+    elif isinstance(value, (list, tuple)):
+        values = list(value) or [0.0]
+    else:
+        values = [value]
+    
+    path = np.array([float(v or 0) for v in values[:horizons]])
+    if len(path) < horizons:
+        path = np.concatenate([path, np.full(horizons - len(path), path[-1])])
+    return path
+
+
+def scenario_horizons(value: Any) -> int:
+    """Number of periods in a scenario indicator"""
+    if isinstance(value, (dict, list, tuple)):
+        return max(len(value), 1)
+    return 1
+
+
+def _fit_segments(
+    segments: List[Tuple[str, np.ndarray, np.ndarray]], variables: List[str]
+) -> List[Tuple[str, Dict[str, float], Optional[float]]]:
+    """
+    Fit one linear regression per segment (runs in a worker process).
+    
+    Args:
+        segments: (segment, feature matrix, target vector) per segment
+        variables: Feature names (columns of the feature matrices)
+        
+    Returns:
+        (segment, coefficients, R²) per segment
+    """
+    # Imported here: sklearn takes ~1.5s to load and only fitting needs it
+    from sklearn.linear_model import LinearRegression
+    
+    fitted = []
+    for segment, X, y in segments:
+        model = LinearRegression()
+        model.fit(X, y)
+        
+        coefficients = {"intercept": float(model.intercept_)}
+        coefficients.update(zip(variables, (float(c) for c in model.coef_)))
+        
+        r_squared = float(model.score(X, y)) if len(y) > 1 else None
+        if r_squared is not None and not np.isfinite(r_squared):
+            r_squared = None
+        fitted.append((segment, coefficients, r_squared))
+    return fitted
+
+
 class MacroRegressionService:
     """Service for macroeconomic regression models and adjustments"""
     
@@ -45,6 +136,12 @@ class MacroRegressionService:
         "lending_rate"
     ]
     
+    # Adjustment factor bounds (multiplicative)
+    FACTOR_BOUNDS = {
+        ParameterType.PD: (0.5, 2.0),
+        ParameterType.LGD: (0.5, 1.5),
+    }
+    
     def calibrate_pd_macro_model(
         self,
         db: Session,
@@ -66,56 +163,10 @@ class MacroRegressionService:
         """
         logger.info(f"Calibrating PD macro model for segment {segment}")
         
-        # Prepare data for regression
-        X = []  # Macro variables
-        y = []  # PD values
-        
-        for record in historical_data:
-            macro_vars = [
-                record.get("gdp_growth_rate", 0),
-                record.get("inflation_rate", 0),
-                record.get("central_bank_rate", 0),
-                record.get("ugx_usd_exchange_rate", 0),
-                record.get("coffee_price_index", 0),
-                record.get("oil_price_usd", 0),
-                record.get("lending_rate", 0)
-            ]
-            X.append(macro_vars)
-            y.append(float(record.get("pd", 0)))
-        
-        # Fit linear regression model
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Extract coefficients
-        coefficients = {
-            "intercept": float(model.intercept_),
-            "gdp_growth_rate": float(model.coef_[0]),
-            "inflation_rate": float(model.coef_[1]),
-            "central_bank_rate": float(model.coef_[2]),
-            "ugx_usd_exchange_rate": float(model.coef_[3]),
-            "coffee_price_index": float(model.coef_[4]),
-            "oil_price_usd": float(model.coef_[5]),
-            "lending_rate": float(model.coef_[6])
-        }
-        
-        # Calculate R-squared
-        r_squared = float(model.score(X, y))
-        
-        # Save model to database
-        regression_model = MacroRegressionModel(
-            parameter_type=ParameterType.PD,
-            segment=segment,
-            coefficients=coefficients,
-            r_squared=r_squared,
-            calibration_date=date.today(),
-            is_active=True
-        )
-        
-        db.add(regression_model)
-        db.commit()
+        frame = pd.DataFrame(historical_data).assign(segment=segment)
+        regression_model = self.calibrate_segments(db, frame, ParameterType.PD, max_workers=0)[0]
         
-        logger.info(f"PD macro model calibrated: R² = {r_squared}")
+        logger.info(f"PD macro model calibrated: R² = {regression_model.r_squared}")
         
         return regression_model
     
@@ -140,58 +191,179 @@ class MacroRegressionService:
         """
         logger.info(f"Calibrating LGD macro model for segment {segment}")
         
-        # Prepare data for regression
-        X = []  # Macro variables
-        y = []  # LGD values
-        
-        for record in historical_data:
-            macro_vars = [
-                record.get("gdp_growth_rate", 0),
-                record.get("inflation_rate", 0),
-                record.get("central_bank_rate", 0),
-                record.get("ugx_usd_exchange_rate", 0),
-                record.get("coffee_price_index", 0),
-                record.get("oil_price_usd", 0),
-                record.get("lending_rate", 0)
-            ]
-            X.append(macro_vars)
-            y.append(float(record.get("lgd", 0)))
+        frame = pd.DataFrame(historical_data).assign(segment=segment)
+        regression_model = self.calibrate_segments(db, frame, ParameterType.LGD, max_workers=0)[0]
         
-        # Fit linear regression model
-        model = LinearRegression()
-        model.fit(X, y)
+        logger.info(f"LGD macro model calibrated: R² = {regression_model.r_squared}")
         
-        # Extract coefficients
-        coefficients = {
-            "intercept": float(model.intercept_),
-            "gdp_growth_rate": float(model.coef_[0]),
-            "inflation_rate": float(model.coef_[1]),
-            "central_bank_rate": float(model.coef_[2]),
-            "ugx_usd_exchange_rate": float(model.coef_[3]),
-            "coffee_price_index": float(model.coef_[4]),
-            "oil_price_usd": float(model.coef_[5]),
-            "lending_rate": float(model.coef_[6])
-        }
+        return regression_model
+    
+    def calibrate_segments(
+        self,
+        db: Session,
+        data: pd.DataFrame,
+        parameter_type: ParameterType = ParameterType.PD,
+        segment_column: str = "segment",
+        variables: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        calibration_date: Optional[date] = None,
+    ) -> List[MacroRegressionModel]:
+        """
+        Calibrate macro regression models for many segments at once.
         
-        # Calculate R-squared
-        r_squared = float(model.score(X, y))
-        
-        # Save model to database
-        regression_model = MacroRegressionModel(
-            parameter_type=ParameterType.LGD,
-            segment=segment,
-            coefficients=coefficients,
-            r_squared=r_squared,
-            calibration_date=date.today(),
-            is_active=True
+        The feature matrix is built for the whole long-format frame in one
+        step (missing variables count as 0), segments are fitted concurrently
+        on a process pool and all MacroRegressionModel rows are written in
+        one transaction.
+        
+        Args:
+            db: Database session
+            data: One row per segment and period with the target column
+                ("pd" or "lgd"), the segment column and macro variables
+            parameter_type: PD or LGD
+            segment_column: Column holding the segment
+            variables: Macro variables (default: UGANDA_MACRO_VARIABLES)
+            max_workers: Worker processes (default: CPU count, 0 fits in process)
+            calibration_date: Calibration date (default: today)
+            
+        Returns:
+            Calibrated MacroRegressionModel records (one per segment)
+        """
+        parameter_type = ParameterType(parameter_type)
+        variables = list(variables or self.UGANDA_MACRO_VARIABLES)
+        target = parameter_type.value.lower()
+        
+        if data.empty:
+            raise ValueError("No calibration data provided")
+        
+        # Vectorized feature matrix for all segments
+        X = (
+            data.reindex(columns=variables)
+            .apply(pd.to_numeric, errors="coerce")
+            .fillna(0.0)
+            .to_numpy(dtype=float)
         )
+        y = pd.to_numeric(data.get(target, pd.Series(0.0, index=data.index)), errors="coerce")
+        y = y.fillna(0.0).to_numpy(dtype=float)
+        groups = data.groupby(segment_column, sort=True).indices
+        
+        segments = [(segment, X[rows], y[rows]) for segment, rows in groups.items()]
+        workers = multiprocessing.cpu_count() if max_workers is None else max_workers
+        
+        logger.info(f"Calibrating {target.upper()} macro models for {len(segments)} segments")
+        
+        if workers > 0 and len(segments) > 1:
+            workers = min(workers, len(segments))
+            batches = [segments[i::workers] for i in range(workers)]
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = [executor.submit(_fit_segments, batch, variables) for batch in batches]
+                fitted = [result for future in futures for result in future.result()]
+        else:
+            fitted = _fit_segments(segments, variables)
+        
+        calibration_date = calibration_date or date.today()
+        models = [
+            MacroRegressionModel(
+                model_id=str(uuid.uuid4()),
+                dependent_variable=parameter_type.value,
+                coefficients=coefficients,
+                r_squared=Decimal(str(round(r_squared, 4))) if r_squared is not None else None,
+                calibration_date=calibration_date,
+                portfolio_segment=str(segment),
+            )
+            for segment, coefficients, r_squared in sorted(fitted, key=lambda item: str(item[0]))
+        ]
         
-        db.add(regression_model)
+        # Save all models in one transaction
+        db.add_all(models)
         db.commit()
         
-        logger.info(f"LGD macro model calibrated: R² = {r_squared}")
+        logger.info(f"Calibrated {len(models)} {target.upper()} macro models")
         
-        return regression_model
+        return models
+    
+    def batch_macro_adjustment(
+        self,
+        db: Session,
+        scenarios: List[Any],
+        segments: List[str],
+        parameter_type: ParameterType = ParameterType.PD,
+        horizons: Optional[int] = None,
+    ) -> MacroAdjustmentFactors:
+        """
+        Macro adjustment factors for all segments, scenarios and horizons.
+        
+        Coefficients are loaded once (one query for all segments) into a
+        segments × variables matrix; scenario paths form a
+        scenarios × horizons × variables tensor, so every factor comes from
+        one einsum:
+        
+            factor = clip(1 + β0 + Σ β_v × x_v, bounds)
+        
+        Args:
+            db: Database session
+            scenarios: MacroScenario objects or dicts of variable values
+            segments: Portfolio segments
+            parameter_type: PD or LGD
+            horizons: Number of scenario periods (default: longest scenario path)
+            
+        Returns:
+            MacroAdjustmentFactors (factors of shape segments × scenarios × horizons)
+        """
+        models = self._load_models(db, segments, parameter_type)
+        
+        # Variable axis: standard variables, then any others the models use
+        variables = list(self.UGANDA_MACRO_VARIABLES)
+        for model in models.values():
+            variables.extend(
+                sorted(
+                    name
+                    for name in model.coefficients
+                    if name != "intercept" and name not in variables
+                )
+            )
+
+        values = [
+            [self._scenario_value(scenario, name) for name in variables] for scenario in scenarios
+        ]
+        if horizons is None:
+            horizons = max((scenario_horizons(value) for row in values for value in row), default=1)
+
+        scenario_matrix = np.array(
+            [
+                np.stack([scenario_variable_path(value, horizons) for value in row], axis=-1)
+                for row in values
+            ]
+        ).reshape(len(scenarios), horizons, len(variables))
+
+        coefficients = np.zeros((len(segments), len(variables)))
+        intercepts = np.zeros(len(segments))
+        has_model = np.zeros(len(segments), dtype=bool)
+        for g, segment in enumerate(segments):
+            model = models.get(segment)
+            if model is None:
+                continue
+            has_model[g] = True
+            intercepts[g] = float(model.coefficients.get("intercept", 0.0))
+            coefficients[g] = [float(model.coefficients.get(name, 0.0)) for name in variables]
+        
+        lower, upper = self.FACTOR_BOUNDS[ParameterType(parameter_type)]
+        adjustment = intercepts[:, None, None] + np.einsum(
+            "gv,shv->gsh", coefficients, scenario_matrix
+        )
+        factors = np.where(has_model[:, None, None], np.clip(1.0 + adjustment, lower, upper), 1.0)
+        
+        return MacroAdjustmentFactors(
+            segments=list(segments),
+            scenario_names=[
+                self._scenario_value(scenario, "scenario_name") for scenario in scenarios
+            ],
+            variables=variables,
+            scenario_matrix=scenario_matrix,
+            factors=factors,
+            models=models,
+        )
     
     def apply_macro_adjustment_pd(
         self,
@@ -213,76 +385,7 @@ class MacroRegressionService:
             MacroAdjustmentResult with adjusted PD
         """
         logger.info(f"Applying macro adjustment to PD for segment {segment}")
-        
-        # Fetch regression model
-        model = db.query(MacroRegressionModel).filter(
-            MacroRegressionModel.parameter_type == ParameterType.PD,
-            MacroRegressionModel.segment == segment,
-            MacroRegressionModel.is_active == True
-        ).first()
-        
-        if not model:
-            logger.warning(f"No macro model found for segment {segment}, using base PD")
-            return MacroAdjustmentResult(
-                base_value=base_pd,
-                adjusted_value=base_pd,
-                adjustment_factor=Decimal("1.0"),
-                scenario_name=scenario.scenario_name,
-                macro_variables={},
-                calculation_details={"note": "No macro model available"}
-            )
-        
-        # Extract macro variables from scenario
-        macro_vars = {
-            "gdp_growth_rate": float(scenario.gdp_growth_rate or 0),
-            "inflation_rate": float(scenario.inflation_rate or 0),
-            "central_bank_rate": float(scenario.central_bank_rate or 0),
-            "ugx_usd_exchange_rate": float(scenario.ugx_usd_exchange_rate or 0),
-            "coffee_price_index": float(scenario.coffee_price_index or 0),
-            "oil_price_usd": float(scenario.oil_price_usd or 0),
-            "lending_rate": float(scenario.lending_rate or 0)
-        }
-        
-        # Calculate adjustment factor using regression coefficients
-        coef = model.coefficients
-        adjustment = (
-            coef["intercept"] +
-            coef["gdp_growth_rate"] * macro_vars["gdp_growth_rate"] +
-            coef["inflation_rate"] * macro_vars["inflation_rate"] +
-            coef["central_bank_rate"] * macro_vars["central_bank_rate"] +
-            coef["ugx_usd_exchange_rate"] * macro_vars["ugx_usd_exchange_rate"] +
-            coef["coffee_price_index"] * macro_vars["coffee_price_index"] +
-            coef["oil_price_usd"] * macro_vars["oil_price_usd"] +
-            coef["lending_rate"] * macro_vars["lending_rate"]
-        )
-        
-        # Convert to adjustment factor (multiplicative)
-        adjustment_factor = Decimal(str(max(0.5, min(2.0, 1.0 + adjustment))))  # Cap between 0.5x and 2.0x
-        
-        # Apply adjustment
-        adjusted_pd = base_pd * adjustment_factor
-        
-        # Cap PD at 100%
-        adjusted_pd = min(adjusted_pd, Decimal("1.0"))
-        
-        calculation_details = {
-            "model_r_squared": model.r_squared,
-            "base_pd": float(base_pd),
-            "adjustment_factor": float(adjustment_factor),
-            "adjusted_pd": float(adjusted_pd),
-            "coefficients": coef
-        }
-        
-        logger.info(f"PD adjusted: {base_pd} → {adjusted_pd} (factor: {adjustment_factor})")
-        
-        return MacroAdjustmentResult(
-            base_value=base_pd,
-            adjusted_value=adjusted_pd,
-            adjustment_factor=adjustment_factor,
-            scenario_name=scenario.scenario_name,
-            macro_variables=macro_vars,
-            calculation_details=calculation_details
-        )
+        return self._apply_macro_adjustment(db, base_pd, scenario, segment, ParameterType.PD)
     
     def apply_macro_adjustment_lgd(
         self,
@@ -304,77 +407,89 @@ class MacroRegressionService:
             MacroAdjustmentResult with adjusted LGD
         """
         logger.info(f"Applying macro adjustment to LGD for segment {segment}")
+        return self._apply_macro_adjustment(db, base_lgd, scenario, segment, ParameterType.LGD)
+    
+    def _apply_macro_adjustment(
+        self,
+        db: Session,
+        base_value: Decimal,
+        scenario: MacroScenario,
+        segment: str,
+        parameter_type: ParameterType,
+    ) -> MacroAdjustmentResult:
+        """Adjust one value with the first-period factor of a scenario"""
+        batch = self.batch_macro_adjustment(db, [scenario], [segment], parameter_type, horizons=1)
+        scenario_name = batch.scenario_names[0]
+        name = parameter_type.value.lower()
         
-        # Fetch regression model
-        model = db.query(MacroRegressionModel).filter(
-            MacroRegressionModel.parameter_type == ParameterType.LGD,
-            MacroRegressionModel.segment == segment,
-            MacroRegressionModel.is_active == True
-        ).first()
-        
+        model = batch.models.get(segment)
         if not model:
-            logger.warning(f"No macro model found for segment {segment}, using base LGD")
+            logger.warning(
+                f"No macro model found for segment {segment}, using base {parameter_type.value}"
+            )
             return MacroAdjustmentResult(
-                base_value=base_lgd,
-                adjusted_value=base_lgd,
+                base_value=base_value,
+                adjusted_value=base_value,
                 adjustment_factor=Decimal("1.0"),
-                scenario_name=scenario.scenario_name,
+                scenario_name=scenario_name,
                 macro_variables={},
-                calculation_details={"note": "No macro model available"}
+                calculation_details={"note": "No macro model available"},
             )
         
-        # Extract macro variables from scenario
-        macro_vars = {
-            "gdp_growth_rate": float(scenario.gdp_growth_rate or 0),
-            "inflation_rate": float(scenario.inflation_rate or 0),
-            "central_bank_rate": float(scenario.central_bank_rate or 0),
-            "ugx_usd_exchange_rate": float(scenario.ugx_usd_exchange_rate or 0),
-            "coffee_price_index": float(scenario.coffee_price_index or 0),
-            "oil_price_usd": float(scenario.oil_price_usd or 0),
-            "lending_rate": float(scenario.lending_rate or 0)
-        }
+        adjustment_factor = Decimal(str(float(batch.factors[0, 0, 0])))
         
-        # Calculate adjustment factor using regression coefficients
-        coef = model.coefficients
-        adjustment = (
-            coef["intercept"] +
-            coef["gdp_growth_rate"] * macro_vars["gdp_growth_rate"] +
-            coef["inflation_rate"] * macro_vars["inflation_rate"] +
-            coef["central_bank_rate"] * macro_vars["central_bank_rate"] +
-            coef["ugx_usd_exchange_rate"] * macro_vars["ugx_usd_exchange_rate"] +
-            coef["coffee_price_index"] * macro_vars["coffee_price_index"] +
-            coef["oil_price_usd"] * macro_vars["oil_price_usd"] +
-            coef["lending_rate"] * macro_vars["lending_rate"]
-        )
-        
-        # Convert to adjustment factor (multiplicative)
-        adjustment_factor = Decimal(str(max(0.5, min(1.5, 1.0 + adjustment))))  # Cap between 0.5x and 1.5x
-        
-        # Apply adjustment
-        adjusted_lgd = base_lgd * adjustment_factor
-        
-        # Cap LGD at 100%
-        adjusted_lgd = min(adjusted_lgd, Decimal("1.0"))
+        # Apply adjustment, capped at 100%
+        adjusted_value = min(base_value * adjustment_factor, Decimal("1.0"))
         
         calculation_details = {
             "model_r_squared": model.r_squared,
-            "base_lgd": float(base_lgd),
+            f"base_{name}": float(base_value),
             "adjustment_factor": float(adjustment_factor),
-            "adjusted_lgd": float(adjusted_lgd),
-            "coefficients": coef
+            f"adjusted_{name}": float(adjusted_value),
+            "coefficients": model.coefficients,
         }
-        
-        logger.info(f"LGD adjusted: {base_lgd} → {adjusted_lgd} (factor: {adjustment_factor})")
-        
+
+        logger.info(
+            f"{parameter_type.value} adjusted: {base_value} → {adjusted_value} "
+            f"(factor: {adjustment_factor})"
+        )
+
         return MacroAdjustmentResult(
-            base_value=base_lgd,
-            adjusted_value=adjusted_lgd,
+            base_value=base_value,
+            adjusted_value=adjusted_value,
             adjustment_factor=adjustment_factor,
-            scenario_name=scenario.scenario_name,
-            macro_variables=macro_vars,
-            calculation_details=calculation_details
+            scenario_name=scenario_name,
+            macro_variables=dict(zip(batch.variables, batch.scenario_matrix[0, 0].tolist())),
+            calculation_details=calculation_details,
         )
     
+    def _load_models(
+        self, db: Session, segments: List[str], parameter_type: ParameterType
+    ) -> Dict[str, MacroRegressionModel]:
+        """Latest calibrated model per segment (one query)"""
+        rows = (
+            db.query(MacroRegressionModel)
+            .filter(
+                MacroRegressionModel.dependent_variable == ParameterType(parameter_type).value,
+                MacroRegressionModel.portfolio_segment.in_(list(set(segments))),
+            )
+            .order_by(
+                MacroRegressionModel.calibration_date.desc(), MacroRegressionModel.created_at.desc()
+            )
+            .all()
+        )
+
+        models = {}
+        for model in rows:
+            models.setdefault(model.portfolio_segment, model)
+        return models
+    
+    @staticmethod
+    def _scenario_value(scenario: Any, name: str) -> Any:
+        if isinstance(scenario, dict):
+            return scenario.get(name)
+        return getattr(scenario, name, None)
+    
     def validate_scenario_weights(self, scenarios: List[MacroScenario]) -> bool:
         """
         Validate that scenario weights sum to 1.0.
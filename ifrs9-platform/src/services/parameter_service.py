@@ -1,23 +1,132 @@
 """Parameter lookup service for PD, LGD, EAD"""
-from typing import Optional
+from typing import Callable, Iterable, Optional
 from decimal import Decimal
 from datetime import date
+import os
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from src.db.models import ParameterSet, ParameterType, CustomerType
+from src.services.parameter_snapshot import ParameterSnapshot
 from src.utils.logging_config import get_logger
-from src.utils.cache import get_cache, set_cache
+from src.utils.cache import get_or_compute, mget_computed, VersionedLocalCache
 
 logger = get_logger(__name__)
 
+# Redis counter bumped whenever parameters change
+PARAMETER_VERSION_KEY = "parameter:version"
+
+# In-process (L1) parameter cache in front of Redis
+parameter_cache = VersionedLocalCache(
+    PARAMETER_VERSION_KEY,
+    maxsize=int(os.getenv("PARAMETER_CACHE_SIZE", "100000")),
+    ttl=float(os.getenv("PARAMETER_CACHE_TTL", "300")),
+    version_check_interval=float(os.getenv("PARAMETER_CACHE_VERSION_CHECK", "1.0")),
+)
+
 
 class ParameterService:
-    """Service for looking up risk parameters (PD, LGD, EAD)"""
+    """
+    Service for looking up risk parameters (PD, LGD, EAD).
+    
+    With a ParameterSnapshot, PD/LGD/EAD lookups are answered from the
+    snapshot (no cache or database access), so a run sees one fixed set of
+    parameters.
+    """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, snapshot: Optional[ParameterSnapshot] = None):
         self.db = db
+        self.snapshot = snapshot
         self.cache_ttl = 3600  # 1 hour cache
     
+    def _active_parameters(self, parameter_type: ParameterType, effective_date: date):
+        """Query for parameters of a type in force on a date"""
+        return self.db.query(ParameterSet).filter(
+            ParameterSet.parameter_type == parameter_type,
+            ParameterSet.effective_date <= effective_date,
+            or_(ParameterSet.expiry_date.is_(None), ParameterSet.expiry_date > effective_date),
+        )
+    
+    def _lookup(self, cache_key: str, load: Callable[[], Decimal]) -> Decimal:
+        """
+        Resolve a parameter through the in-process cache, Redis, then the database.
+        
+        Values are kept as Decimal in memory and stored as decimal strings in
+        Redis (under the current parameter version), so no float round trip.
+        Concurrent misses for a key run one database query (get_or_compute).
+        
+        Args:
+            cache_key: Cache key
+            load: Database lookup for a miss
+            
+        Returns:
+            Parameter value
+        """
+        value = parameter_cache.get(cache_key)
+        if value is not None:
+            return value
+
+        value = Decimal(
+            get_or_compute(
+                parameter_cache.versioned_key(cache_key), lambda: str(load()), expire=self.cache_ttl
+            )
+        )
+        parameter_cache.set(cache_key, value)
+        return value
+    
+    @staticmethod
+    def pd_cache_key(
+        customer_type: CustomerType,
+        product_type: str,
+        credit_rating: Optional[str],
+        time_horizon_months: int,
+        effective_date: date,
+    ) -> str:
+        return (
+            f"pd:{customer_type.value}:{product_type}:{credit_rating}:"
+            f"{time_horizon_months}:{effective_date}"
+        )
+    
+    @staticmethod
+    def lgd_cache_key(
+        customer_type: CustomerType,
+        product_type: str,
+        credit_rating: Optional[str],
+        effective_date: date,
+    ) -> str:
+        return f"lgd:{customer_type.value}:{product_type}:{credit_rating}:{effective_date}"
+    
+    @staticmethod
+    def ead_cache_key(customer_type: CustomerType, product_type: str, effective_date: date) -> str:
+        return f"ead:{customer_type.value}:{product_type}:{effective_date}"
+    
+    def prefetch(self, cache_keys: Iterable[str]) -> int:
+        """
+        Load parameters from Redis into the in-process cache in bulk.
+        
+        Keys already cached locally are skipped; the rest are read with one
+        MGET per batch instead of one GET per lookup.
+        
+        Args:
+            cache_keys: Cache keys (as built by the get_* methods)
+            
+        Returns:
+            Number of parameters loaded
+        """
+        parameter_cache.check_version()
+        missing = [key for key in dict.fromkeys(cache_keys) if parameter_cache.get(key) is None]
+        if not missing:
+            return 0
+        
+        found = mget_computed([parameter_cache.versioned_key(key) for key in missing])
+        loaded = 0
+        for key in missing:
+            cached_value = found.get(parameter_cache.versioned_key(key))
+            if cached_value is not None:
+                parameter_cache.set(key, Decimal(str(cached_value)))
+                loaded += 1
+        return loaded
+    
     def get_pd(self, customer_type: CustomerType, product_type: str, 
                credit_rating: Optional[str], time_horizon_months: int,
                effective_date: date) -> Decimal:
@@ -40,31 +149,46 @@ class ParameterService:
         Returns:
             PD value
         """
+        if self.snapshot is not None:
+            value = self.snapshot.resolve(
+                ParameterType.PD,
+                customer_type.value,
+                product_type,
+                credit_rating,
+                as_of=effective_date,
+            )
+            return value if value is not None else Decimal("0.02")
+        
         # Build cache key
-        cache_key = f"pd:{customer_type.value}:{product_type}:{credit_rating}:{time_horizon_months}:{effective_date}"
-        
-        # Check cache
-        cached_value = get_cache(cache_key)
-        if cached_value is not None:
-            logger.debug(f"PD cache hit: {cache_key}")
-            return Decimal(str(cached_value))
-        
-        # Query database
-        query = self.db.query(ParameterSet).filter(
-            ParameterSet.parameter_type == ParameterType.PD,
-            ParameterSet.is_active == True,
-            ParameterSet.effective_date <= effective_date
+        cache_key = self.pd_cache_key(
+            customer_type, product_type, credit_rating, time_horizon_months, effective_date
         )
+
+        return self._lookup(
+            cache_key,
+            lambda: self._load_pd(
+                customer_type, product_type, credit_rating, time_horizon_months, effective_date
+            ),
+        )
+
+    def _load_pd(
+        self,
+        customer_type: CustomerType,
+        product_type: str,
+        credit_rating: Optional[str],
+        time_horizon_months: int,
+        effective_date: date,
+    ) -> Decimal:
+        """Query the PD parameter"""
+        query = self._active_parameters(ParameterType.PD, effective_date)
         
         # Apply segmentation filters
         if customer_type:
-            query = query.filter(ParameterSet.customer_type == customer_type)
+            query = query.filter(ParameterSet.customer_segment == customer_type.value)
         if product_type:
             query = query.filter(ParameterSet.product_type == product_type)
         if credit_rating:
             query = query.filter(ParameterSet.credit_rating == credit_rating)
-        if time_horizon_months:
-            query = query.filter(ParameterSet.time_horizon_months == time_horizon_months)
         
         # Order by effective_date descending to get most recent
         query = query.order_by(ParameterSet.effective_date.desc())
@@ -72,16 +196,13 @@ class ParameterService:
         parameter = query.first()
         
         if parameter:
-            pd_value = parameter.value
+            pd_value = parameter.parameter_value
             logger.info(f"PD found: {pd_value} for {customer_type.value}/{product_type}")
         else:
             # Fallback to default
             pd_value = Decimal("0.02")  # 2% default
             logger.warning(f"No PD found for {customer_type.value}/{product_type}, using default {pd_value}")
         
-        # Cache result
-        set_cache(cache_key, float(pd_value), expire=self.cache_ttl)
-        
         return pd_value
     
     def get_lgd(self, customer_type: CustomerType, product_type: str,
@@ -98,25 +219,37 @@ class ParameterService:
         Returns:
             LGD value
         """
+        if self.snapshot is not None:
+            value = self.snapshot.resolve(
+                ParameterType.LGD,
+                customer_type.value,
+                product_type,
+                credit_rating,
+                as_of=effective_date,
+            )
+            return value if value is not None else Decimal("0.45")
+        
         # Build cache key
-        cache_key = f"lgd:{customer_type.value}:{product_type}:{credit_rating}:{effective_date}"
-        
-        # Check cache
-        cached_value = get_cache(cache_key)
-        if cached_value is not None:
-            logger.debug(f"LGD cache hit: {cache_key}")
-            return Decimal(str(cached_value))
-        
-        # Query database
-        query = self.db.query(ParameterSet).filter(
-            ParameterSet.parameter_type == ParameterType.LGD,
-            ParameterSet.is_active == True,
-            ParameterSet.effective_date <= effective_date
+        cache_key = self.lgd_cache_key(customer_type, product_type, credit_rating, effective_date)
+
+        return self._lookup(
+            cache_key,
+            lambda: self._load_lgd(customer_type, product_type, credit_rating, effective_date),
         )
+
+    def _load_lgd(
+        self,
+        customer_type: CustomerType,
+        product_type: str,
+        credit_rating: Optional[str],
+        effective_date: date,
+    ) -> Decimal:
+        """Query the LGD parameter"""
+        query = self._active_parameters(ParameterType.LGD, effective_date)
         
         # Apply segmentation filters
         if customer_type:
-            query = query.filter(ParameterSet.customer_type == customer_type)
+            query = query.filter(ParameterSet.customer_segment == customer_type.value)
         if product_type:
             query = query.filter(ParameterSet.product_type == product_type)
         if credit_rating:
@@ -128,16 +261,13 @@ class ParameterService:
         parameter = query.first()
         
         if parameter:
-            lgd_value = parameter.value
+            lgd_value = parameter.parameter_value
             logger.info(f"LGD found: {lgd_value} for {customer_type.value}/{product_type}")
         else:
             # Fallback to default
             lgd_value = Decimal("0.45")  # 45% default
             logger.warning(f"No LGD found for {customer_type.value}/{product_type}, using default {lgd_value}")
         
-        # Cache result
-        set_cache(cache_key, float(lgd_value), expire=self.cache_ttl)
-        
         return lgd_value
     
     def get_ead(self, customer_type: CustomerType, product_type: str,
@@ -158,41 +288,46 @@ class ParameterService:
             EAD value
         """
         # Build cache key
-        cache_key = f"ead:{customer_type.value}:{product_type}:{effective_date}"
-        
-        # Check cache for credit conversion factor
-        cached_ccf = get_cache(cache_key)
+        cache_key = self.ead_cache_key(customer_type, product_type, effective_date)
         
-        if cached_ccf is None:
-            # Query database for credit conversion factor
-            query = self.db.query(ParameterSet).filter(
-                ParameterSet.parameter_type == ParameterType.EAD,
-                ParameterSet.is_active == True,
-                ParameterSet.effective_date <= effective_date
+        # Credit conversion factor (cached)
+        if self.snapshot is not None:
+            ccf = self.snapshot.resolve(
+                ParameterType.EAD, customer_type.value, product_type, as_of=effective_date
             )
-            
-            if customer_type:
-                query = query.filter(ParameterSet.customer_type == customer_type)
-            if product_type:
-                query = query.filter(ParameterSet.product_type == product_type)
-            
-            query = query.order_by(ParameterSet.effective_date.desc())
-            parameter = query.first()
-            
-            if parameter:
-                cached_ccf = float(parameter.value)
-                logger.info(f"EAD CCF found: {cached_ccf} for {customer_type.value}/{product_type}")
-            else:
-                cached_ccf = 1.0  # Default: EAD = outstanding balance
-                logger.debug(f"No EAD CCF found, using default 1.0")
-            
-            # Cache result
-            set_cache(cache_key, cached_ccf, expire=self.cache_ttl)
-        
+            ccf = ccf if ccf is not None else Decimal("1.0")
+        else:
+            ccf = self._lookup(
+                cache_key, lambda: self._load_ccf(customer_type, product_type, effective_date)
+            )
+
         # For MVP, EAD = outstanding balance × credit conversion factor
-        ead_value = outstanding_balance * Decimal(str(cached_ccf))
+        ead_value = outstanding_balance * ccf
         
         return ead_value
+
+    def _load_ccf(
+        self, customer_type: CustomerType, product_type: str, effective_date: date
+    ) -> Decimal:
+        """Query the EAD credit conversion factor"""
+        query = self._active_parameters(ParameterType.EAD, effective_date)
+        
+        if customer_type:
+            query = query.filter(ParameterSet.customer_segment == customer_type.value)
+        if product_type:
+            query = query.filter(ParameterSet.product_type == product_type)
+        
+        query = query.order_by(ParameterSet.effective_date.desc())
+        parameter = query.first()
+        
+        if parameter:
+            ccf = parameter.parameter_value
+            logger.info(f"EAD CCF found: {ccf} for {customer_type.value}/{product_type}")
+        else:
+            ccf = Decimal("1.0")  # Default: EAD = outstanding balance
+            logger.debug(f"No EAD CCF found, using default 1.0")
+        
+        return ccf
     
     def get_discount_rate(self, product_type: str, effective_date: date) -> Decimal:
         """
@@ -207,34 +342,15 @@ class ParameterService:
         """
         # Build cache key
         cache_key = f"discount_rate:{product_type}:{effective_date}"
-        
-        # Check cache
-        cached_value = get_cache(cache_key)
-        if cached_value is not None:
-            return Decimal(str(cached_value))
-        
-        # Query database
-        query = self.db.query(ParameterSet).filter(
-            ParameterSet.parameter_type == ParameterType.DISCOUNT_RATE,
-            ParameterSet.is_active == True,
-            ParameterSet.effective_date <= effective_date
+
+        return self._lookup(
+            cache_key, lambda: self._load_discount_rate(product_type, effective_date)
         )
-        
-        if product_type:
-            query = query.filter(ParameterSet.product_type == product_type)
-        
-        query = query.order_by(ParameterSet.effective_date.desc())
-        parameter = query.first()
-        
-        if parameter:
-            rate = parameter.value
-            logger.info(f"Discount rate found: {rate} for {product_type}")
-        else:
-            rate = Decimal("0.12")  # 12% default
-            logger.warning(f"No discount rate found for {product_type}, using default {rate}")
-        
-        # Cache result
-        set_cache(cache_key, float(rate), expire=self.cache_ttl)
+
+    def _load_discount_rate(self, product_type: str, effective_date: date) -> Decimal:
+        """Discount rate (not a stored parameter type, so always the default)"""
+        rate = Decimal("0.12")  # 12% default
+        logger.debug(f"No discount rate parameter type, using default {rate} for {product_type}")
         
         return rate
     
@@ -251,25 +367,22 @@ class ParameterService:
         """
         # Build cache key
         cache_key = f"sicr_threshold:{threshold_type}:{effective_date}"
-        
-        # Check cache
-        cached_value = get_cache(cache_key)
-        if cached_value is not None:
-            return Decimal(str(cached_value))
-        
-        # Query database
-        query = self.db.query(ParameterSet).filter(
-            ParameterSet.parameter_type == ParameterType.SICR_THRESHOLD,
-            ParameterSet.segment == threshold_type,
-            ParameterSet.is_active == True,
-            ParameterSet.effective_date <= effective_date
+
+        return self._lookup(
+            cache_key, lambda: self._load_sicr_threshold(threshold_type, effective_date)
+        )
+
+    def _load_sicr_threshold(self, threshold_type: str, effective_date: date) -> Decimal:
+        """Query the SICR threshold parameter"""
+        query = self._active_parameters(ParameterType.SICR_THRESHOLD, effective_date).filter(
+            ParameterSet.customer_segment == threshold_type
         )
         
         query = query.order_by(ParameterSet.effective_date.desc())
         parameter = query.first()
         
         if parameter:
-            threshold = parameter.value
+            threshold = parameter.parameter_value
             logger.info(f"SICR threshold found: {threshold} for {threshold_type}")
         else:
             # Default thresholds
@@ -280,20 +393,19 @@ class ParameterService:
             threshold = defaults.get(threshold_type, Decimal("2.0"))
             logger.warning(f"No SICR threshold found for {threshold_type}, using default {threshold}")
         
-        # Cache result
-        set_cache(cache_key, float(threshold), expire=self.cache_ttl)
-        
         return threshold
     
     def invalidate_cache(self, parameter_type: Optional[ParameterType] = None):
         """
         Invalidate parameter cache.
         
-        Called when parameters are updated to force fresh lookups.
+        Called when parameters are updated to force fresh lookups. Bumps the
+        parameter version, which drops the in-process caches of every worker
+        (within their version check interval) and moves Redis lookups to new
+        keys; entries of older versions expire with their TTL.
         
         Args:
-            parameter_type: Specific parameter type to invalidate, or None for all
+            parameter_type: Parameter type that changed (all types are invalidated)
         """
-        # In production, would use Redis pattern matching to delete keys
-        # For MVP, cache will expire naturally after TTL
-        logger.info(f"Parameter cache invalidation requested for {parameter_type}")
+        version = parameter_cache.bump()
+        logger.info(f"Parameter cache invalidated for {parameter_type}, version {version}")
@@ -0,0 +1,306 @@
+"""In-memory snapshot of the parameter set for a reporting date"""
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+import hashlib
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.db.models import ParameterSet, ParameterType, FinancialInstrument
+from src.utils.logging_config import get_logger
+
+if TYPE_CHECKING:
+    # pandas is imported on first use (see src.services)
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+# Values used when no parameter matches (same as ParameterService)
+DEFAULT_VALUES = {
+    ParameterType.PD: Decimal("0.02"),
+    ParameterType.LGD: Decimal("0.45"),
+    ParameterType.EAD: Decimal("1.0"),  # credit conversion factor
+}
+
+# Segment key: (customer_segment, product_type, credit_rating); None matches any value
+SegmentKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# Lookup order, most specific first: exact, any rating, any product, any segment
+FALLBACK_LEVELS: Tuple[Tuple[bool, bool, bool], ...] = (
+    (True, True, True),
+    (True, True, False),
+    (True, False, False),
+    (False, False, False),
+)
+
+KEY_COLUMNS = ["customer_segment", "product_type", "credit_rating"]
+
+
+@dataclass(frozen=True)
+class ParameterInterval:
+    """One parameter row: value valid from effective_date until expiry_date (exclusive)"""
+
+    effective_date: date
+    expiry_date: Optional[date]
+    value: Decimal
+    parameter_id: str
+
+    def covers(self, as_of: date) -> bool:
+        return self.effective_date <= as_of and (
+            self.expiry_date is None or as_of < self.expiry_date
+        )
+
+
+class ParameterSnapshot:
+    """
+    Parameter set for a reporting date, read with one query.
+
+    Rows are indexed by parameter type and segment key into intervals sorted
+    by effective date, so a lookup is a dict access and a bisect. A whole
+    portfolio is resolved with one join per fallback level (see
+    resolve_frame). The fingerprint identifies the exact rows used, and a
+    snapshot can be pinned to a parameter version for reproducible reruns.
+    """
+
+    def __init__(
+        self,
+        reporting_date: date,
+        parameters: Iterable[ParameterSet],
+        version: Optional[str] = None,
+    ):
+        self.reporting_date = reporting_date
+        self.version = version
+        self._index: Dict[ParameterType, Dict[SegmentKey, List[ParameterInterval]]] = {}
+        self._starts: Dict[ParameterType, Dict[SegmentKey, List[date]]] = {}
+
+        digest = hashlib.sha256()
+        count = 0
+        for parameter in sorted(parameters, key=lambda p: (p.effective_date, p.parameter_id)):
+            key = (parameter.customer_segment, parameter.product_type, parameter.credit_rating)
+            self._index.setdefault(parameter.parameter_type, {}).setdefault(key, []).append(
+                ParameterInterval(
+                    parameter.effective_date,
+                    parameter.expiry_date,
+                    Decimal(str(parameter.parameter_value)),
+                    parameter.parameter_id,
+                )
+            )
+            digest.update(
+                f"{parameter.parameter_id}|{parameter.parameter_type.value}|{key}|"
+                f"{parameter.effective_date}|{parameter.expiry_date}|"
+                f"{parameter.parameter_value}\n".encode()
+            )
+            count += 1
+
+        for parameter_type, segments in self._index.items():
+            self._starts[parameter_type] = {
+                key: [interval.effective_date for interval in intervals]
+                for key, intervals in segments.items()
+            }
+
+        self.parameter_count = count
+        self.fingerprint = digest.hexdigest()[:16]
+        self._active_frames: Dict[ParameterType, "pd.DataFrame"] = {}
+
+    @classmethod
+    def load(
+        cls, db: Session, reporting_date: date, version: Optional[str] = None
+    ) -> "ParameterSnapshot":
+        """
+        Read every parameter effective on or before the reporting date.
+
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            version: Frozen parameter version (ParameterSet.version), or None for all
+
+        Returns:
+            ParameterSnapshot
+        """
+        query = db.query(ParameterSet).filter(ParameterSet.effective_date <= reporting_date)
+        if version is not None:
+            query = query.filter(ParameterSet.version == version)
+
+        snapshot = cls(reporting_date, query.all(), version=version)
+        logger.info(
+            f"Loaded parameter snapshot for {reporting_date}: "
+            f"{snapshot.parameter_count} parameters, "
+            f"version={version}, fingerprint={snapshot.fingerprint}"
+        )
+        return snapshot
+
+    @property
+    def parameters_version(self) -> str:
+        """Identifier stored on ECL calculations (fits ECLCalculation.parameters_version)"""
+        return f"{self.version or 'snapshot'}:{self.fingerprint}"[:50]
+
+    def _interval(
+        self, parameter_type: ParameterType, key: SegmentKey, as_of: date
+    ) -> Optional[ParameterInterval]:
+        starts = self._starts.get(parameter_type, {}).get(key)
+        if not starts:
+            return None
+        intervals = self._index[parameter_type][key]
+        # Latest interval starting on or before as_of that has not expired
+        for i in range(bisect_right(starts, as_of) - 1, -1, -1):
+            if intervals[i].covers(as_of):
+                return intervals[i]
+        return None
+
+    def resolve(
+        self,
+        parameter_type: ParameterType,
+        customer_segment: Optional[str],
+        product_type: Optional[str] = None,
+        credit_rating: Optional[str] = None,
+        as_of: Optional[date] = None,
+    ) -> Optional[Decimal]:
+        """
+        Parameter value for one segment.
+
+        Falls back from the exact key to less specific keys (any rating, any
+        product, any segment).
+
+        Args:
+            parameter_type: Parameter type
+            customer_segment: Customer type value
+            product_type: Product/instrument type
+            credit_rating: Credit rating
+            as_of: Lookup date (default: reporting date)
+
+        Returns:
+            Value, or None if no parameter applies
+        """
+        as_of = as_of or self.reporting_date
+        values = (customer_segment, product_type, credit_rating)
+        for level in FALLBACK_LEVELS:
+            key = tuple(value if keep else None for value, keep in zip(values, level))
+            interval = self._interval(parameter_type, key, as_of)
+            if interval is not None:
+                return interval.value
+        return None
+
+    def active_frame(self, parameter_type: ParameterType) -> "pd.DataFrame":
+        """Value in force at the reporting date for each segment key (cached)"""
+        frame = self._active_frames.get(parameter_type)
+        if frame is None:
+            import pandas as pd
+
+            rows = []
+            for key in self._index.get(parameter_type, {}):
+                interval = self._interval(parameter_type, key, self.reporting_date)
+                if interval is not None:
+                    rows.append((*key, float(interval.value)))
+            frame = pd.DataFrame(rows, columns=KEY_COLUMNS + ["value"]).astype(
+                {c: object for c in KEY_COLUMNS}
+            )
+            self._active_frames[parameter_type] = frame
+        return frame
+
+    def resolve_frame(
+        self,
+        portfolio: "pd.DataFrame",
+        parameter_type: ParameterType,
+        default: Optional[Decimal] = None,
+    ) -> np.ndarray:
+        """
+        Parameter values for a whole portfolio at the reporting date.
+
+        Each fallback level is one left join of the portfolio keys against the
+        active parameters; rows still unmatched after the last level get the
+        default.
+
+        Args:
+            portfolio: Frame with customer_segment, product_type, credit_rating columns
+            parameter_type: Parameter type
+            default: Value when nothing matches (default: DEFAULT_VALUES)
+
+        Returns:
+            Float array aligned with the portfolio rows
+        """
+        if default is None:
+            default = DEFAULT_VALUES[parameter_type]
+        values = np.full(len(portfolio), np.nan)
+        active = self.active_frame(parameter_type)
+        if active.empty or portfolio.empty:
+            return np.where(np.isnan(values), float(default), values)
+
+        keys = portfolio[KEY_COLUMNS].astype(object).reset_index(drop=True)
+        for level in FALLBACK_LEVELS:
+            unresolved = np.isnan(values)
+            if not unresolved.any():
+                break
+            columns = [column for column, keep in zip(KEY_COLUMNS, level) if keep]
+            wildcard = [column for column, keep in zip(KEY_COLUMNS, level) if not keep]
+            candidates = active[active[wildcard].isna().all(axis=1)] if wildcard else active
+            candidates = candidates.dropna(subset=columns)
+            if candidates.empty:
+                continue
+
+            if columns:
+                matched = (
+                    keys.loc[unresolved, columns]
+                    .merge(candidates[columns + ["value"]], on=columns, how="left")["value"]
+                    .to_numpy()
+                )
+            else:
+                matched = np.full(int(unresolved.sum()), candidates["value"].iloc[0])
+            values[unresolved] = matched
+
+        return np.where(np.isnan(values), float(default), values)
+
+    def resolve_portfolio(self, instruments: Sequence[FinancialInstrument]) -> "pd.DataFrame":
+        """
+        PD, LGD and EAD for a list of instruments in one pass.
+
+        EAD is the principal amount times the credit conversion factor (EAD
+        parameter).
+
+        Args:
+            instruments: Instruments (customers are read through the relationship)
+
+        Returns:
+            Frame indexed by instrument_id with pd, lgd, ccf and ead columns
+        """
+        import pandas as pd
+
+        portfolio = portfolio_keys(instruments)
+        ccf = self.resolve_frame(portfolio, ParameterType.EAD)
+        principal = np.array(
+            [float(instrument.principal_amount or 0) for instrument in instruments]
+        )
+        return pd.DataFrame(
+            {
+                "pd": self.resolve_frame(portfolio, ParameterType.PD),
+                "lgd": self.resolve_frame(portfolio, ParameterType.LGD),
+                "ccf": ccf,
+                "ead": principal * ccf,
+            },
+            index=pd.Index(
+                [instrument.instrument_id for instrument in instruments], name="instrument_id"
+            ),
+        )
+
+
+def instrument_key(instrument: FinancialInstrument) -> SegmentKey:
+    """Segment key of an instrument (customer type, instrument type, customer rating)"""
+    customer = instrument.customer
+    return (
+        customer.customer_type.value if customer is not None and customer.customer_type else None,
+        instrument.instrument_type.value if instrument.instrument_type else None,
+        customer.credit_rating if customer is not None else None,
+    )
+
+
+def portfolio_keys(instruments: Sequence[FinancialInstrument]) -> "pd.DataFrame":
+    """Segment keys of instruments as a frame (see resolve_frame)"""
+    import pandas as pd
+
+    return pd.DataFrame(
+        [instrument_key(instrument) for instrument in instruments],
+        columns=KEY_COLUMNS,
+        dtype=object,
+    )
@@ -0,0 +1,670 @@
+"""Sharded, checkpointed portfolio ECL runs"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from decimal import Decimal
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+import uuid
+import zlib
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.models import (
+    FinancialInstrument,
+    Customer,
+    InstrumentStatus,
+    Stage,
+    PortfolioRun,
+    PortfolioRunShard,
+)
+from src.services.ecl_engine import ECLCalculationService
+from src.services.ecl_incremental import IncrementalECLCalculator
+from src.services.parameter_snapshot import ParameterSnapshot
+from src.services.ecl_results_writer import ECLResultsWriter
+from src.utils.queue import get_queue_manager
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Maximum number of bound parameters per IN (...) lookup
+LOOKUP_BATCH_SIZE = 900
+
+# Queue carrying portfolio run shards (declared in src/utils/queue.py)
+SHARD_QUEUE = "ecl_calculations"
+SHARD_MESSAGE_TYPE = "portfolio_run_shard"
+
+# Run and shard statuses
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+
+class ShardResult:
+    """ECL totals for one portfolio shard or chunk"""
+
+    def __init__(
+        self,
+        shard_id: int,
+        instruments_calculated: int,
+        total_ecl: Decimal,
+        stage_totals: Dict[str, Decimal],
+    ):
+        self.shard_id = shard_id
+        self.instruments_calculated = instruments_calculated
+        self.total_ecl = total_ecl
+        self.stage_totals = stage_totals
+
+
+def _empty_stage_totals() -> Dict[str, Decimal]:
+    return {stage.value: Decimal("0") for stage in Stage}
+
+
+def _merge_stage_totals(
+    stored: Optional[Dict[str, str]], amounts: Dict[str, Decimal]
+) -> Dict[str, str]:
+    """Add stage amounts to stage totals stored as JSON strings (exact decimals)"""
+    merged = _empty_stage_totals()
+    for stage, amount in (stored or {}).items():
+        merged[stage] += Decimal(amount)
+    for stage, amount in amounts.items():
+        merged[stage] += amount
+    return {stage: str(amount) for stage, amount in merged.items()}
+
+
+def load_instruments(db: Session, instrument_ids: List[str]) -> List[FinancialInstrument]:
+    """
+    Load instruments by ID in bounded IN (...) batches.
+
+    Args:
+        db: Database session
+        instrument_ids: Instrument IDs to load
+
+    Returns:
+        List of financial instruments
+    """
+    instruments = []
+    for start in range(0, len(instrument_ids), LOOKUP_BATCH_SIZE):
+        batch = instrument_ids[start : start + LOOKUP_BATCH_SIZE]
+        instruments.extend(
+            db.query(FinancialInstrument).filter(FinancialInstrument.instrument_id.in_(batch)).all()
+        )
+    return instruments
+
+
+def summarize_results(
+    instruments: List[FinancialInstrument], results: Dict[str, Any], shard_id: int = 0
+) -> ShardResult:
+    """
+    Aggregate ECL results into total and per-stage amounts.
+
+    Args:
+        instruments: Instruments that were calculated
+        results: Dict mapping instrument_id to ECLResult
+        shard_id: Shard identifier
+
+    Returns:
+        ShardResult with totals
+    """
+    stage_by_id = {instrument.instrument_id: instrument.current_stage for instrument in instruments}
+    stage_totals = _empty_stage_totals()
+    total_ecl = Decimal("0")
+
+    for instrument_id, result in results.items():
+        total_ecl += result.ecl_amount
+        stage = stage_by_id.get(instrument_id)
+        if stage is not None:
+            stage_totals[stage.value] += result.ecl_amount
+
+    return ShardResult(
+        shard_id=shard_id,
+        instruments_calculated=len(results),
+        total_ecl=total_ecl,
+        stage_totals=stage_totals,
+    )
+
+
+def process_shard(
+    db: Session, shard_id: str, ecl_service: Optional[ECLCalculationService] = None
+) -> PortfolioRunShard:
+    """
+    Calculate ECL for one shard of a portfolio run, resuming from its checkpoint.
+
+    The shard's instruments are processed in chunks of the run's chunk_size.
+    Each chunk's ECLCalculation and audit rows (bulk-written) and the shard
+    checkpoint (chunks_completed and partial totals) are committed in one
+    transaction, so an interrupted shard restarts at the first chunk that was
+    not committed and never writes a chunk twice.
+
+    Args:
+        db: Database session
+        shard_id: Shard ID
+        ecl_service: ECL calculation service (optional)
+
+    Returns:
+        The processed shard
+    """
+    shard = db.query(PortfolioRunShard).filter(PortfolioRunShard.shard_id == shard_id).first()
+    if not shard:
+        raise ValueError(f"Portfolio run shard {shard_id} not found")
+
+    run = shard.run
+    if shard.status == COMPLETED:
+        logger.info(f"Shard {shard_id} already completed, skipping")
+        return shard
+
+    if shard.chunks_completed:
+        logger.info(
+            f"Resuming shard {shard_id} at chunk {shard.chunks_completed + 1}/{shard.chunks_total}"
+        )
+
+    shard.status = RUNNING
+    shard.attempts += 1
+    shard.error = None
+    if run.status in (QUEUED, FAILED):
+        run.status = RUNNING
+        run.error = None
+        run.started_at = run.started_at or datetime.utcnow()
+    db.commit()
+
+    if ecl_service is None:
+        # One parameter snapshot per shard; runs pinned to a version are reproducible
+        snapshot = None
+        if run.parameter_version:
+            snapshot = ParameterSnapshot.load(db, run.reporting_date, version=run.parameter_version)
+        ecl_service = ECLCalculationService(parameter_snapshot=snapshot)
+    service = ecl_service
+    calculator = IncrementalECLCalculator(db, service, run.scenarios)
+    writer = ECLResultsWriter(db, chunk_size=run.chunk_size)
+    instrument_ids = shard.instrument_ids
+
+    try:
+        for chunk_index in range(shard.chunks_completed, shard.chunks_total):
+            start = chunk_index * run.chunk_size
+            instruments = load_instruments(db, instrument_ids[start : start + run.chunk_size])
+            results = calculator.calculate(
+                instruments, run.reporting_date, carry_forward=run.incremental
+            )
+            chunk = summarize_results(instruments, results)
+
+            writer.write_results(
+                service,
+                instruments,
+                results,
+                run.reporting_date,
+                user_id=run.submitted_by,
+                portfolio_run_id=run.run_id,
+            )
+
+            # Checkpoint in the same transaction as the chunk's results
+            shard.chunks_completed = chunk_index + 1
+            shard.instruments_calculated += chunk.instruments_calculated
+            shard.total_ecl = Decimal(shard.total_ecl or 0) + chunk.total_ecl
+            shard.stage_totals = _merge_stage_totals(shard.stage_totals, chunk.stage_totals)
+            db.commit()
+
+        shard.status = COMPLETED
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Shard {shard_id} failed at chunk {shard.chunks_completed + 1}: {e}")
+        shard.status = FAILED
+        shard.error = str(e)
+        run.status = FAILED
+        run.error = f"Shard {shard.shard_index} failed: {e}"
+        db.commit()
+        raise
+
+    finalize_run(db, run.run_id)
+    return shard
+
+
+def finalize_run(db: Session, run_id: str) -> PortfolioRun:
+    """
+    Refresh run progress from its shards and complete the run when all shards are done.
+
+    Idempotent; safe to call from every worker that finishes a shard.
+
+    Args:
+        db: Database session
+        run_id: Run ID
+
+    Returns:
+        The portfolio run
+    """
+    run = db.query(PortfolioRun).filter(PortfolioRun.run_id == run_id).first()
+    if not run:
+        raise ValueError(f"Portfolio run {run_id} not found")
+
+    shards = db.query(PortfolioRunShard).filter(PortfolioRunShard.run_id == run_id).all()
+    completed = [shard for shard in shards if shard.status == COMPLETED]
+    run.shards_completed = len(completed)
+
+    if len(completed) == len(shards) and run.status != COMPLETED:
+        stage_totals = _empty_stage_totals()
+        total_ecl = Decimal("0")
+        for shard in completed:
+            total_ecl += Decimal(shard.total_ecl or 0)
+            for stage, amount in (shard.stage_totals or {}).items():
+                stage_totals[stage] += Decimal(amount)
+
+        run.instruments_calculated = sum(shard.instruments_calculated for shard in completed)
+        run.total_ecl = total_ecl
+        run.stage_totals = {stage: str(amount) for stage, amount in stage_totals.items()}
+        run.status = COMPLETED
+        run.error = None
+        run.completed_at = datetime.utcnow()
+        logger.info(f"Portfolio run {run_id} completed: {run.instruments_calculated} instruments")
+
+    db.commit()
+    return run
+
+
+def run_shard(database_url: str, shard_id: str) -> str:
+    """
+    Process one shard in a worker process.
+
+    Each worker opens its own engine and session; connections are never shared
+    with the parent process.
+
+    Args:
+        database_url: Database URL
+        shard_id: Shard ID
+
+    Returns:
+        Shard status
+    """
+    engine = create_engine(database_url, pool_pre_ping=True)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        return process_shard(db, shard_id).status
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def run_to_dict(run: PortfolioRun) -> Dict[str, Any]:
+    """Serialize a portfolio run for the API"""
+    return {
+        "run_id": run.run_id,
+        "status": run.status,
+        "reporting_date": run.reporting_date.isoformat(),
+        "submitted_by": run.submitted_by,
+        "shard_by": run.shard_by,
+        "incremental": run.incremental,
+        "scenarios": run.scenarios,
+        "parameter_version": run.parameter_version,
+        "shards_total": run.shards_total,
+        "shards_completed": run.shards_completed,
+        "instruments_total": run.instruments_total,
+        "instruments_calculated": run.instruments_calculated,
+        "total_ecl": float(run.total_ecl) if run.total_ecl is not None else None,
+        "stage_totals": (
+            {k: float(v) for k, v in run.stage_totals.items()} if run.stage_totals else None
+        ),
+        "error": run.error,
+        "submitted_at": run.submitted_at.isoformat() if run.submitted_at else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "completed_at": run.completed_at.isoformat() if run.completed_at else None,
+    }
+
+
+class PortfolioRunner:
+    """
+    Service for running portfolio ECL calculations as persistent, sharded jobs.
+
+    Instruments are partitioned by customer (all facilities of a customer stay
+    in one shard) or by segment (customer type, split further by customer when a
+    segment is larger than shard_size). Runs and shards are stored in the
+    portfolio_run / portfolio_run_shard tables; each shard commits its results
+    chunk by chunk together with its checkpoint, so interrupted runs resume
+    where they stopped.
+
+    Shards are dispatched to the ecl_calculations queue for the worker pool
+    ("queue"), to a local ProcessPoolExecutor ("local"), or to the queue with a
+    local fallback when the broker is unavailable ("auto").
+    """
+
+    SHARD_KEYS = ("customer", "segment")
+    DISPATCH_MODES = ("auto", "queue", "local")
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        shard_by: str = "customer",
+        shard_size: int = 50000,
+        chunk_size: int = 5000,
+        dispatch: str = "auto",
+        incremental: bool = True,
+        mp_context: str = "spawn",
+    ):
+        if shard_by not in self.SHARD_KEYS:
+            raise ValueError(f"Invalid shard key: {shard_by}. Must be one of {self.SHARD_KEYS}")
+        if dispatch not in self.DISPATCH_MODES:
+            raise ValueError(
+                f"Invalid dispatch mode: {dispatch}. Must be one of {self.DISPATCH_MODES}"
+            )
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.shard_by = shard_by
+        self.shard_size = shard_size
+        self.chunk_size = chunk_size
+        self.dispatch = dispatch
+        self.incremental = incremental
+        self.mp_context = mp_context
+        self._job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="portfolio-run")
+
+    def plan_shards(
+        self, db: Session, instrument_ids: Optional[List[str]] = None
+    ) -> List[List[str]]:
+        """
+        Partition active instruments into shards.
+
+        Only (instrument_id, customer_id, customer_type) columns are read.
+
+        Args:
+            db: Database session
+            instrument_ids: Restrict to these instruments (optional)
+
+        Returns:
+            List of shards, each a list of instrument IDs
+        """
+        query = (
+            db.query(
+                FinancialInstrument.instrument_id,
+                FinancialInstrument.customer_id,
+                Customer.customer_type,
+            )
+            .outerjoin(Customer, Customer.customer_id == FinancialInstrument.customer_id)
+            .filter(FinancialInstrument.status == InstrumentStatus.ACTIVE)
+        )
+
+        if instrument_ids:
+            query = query.filter(FinancialInstrument.instrument_id.in_(instrument_ids))
+
+        rows = query.order_by(FinancialInstrument.instrument_id).all()
+        return self.partition(rows)
+
+    def partition(self, rows: List[Tuple[str, str, Any]]) -> List[List[str]]:
+        """
+        Partition (instrument_id, customer_id, segment) rows into shards.
+
+        Args:
+            rows: Instrument rows
+
+        Returns:
+            List of non-empty shards
+        """
+        if self.shard_by == "customer":
+            by_size = -(-len(rows) // max(self.shard_size, 1))
+            num_shards = max(1, min(len(rows), max(self.max_workers, by_size)))
+            shards: List[List[str]] = [[] for _ in range(num_shards)]
+            for instrument_id, customer_id, _ in rows:
+                shards[self._stable_hash(customer_id) % num_shards].append(instrument_id)
+            return [shard for shard in shards if shard]
+
+        # Segment sharding: one shard per segment, large segments split by customer
+        segments: Dict[str, List[Tuple[str, str]]] = {}
+        for instrument_id, customer_id, segment in rows:
+            key = segment.value if hasattr(segment, "value") else str(segment)
+            segments.setdefault(key, []).append((instrument_id, customer_id))
+
+        shards = []
+        for members in segments.values():
+            pieces = max(1, -(-len(members) // max(self.shard_size, 1)))
+            split: List[List[str]] = [[] for _ in range(pieces)]
+            for instrument_id, customer_id in members:
+                split[self._stable_hash(customer_id) % pieces].append(instrument_id)
+            shards.extend(shard for shard in split if shard)
+        return shards
+
+    def create_run(
+        self,
+        db: Session,
+        reporting_date: date,
+        user_id: str,
+        instrument_ids: Optional[List[str]] = None,
+        incremental: Optional[bool] = None,
+        scenarios: Optional[List[Dict[str, Any]]] = None,
+        parameter_version: Optional[str] = None,
+    ) -> PortfolioRun:
+        """
+        Plan shards and persist a new portfolio run (without starting it).
+
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            user_id: User starting the run
+            instrument_ids: Restrict to these instruments (optional)
+            incremental: Carry forward results whose inputs are unchanged
+                (defaults to the runner setting)
+            scenarios: Scenario dicts for probability-weighted ECL (optional)
+            parameter_version: ParameterSet version to calculate with (optional)
+
+        Returns:
+            The new portfolio run
+        """
+        run_id = str(uuid.uuid4())
+        shards = self.plan_shards(db, instrument_ids)
+
+        run = PortfolioRun(
+            run_id=run_id,
+            reporting_date=reporting_date,
+            status=QUEUED if shards else COMPLETED,
+            shard_by=self.shard_by,
+            chunk_size=self.chunk_size,
+            incremental=self.incremental if incremental is None else incremental,
+            scenarios=scenarios or None,
+            parameter_version=parameter_version,
+            shards_total=len(shards),
+            shards_completed=0,
+            instruments_total=sum(len(shard) for shard in shards),
+            instruments_calculated=0,
+            submitted_by=user_id,
+        )
+        if not shards:
+            run.total_ecl = Decimal("0")
+            run.stage_totals = {stage: "0" for stage in _empty_stage_totals()}
+            run.completed_at = datetime.utcnow()
+        db.add(run)
+
+        for index, instrument_ids_in_shard in enumerate(shards):
+            db.add(
+                PortfolioRunShard(
+                    shard_id=f"{run_id}-{index:04d}",
+                    run_id=run_id,
+                    shard_index=index,
+                    instrument_ids=instrument_ids_in_shard,
+                    status=QUEUED,
+                    chunks_total=-(-len(instrument_ids_in_shard) // self.chunk_size),
+                    chunks_completed=0,
+                    instruments_calculated=0,
+                    total_ecl=Decimal("0"),
+                    attempts=0,
+                )
+            )
+
+        db.commit()
+        logger.info(f"Portfolio run {run_id} created with {len(shards)} shards")
+        return run
+
+    def submit(
+        self,
+        db: Session,
+        reporting_date: date,
+        user_id: str,
+        instrument_ids: Optional[List[str]] = None,
+        incremental: Optional[bool] = None,
+        scenarios: Optional[List[Dict[str, Any]]] = None,
+        parameter_version: Optional[str] = None,
+    ) -> str:
+        """
+        Create a portfolio run and dispatch its shards.
+
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            user_id: User starting the run
+            instrument_ids: Restrict to these instruments (optional)
+            incremental: Carry forward results whose inputs are unchanged (optional)
+            scenarios: Scenario dicts for probability-weighted ECL (optional)
+            parameter_version: ParameterSet version to calculate with (optional)
+
+        Returns:
+            Run ID
+        """
+        run = self.create_run(
+            db, reporting_date, user_id, instrument_ids, incremental, scenarios, parameter_version
+        )
+        self._dispatch(db, run.run_id, self._pending_shard_ids(db, run.run_id))
+        return run.run_id
+
+    def resume(self, db: Session, run_id: str) -> Optional[PortfolioRun]:
+        """
+        Resume an interrupted or failed run.
+
+        Every shard that is not completed is re-dispatched and continues from
+        its last committed chunk. Only call this for runs whose workers have
+        stopped; a shard that is still being processed would be picked up twice.
+
+        Args:
+            db: Database session
+            run_id: Run ID
+
+        Returns:
+            The portfolio run or None if unknown
+        """
+        run = db.query(PortfolioRun).filter(PortfolioRun.run_id == run_id).first()
+        if not run:
+            return None
+        if run.status == COMPLETED:
+            return run
+
+        shard_ids = self._pending_shard_ids(db, run_id)
+        db.query(PortfolioRunShard).filter(PortfolioRunShard.shard_id.in_(shard_ids)).update(
+            {PortfolioRunShard.status: QUEUED}, synchronize_session=False
+        )
+        run.status = QUEUED
+        run.error = None
+        db.commit()
+
+        logger.info(f"Resuming portfolio run {run_id}: {len(shard_ids)} shards pending")
+        self._dispatch(db, run_id, shard_ids)
+        return run
+
+    def run(
+        self,
+        db: Session,
+        reporting_date: date,
+        user_id: str = "system",
+        instrument_ids: Optional[List[str]] = None,
+        incremental: Optional[bool] = None,
+        scenarios: Optional[List[Dict[str, Any]]] = None,
+        parameter_version: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a portfolio ECL calculation on the local process pool and wait for it.
+
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            user_id: User starting the run
+            instrument_ids: Restrict to these instruments (optional)
+            incremental: Carry forward results whose inputs are unchanged (optional)
+            scenarios: Scenario dicts for probability-weighted ECL (optional)
+            parameter_version: ParameterSet version to calculate with (optional)
+
+        Returns:
+            Portfolio run status with merged stage totals
+        """
+        run = self.create_run(
+            db, reporting_date, user_id, instrument_ids, incremental, scenarios, parameter_version
+        )
+        self._run_local(self._database_url(db), self._pending_shard_ids(db, run.run_id))
+        db.expire_all()
+        return self.get_run(db, run.run_id)
+
+    def get_run(self, db: Session, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get status of a portfolio run.
+
+        Args:
+            db: Database session
+            run_id: Run ID
+
+        Returns:
+            Run status dict or None if unknown
+        """
+        run = db.query(PortfolioRun).filter(PortfolioRun.run_id == run_id).first()
+        return run_to_dict(run) if run else None
+
+    def _pending_shard_ids(self, db: Session, run_id: str) -> List[str]:
+        rows = (
+            db.query(PortfolioRunShard.shard_id)
+            .filter(PortfolioRunShard.run_id == run_id, PortfolioRunShard.status != COMPLETED)
+            .order_by(PortfolioRunShard.shard_index)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    def _dispatch(self, db: Session, run_id: str, shard_ids: List[str]):
+        """Send shards to the queue, or to the local process pool"""
+        if not shard_ids:
+            return
+
+        if self.dispatch in ("auto", "queue"):
+            published = self._publish(run_id, shard_ids)
+            logger.info(f"Portfolio run {run_id}: {published} shards published to {SHARD_QUEUE}")
+            if published == len(shard_ids):
+                return
+            if self.dispatch == "queue":
+                raise RuntimeError(f"Could not publish portfolio run {run_id} to {SHARD_QUEUE}")
+            logger.warning(
+                f"Queue unavailable, running portfolio run {run_id} on local process pool"
+            )
+            shard_ids = shard_ids[published:]
+
+        self._job_executor.submit(self._run_local, self._database_url(db), shard_ids)
+
+    def _publish(self, run_id: str, shard_ids: List[str]) -> int:
+        """Publish shard messages in order; returns how many were published"""
+        queue_manager = get_queue_manager()
+        for published, shard_id in enumerate(shard_ids):
+            if not queue_manager.publish_message(
+                SHARD_QUEUE, {"type": SHARD_MESSAGE_TYPE, "run_id": run_id, "shard_id": shard_id}
+            ):
+                return published
+        return len(shard_ids)
+
+    def _run_local(self, database_url: str, shard_ids: List[str]):
+        """Process shards on the local process pool"""
+        if not shard_ids:
+            return
+
+        context = multiprocessing.get_context(self.mp_context)
+        workers = min(self.max_workers, len(shard_ids))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {
+                executor.submit(run_shard, database_url, shard_id): shard_id
+                for shard_id in shard_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    # Failure is recorded on the shard; the run can be resumed
+                    logger.error(f"Shard {futures[future]} failed: {e}")
+
+    @staticmethod
+    def _database_url(db: Session) -> str:
+        return db.get_bind().url.render_as_string(hide_password=False)
+
+    @staticmethod
+    def _stable_hash(value: Optional[str]) -> int:
+        """Process-independent hash (built-in hash() is salted per process)"""
+        return zlib.crc32((value or "").encode())
+
+
+# Global service instance
+portfolio_runner = PortfolioRunner()
@@ -5,9 +5,9 @@ from datetime import date
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 import numpy as np
-from sklearn.metrics import roc_auc_score, roc_curve
 
 from src.db.models import BehavioralScorecard, CustomerScore, FinancialInstrument, ProductType
+from src.utils.cache import get_or_compute
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -56,6 +56,9 @@ class ScorecardService:
         ("Very Poor", (300, 499), Decimal("0.20"))     # 20%
     ]
     
+    # Seconds score bands are shared through Redis
+    SCORE_BANDS_CACHE_TTL = 3600
+    
     def map_score_to_pd(
         self,
         db: Session,
@@ -75,19 +78,14 @@ class ScorecardService:
         """
         logger.info(f"Mapping score {score} to PD for product {product_type}")
         
-        # Fetch scorecard configuration
-        scorecard = db.query(BehavioralScorecard).filter(
-            BehavioralScorecard.product_type == product_type,
-            BehavioralScorecard.is_active == True
-        ).first()
+        # Fetch scorecard configuration (cached)
+        score_bands = self._score_bands(db, product_type)
         
-        if not scorecard:
+        if not score_bands:
             logger.warning(f"No scorecard found for {product_type}, using default mapping")
             return self._default_score_to_pd(score)
         
         # Find PD band for score
-        score_bands = scorecard.score_bands
-        
         for band_name, (min_score, max_score), pd_value in score_bands:
             if min_score <= score <= max_score:
                 return PDMapping(
@@ -100,6 +98,52 @@ class ScorecardService:
         # Score outside defined bands, use default
         logger.warning(f"Score {score} outside defined bands, using default")
         return self._default_score_to_pd(score)
+
+    def _score_bands(
+        self, db: Session, product_type: ProductType
+    ) -> List[Tuple[str, Tuple[int, int], str]]:
+        """
+        Score bands of the latest scorecard calibration for a product.
+        
+        Scorecards are stored one row per band (score_min, score_max,
+        pd_estimate). Bands are shared through Redis; concurrent misses run
+        one query (get_or_compute).
+        
+        Args:
+            db: Database session
+            product_type: Product type
+            
+        Returns:
+            (band name, (min score, max score), PD) per band; empty if no scorecard
+        """
+        product = product_type.value if isinstance(product_type, ProductType) else str(product_type)
+        
+        def load_bands():
+            latest = (
+                db.query(func.max(BehavioralScorecard.calibration_date))
+                .filter(BehavioralScorecard.product_type == product)
+                .scalar()
+            )
+            if latest is None:
+                return []
+            rows = (
+                db.query(BehavioralScorecard)
+                .filter(
+                    BehavioralScorecard.product_type == product,
+                    BehavioralScorecard.calibration_date == latest,
+                )
+                .order_by(BehavioralScorecard.score_min)
+                .all()
+            )
+            return [
+                (row.scorecard_id, (row.score_min, row.score_max), str(row.pd_estimate))
+                for row in rows
+            ]
+
+        bands = get_or_compute(
+            f"scorecard:bands:{product}", load_bands, expire=self.SCORE_BANDS_CACHE_TTL
+        )
+        return [(name, tuple(score_range), pd_value) for name, score_range, pd_value in bands]
     
     def _default_score_to_pd(self, score: int) -> PDMapping:
         """Default score-to-PD mapping"""
@@ -164,6 +208,8 @@ class ScorecardService:
         actuals = [record["actual_default"] for record in validation_data]
         
         # Calculate AUC-ROC
+        from sklearn.metrics import roc_auc_score
+
         auc = roc_auc_score(actuals, scores)
         
         # Calculate Gini
@@ -217,6 +263,8 @@ class ScorecardService:
         
         # Calculate KS statistic (maximum separation between CDFs)
         # Using ROC curve as proxy
+        from sklearn.metrics import roc_curve
+
         fpr, tpr, _ = roc_curve(actuals, scores)
         ks = Decimal(str(np.max(tpr - fpr)))
         
@@ -312,6 +360,8 @@ class ScorecardService:
         # Calculate AUC-ROC
         scores = [record["score"] for record in validation_data]
         actuals = [record["actual_default"] for record in validation_data]
+        from sklearn.metrics import roc_auc_score
+
         auc = Decimal(str(roc_auc_score(actuals, scores)))
         
         performance = ScorecardPerformance(
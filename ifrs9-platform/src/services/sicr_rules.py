@@ -0,0 +1,326 @@
+"""Data-driven SICR rules compiled into vectorized predicates"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import date
+import hashlib
+import time
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from src.db.models import SICRRule
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Built-in SICR indicators in evaluation order; with the default rules bit i of
+# an indicator bitmap is INDICATORS[i]
+INDICATORS = [
+    "DPD_THRESHOLD",
+    "PD_RELATIVE_INCREASE",
+    "PD_ABSOLUTE_INCREASE",
+    "WATCHLIST",
+    "RESTRUCTURED",
+    "FORBEARANCE",
+    "SECTOR_DOWNGRADE",
+]
+INDICATOR_BITS = {name: 1 << i for i, name in enumerate(INDICATORS)}
+
+# Sub-investment grade sector ratings (downgrade from BBB or better triggers SICR)
+RISKY_SECTOR_RATINGS = ["BB", "B", "CCC", "CC", "C", "D"]
+
+# Indicator bitmaps are uint32
+MAX_INDICATORS = 32
+
+# Decimal thresholds are compared on floats; PDs have 6 decimal places
+TOLERANCE = 1e-9
+
+
+def _pd_change(arrays) -> Tuple[np.ndarray, np.ndarray]:
+    """Origination and current PD, NaN where no origination PD is recorded"""
+    pd0 = np.where(arrays.pd_at_origination == 0, np.nan, arrays.pd_at_origination)
+    return pd0, arrays.current_pd
+
+
+def _relative_increase(arrays) -> np.ndarray:
+    pd0, current_pd = _pd_change(arrays)
+    return (current_pd - pd0) / pd0
+
+
+def _absolute_increase(arrays) -> np.ndarray:
+    pd0, current_pd = _pd_change(arrays)
+    return current_pd - pd0
+
+
+# Rule fields: name -> array of staging inputs (StagingArrays) per instrument
+RULE_FIELDS: Dict[str, Callable[[Any], np.ndarray]] = {
+    "days_past_due": lambda arrays: arrays.days_past_due,
+    "pd_at_origination": lambda arrays: arrays.pd_at_origination,
+    "current_pd": lambda arrays: arrays.current_pd,
+    "pd_relative_increase": _relative_increase,
+    "pd_absolute_increase": _absolute_increase,
+    "watchlist": lambda arrays: arrays.watchlist,
+    "restructured": lambda arrays: arrays.restructured,
+    "forbearance": lambda arrays: arrays.forbearance,
+    "modified": lambda arrays: arrays.modified,
+    "sector_rating": lambda arrays: arrays.sector_rating,
+}
+
+# Operators: name -> (values, threshold, value_list) -> mask; NaN never matches a comparison
+OPERATORS: Dict[str, Callable[[np.ndarray, Optional[float], Optional[List[Any]]], np.ndarray]] = {
+    ">": lambda values, threshold, _: values > threshold + TOLERANCE,
+    ">=": lambda values, threshold, _: values >= threshold - TOLERANCE,
+    "<": lambda values, threshold, _: values < threshold - TOLERANCE,
+    "<=": lambda values, threshold, _: values <= threshold + TOLERANCE,
+    "==": lambda values, threshold, _: np.abs(values - threshold) <= TOLERANCE,
+    "!=": lambda values, threshold, _: np.abs(values - threshold) > TOLERANCE,
+    "in": lambda values, _, value_list: np.isin(values, value_list),
+    "not_in": lambda values, _, value_list: ~np.isin(values, value_list),
+    "is_true": lambda values, _, __: values.astype(bool),
+}
+
+LIST_OPERATORS = {"in", "not_in"}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One SICR rule: raise indicator where `field operator threshold` holds"""
+
+    rule_id: str
+    indicator: str
+    field: str
+    operator: str
+    threshold: Optional[float] = None
+    value_list: Optional[Tuple[Any, ...]] = None
+    priority: int = 100
+
+    @classmethod
+    def from_model(cls, rule: SICRRule) -> "Rule":
+        return cls(
+            rule_id=rule.rule_id,
+            indicator=rule.indicator,
+            field=rule.field,
+            operator=rule.operator,
+            threshold=float(rule.threshold) if rule.threshold is not None else None,
+            value_list=tuple(rule.value_list) if rule.value_list is not None else None,
+            priority=rule.priority if rule.priority is not None else 100,
+        )
+
+    def validate(self):
+        """Raise ValueError if the rule cannot be compiled"""
+        if self.field not in RULE_FIELDS:
+            raise ValueError(f"SICR rule {self.rule_id}: unknown field {self.field!r}")
+        if self.operator not in OPERATORS:
+            raise ValueError(f"SICR rule {self.rule_id}: unknown operator {self.operator!r}")
+        if self.operator in LIST_OPERATORS and not self.value_list:
+            raise ValueError(
+                f"SICR rule {self.rule_id}: operator {self.operator} needs a value list"
+            )
+        if (
+            self.operator not in LIST_OPERATORS
+            and self.operator != "is_true"
+            and self.threshold is None
+        ):
+            raise ValueError(
+                f"SICR rule {self.rule_id}: operator {self.operator} needs a threshold"
+            )
+
+
+@dataclass
+class RuleStats:
+    """Evaluation counters for one rule"""
+
+    evaluations: int = 0
+    instruments: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+
+def default_rules(
+    sicr_dpd_threshold: int = 30,
+    pd_relative_threshold: float = 1.0,
+    pd_absolute_threshold: float = 0.02,
+) -> List[Rule]:
+    """Rules equivalent to StagingService.evaluate_sicr (used when the DB has none)"""
+    return [
+        Rule(
+            "DEFAULT-DPD",
+            "DPD_THRESHOLD",
+            "days_past_due",
+            ">",
+            float(sicr_dpd_threshold),
+            priority=10,
+        ),
+        Rule(
+            "DEFAULT-PD-REL",
+            "PD_RELATIVE_INCREASE",
+            "pd_relative_increase",
+            ">",
+            float(pd_relative_threshold),
+            priority=20,
+        ),
+        Rule(
+            "DEFAULT-PD-ABS",
+            "PD_ABSOLUTE_INCREASE",
+            "pd_absolute_increase",
+            ">",
+            float(pd_absolute_threshold),
+            priority=30,
+        ),
+        Rule("DEFAULT-WATCHLIST", "WATCHLIST", "watchlist", "is_true", priority=40),
+        Rule("DEFAULT-RESTRUCTURED", "RESTRUCTURED", "restructured", "is_true", priority=50),
+        Rule("DEFAULT-FORBEARANCE", "FORBEARANCE", "forbearance", "is_true", priority=60),
+        Rule(
+            "DEFAULT-SECTOR",
+            "SECTOR_DOWNGRADE",
+            "sector_rating",
+            "in",
+            value_list=tuple(RISKY_SECTOR_RATINGS),
+            priority=70,
+        ),
+        # Legacy modification flag (backward compatibility)
+        Rule("DEFAULT-MODIFIED", "FORBEARANCE", "modified", "is_true", priority=80),
+    ]
+
+
+class SICRRuleSet:
+    """
+    SICR rules compiled once per run into a predicate pipeline.
+
+    Each rule becomes a mask over the staging arrays; masks are OR-ed into
+    the bit of the rule's indicator (rules sharing an indicator share a bit,
+    indicators get bits in order of first appearance). Evaluation time and
+    hit counts are kept per rule (stats, report).
+    """
+
+    def __init__(self, rules: Iterable[Rule], version: Optional[str] = None):
+        self.rules = sorted(rules, key=lambda rule: (rule.priority, rule.rule_id))
+        self.version = version
+        self.indicator_bits: Dict[str, int] = {}
+        self._predicates = []
+        for rule in self.rules:
+            rule.validate()
+            if rule.indicator not in self.indicator_bits:
+                if len(self.indicator_bits) == MAX_INDICATORS:
+                    raise ValueError(f"At most {MAX_INDICATORS} SICR indicators are supported")
+                self.indicator_bits[rule.indicator] = 1 << len(self.indicator_bits)
+            value_list = list(rule.value_list) if rule.value_list is not None else None
+            self._predicates.append((rule, OPERATORS[rule.operator], value_list))
+        self.stats: Dict[str, RuleStats] = {rule.rule_id: RuleStats() for rule in self.rules}
+
+        digest = hashlib.sha256()
+        for rule in self.rules:
+            digest.update(repr(rule).encode())
+        self.fingerprint = digest.hexdigest()[:16]
+
+    @classmethod
+    def load(
+        cls,
+        db: Session,
+        reporting_date: date,
+        version: Optional[str] = None,
+        fallback: Optional[List[Rule]] = None,
+    ) -> "SICRRuleSet":
+        """
+        Read the active rules in force at the reporting date.
+
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            version: Rule version (SICRRule.version), or None for the version in force
+                with the latest effective date (a newer version replaces older ones)
+            fallback: Rules used when none are stored (default: default_rules())
+
+        Returns:
+            SICRRuleSet
+        """
+        query = db.query(SICRRule).filter(
+            SICRRule.is_active.is_(True),
+            SICRRule.effective_date <= reporting_date,
+            or_(SICRRule.expiry_date.is_(None), SICRRule.expiry_date > reporting_date),
+        )
+        if version is not None:
+            query = query.filter(SICRRule.version == version)
+        rows = query.all()
+        if version is None and rows:
+            version = cls._latest_version(rows)
+            rows = [row for row in rows if row.version == version]
+
+        if not rows:
+            logger.info(
+                f"No SICR rules stored for {reporting_date} (version={version}): using defaults"
+            )
+            return cls(fallback if fallback is not None else default_rules(), version="default")
+
+        rule_set = cls([Rule.from_model(row) for row in rows], version=version)
+        logger.info(
+            f"Loaded {len(rule_set.rules)} SICR rules for {reporting_date}: version={version}, "
+            f"fingerprint={rule_set.fingerprint}"
+        )
+        return rule_set
+
+    @staticmethod
+    def _latest_version(rows: List[SICRRule]) -> Optional[str]:
+        """Version with the latest effective date among rules in force (ties: highest version)"""
+        latest: Dict[Optional[str], date] = {}
+        for row in rows:
+            if row.version not in latest or row.effective_date > latest[row.version]:
+                latest[row.version] = row.effective_date
+        return max(latest, key=lambda version: (latest[version], version or ""))
+
+    @property
+    def indicators(self) -> List[str]:
+        return list(self.indicator_bits)
+
+    def rules_for(self, indicator: str) -> List[Rule]:
+        return [rule for rule in self.rules if rule.indicator == indicator]
+
+    def evaluate(self, arrays, fields: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """
+        Indicator bitmap per instrument.
+
+        Args:
+            arrays: StagingArrays
+            fields: Filled with the field arrays the rules used (for rationale details)
+
+        Returns:
+            uint32 array of indicator bits (indicator_bits)
+        """
+        bitmap = np.zeros(len(arrays), dtype=np.uint32)
+        if fields is None:
+            fields = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for rule, predicate, value_list in self._predicates:
+                started = time.perf_counter()
+                # Field arrays are computed once per evaluation (timed on the first rule using them)
+                values = fields.get(rule.field)
+                if values is None:
+                    values = fields[rule.field] = RULE_FIELDS[rule.field](arrays)
+                mask = predicate(values, rule.threshold, value_list)
+                bitmap[mask] |= np.uint32(self.indicator_bits[rule.indicator])
+
+                stats = self.stats[rule.rule_id]
+                stats.seconds += time.perf_counter() - started
+                stats.evaluations += 1
+                stats.instruments += len(arrays)
+                stats.hits += int(np.count_nonzero(mask))
+        return bitmap
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-rule evaluation time and hit counts, most expensive first"""
+        rows = []
+        for rule in self.rules:
+            stats = self.stats[rule.rule_id]
+            rows.append(
+                {
+                    "rule_id": rule.rule_id,
+                    "indicator": rule.indicator,
+                    "evaluations": stats.evaluations,
+                    "instruments": stats.instruments,
+                    "hits": stats.hits,
+                    "hit_rate": stats.hits / stats.instruments if stats.instruments else 0.0,
+                    "seconds": stats.seconds,
+                }
+            )
+        return sorted(rows, key=lambda row: -row["seconds"])
@@ -1,14 +1,24 @@
 """Staging service for IFRS 9 three-stage impairment model"""
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from decimal import Decimal
 from datetime import date
 import uuid
+import numpy as np
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
 
 from src.db.models import FinancialInstrument, Stage, StageTransition
+from src.services.sicr_rules import RISKY_SECTOR_RATINGS, SICRRuleSet, default_rules
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Rows per keyset batch when streaming stage transitions
+TRANSITION_BATCH_SIZE = 5000
+
+# Keyset position in stage transition history: (transition_date, transition_id)
+TransitionKey = Tuple[date, str]
+
 
 class SICRResult:
     """SICR evaluation result"""
@@ -32,7 +42,10 @@ class StagingResult:
 class StagingService:
     """Service for determining impairment stages according to IFRS 9"""
     
-    def __init__(self):
+    def __init__(self, db: Optional[Session] = None):
+        # Database session (only needed for transition history)
+        self.db = db
+        
         # Configurable SICR thresholds (can be loaded from database)
         self.sicr_pd_relative_threshold = Decimal("1.0")  # 100% relative increase
         self.sicr_pd_absolute_threshold = Decimal("0.02")  # 2% absolute increase
@@ -184,8 +197,7 @@ class StagingService:
             if hasattr(instrument.customer, 'sector_risk_rating') and instrument.customer.sector_risk_rating:
                 # Assume rating scale: AAA, AA, A, BBB, BB, B, CCC, CC, C
                 # Downgrade from investment grade (BBB+) to sub-investment grade triggers SICR
-                risky_ratings = ['BB', 'B', 'CCC', 'CC', 'C', 'D']
-                if instrument.customer.sector_risk_rating in risky_ratings:
+                if instrument.customer.sector_risk_rating in RISKY_SECTOR_RATINGS:
                     indicators.append("SECTOR_DOWNGRADE")
                     details["sector_risk_rating"] = instrument.customer.sector_risk_rating
         
@@ -227,43 +239,230 @@ class StagingService:
         # - Disappearance of active market
         
         return False
-    
-    def get_stage_transitions(self, instrument_id: str, start_date: date, 
-                            end_date: date) -> List[StageTransition]:
+
+    def get_stage_transitions(
+        self,
+        instrument_id: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        after: Optional[TransitionKey] = None,
+        descending: bool = False,
+    ) -> List[StageTransition]:
         """
-        Get stage transition history for instrument.
+        Get stage transition history, one keyset page at a time.
+        
+        Transitions are ordered by (transition_date, transition_id) and read
+        with an index range scan (ix_stage_transition_instrument_date, or
+        ix_stage_transition_date without an instrument); pass the key of the
+        last row of a page (transition_key) as after to read the next one.
         
         Args:
-            instrument_id: Instrument ID
-            start_date: Start date
-            end_date: End date
+            instrument_id: Instrument ID (None for all instruments)
+            start_date: First transition date (inclusive, optional)
+            end_date: Last transition date (inclusive, optional)
+            limit: Page size (None for all)
+            after: Key of the last row of the previous page
+            descending: Newest transitions first
             
         Returns:
             List of stage transitions
         """
-        # TODO: Implement database query
-        logger.info(f"Fetching stage transitions for {instrument_id}")
-        return []
+        query = self._transitions_query(
+            select(StageTransition), instrument_id, start_date, end_date, after, descending
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        transitions = self._session().scalars(query).all()
+        logger.info(
+            f"Fetched {len(transitions)} stage transitions for {instrument_id or 'all instruments'}"
+        )
+        return transitions
+
+    def iter_stage_transitions(
+        self,
+        instrument_id: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        batch_size: int = TRANSITION_BATCH_SIZE,
+    ) -> Iterator[Any]:
+        """
+        Stream stage transitions in keyset batches (e.g. migration matrices over years).
+        
+        Each batch is a separate indexed range query, so no cursor or
+        transaction is held open between batches and rows are not kept in
+        the session. Rows have the StageTransition columns as attributes.
+        
+        Args:
+            instrument_id: Instrument ID (None for all instruments)
+            start_date: First transition date (inclusive, optional)
+            end_date: Last transition date (inclusive, optional)
+            batch_size: Rows per query
+            
+        Yields:
+            Stage transition rows in (transition_date, transition_id) order
+        """
+        db = self._session()
+        after = None
+        while True:
+            query = self._transitions_query(
+                select(StageTransition.__table__),
+                instrument_id,
+                start_date,
+                end_date,
+                after,
+                descending=False,
+            )
+            rows = db.execute(query.limit(batch_size)).all()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = transition_key(rows[-1])
+    
+    @staticmethod
+    def _transitions_query(
+        query,
+        instrument_id: Optional[str],
+        start_date: Optional[date],
+        end_date: Optional[date],
+        after: Optional[TransitionKey],
+        descending: bool,
+    ):
+        key = tuple_(StageTransition.transition_date, StageTransition.transition_id)
+        if instrument_id is not None:
+            query = query.where(StageTransition.instrument_id == instrument_id)
+        if start_date is not None:
+            query = query.where(StageTransition.transition_date >= start_date)
+        if end_date is not None:
+            query = query.where(StageTransition.transition_date <= end_date)
+        if after is not None:
+            query = query.where(key < tuple_(*after) if descending else key > tuple_(*after))
+        
+        if descending:
+            return query.order_by(
+                StageTransition.transition_date.desc(), StageTransition.transition_id.desc()
+            )
+        return query.order_by(StageTransition.transition_date, StageTransition.transition_id)
+    
+    def _session(self) -> Session:
+        if self.db is None:
+            raise ValueError("StagingService needs a database session for transition history")
+        return self.db
     
-    def apply_staging_rules(self, instruments: List[FinancialInstrument], 
-                          reporting_date: date) -> Dict[str, StagingResult]:
+    def default_sicr_rules(self) -> SICRRuleSet:
+        """SICR rules from the thresholds above (equivalent to evaluate_sicr)"""
+        return SICRRuleSet(
+            default_rules(
+                self.sicr_dpd_threshold,
+                float(self.sicr_pd_relative_threshold),
+                float(self.sicr_pd_absolute_threshold),
+            ),
+            version="default",
+        )
+
+    def load_sicr_rules(
+        self, db, reporting_date: date, version: Optional[str] = None
+    ) -> SICRRuleSet:
+        """
+        Compile the SICR rules stored for a reporting date (once per run).
+        
+        Args:
+            db: Database session
+            reporting_date: Reporting date
+            version: Rule version (SICRRule.version), or None for the latest version in force
+            
+        Returns:
+            SICRRuleSet (the default rules when none are stored)
+        """
+        return SICRRuleSet.load(
+            db, reporting_date, version, fallback=self.default_sicr_rules().rules
+        )
+
+    def stage_portfolio(
+        self,
+        instruments: List[FinancialInstrument],
+        reporting_date: date,
+        sector_ratings: Optional[Dict[str, str]] = None,
+        current_pd: Optional[np.ndarray] = None,
+        rules: Optional[SICRRuleSet] = None,
+    ):
+        """
+        Stage a whole book with the columnar engine (see staging_engine).
+        
+        Evaluates the DPD backstops and the SICR rules as masks over arrays
+        and returns stage codes and indicator bitmaps; rationale and SICR
+        details are only built on request (StagingOutcome.results).
+        
+        Args:
+            instruments: List of financial instruments
+            reporting_date: Reporting date
+            sector_ratings: Sector risk rating per customer_id (customers are not lazy-loaded)
+            current_pd: Current PD per instrument (default: placeholder as in evaluate_sicr)
+            rules: Compiled SICR rules (load_sicr_rules; default: default_sicr_rules)
+            
+        Returns:
+            StagingOutcome
+        """
+        # Imported here: staging_engine builds on this module's result classes
+        from src.services.staging_engine import build_staging_arrays, evaluate_staging
+        
+        arrays = build_staging_arrays(instruments, reporting_date, sector_ratings, current_pd)
+        outcome = evaluate_staging(
+            arrays,
+            credit_impaired_dpd_threshold=self.credit_impaired_dpd_threshold,
+            rules=rules if rules is not None else self.default_sicr_rules(),
+        )
+        logger.info(
+            f"Staged {len(instruments)} instruments: {int(outcome.changed.sum())} changed stage"
+        )
+        return outcome
+
+    def apply_staging_rules(
+        self,
+        instruments: List[FinancialInstrument],
+        reporting_date: date,
+        changed_only: bool = False,
+        sector_ratings: Optional[Dict[str, str]] = None,
+        rules: Optional[SICRRuleSet] = None,
+    ) -> Dict[str, StagingResult]:
         """
         Apply staging rules to portfolio of instruments.
         
         Args:
             instruments: List of financial instruments
             reporting_date: Reporting date
+            changed_only: Only return (and build rationale for) instruments whose stage changed
+            sector_ratings: Sector risk rating per customer_id
+            rules: Compiled SICR rules (load_sicr_rules)
             
         Returns:
             Dict mapping instrument_id to StagingResult
         """
-        results = {}
-        for instrument in instruments:
-            result = self.determine_stage(instrument, reporting_date)
-            results[instrument.instrument_id] = result
-        
-        logger.info(f"Staged {len(instruments)} instruments")
-        return results
+        outcome = self.stage_portfolio(instruments, reporting_date, sector_ratings, rules=rules)
+        return outcome.results(instruments, changed_only=changed_only)
+
+
+def transition_key(transition) -> TransitionKey:
+    """Keyset position of a stage transition (see get_stage_transitions)"""
+    return transition.transition_date, transition.transition_id
+
+
+def format_transition_cursor(key: TransitionKey) -> str:
+    """Opaque page cursor for a transition key"""
+    return f"{key[0].isoformat()}|{key[1]}"
+
+
+def parse_transition_cursor(cursor: str) -> TransitionKey:
+    """
+    Parse a page cursor (format_transition_cursor).
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    transition_date, separator, transition_id = cursor.partition("|")
+    if not separator or not transition_id:
+        raise ValueError(f"Invalid transition cursor: {cursor!r}")
+    return date.fromisoformat(transition_date), transition_id
 
 
 # Global service instance
@@ -0,0 +1,262 @@
+"""Portfolio staging job: stage the whole book and persist only the changes in bulk"""
+
+from typing import Dict, Any, List, Optional, Sequence
+from datetime import date
+import math
+import time
+import uuid
+from sqlalchemy import select, update, values, column, cast, String
+from sqlalchemy.orm import Session
+
+from src.db.models import (
+    FinancialInstrument,
+    Customer,
+    InstrumentStatus,
+    StageTransition,
+    AuditEntry,
+)
+from src.services.audit_trail import build_audit_entry, staging_state
+from src.services.ecl_results_writer import ECLResultsWriter, _chunks
+from src.services.sicr_rules import SICRRuleSet
+from src.services.staging import StagingService
+from src.services.staging_engine import OPTIONAL_COLUMNS, STAGES
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Columns read for staging (rows are staged without loading ORM instruments)
+STAGING_COLUMNS = [
+    "instrument_id",
+    "customer_id",
+    "origination_date",
+    "current_stage",
+    "days_past_due",
+    "initial_recognition_pd",
+    "is_modified",
+    "modification_date",
+]
+
+# Largest value of StageTransition.pd_change_percentage (Numeric(8, 4))
+MAX_PD_CHANGE_PERCENTAGE = 9999.9999
+
+
+class StagingJob:
+    """
+    Portfolio staging job.
+
+    Stages the book with the columnar engine, then writes only instruments
+    whose stage changed, in chunks of chunk_size inside one transaction:
+
+    - FinancialInstrument.current_stage: one UPDATE ... FROM (VALUES ...) per
+      chunk on PostgreSQL, an executemany UPDATE by primary key elsewhere
+    - StageTransition and STAGE_TRANSITION / STAGE_ASSIGNMENT audit entries:
+      bulk inserts through ECLResultsWriter (COPY on PostgreSQL)
+    """
+
+    METHODS = ("auto", "values", "executemany")
+
+    def __init__(
+        self,
+        db: Session,
+        staging_service: Optional[StagingService] = None,
+        chunk_size: int = 5000,
+        method: str = "auto",
+        write_method: str = "auto",
+    ):
+        if method not in self.METHODS:
+            raise ValueError(f"Invalid update method: {method}. Must be one of {self.METHODS}")
+        self.db = db
+        self.staging_service = staging_service or StagingService()
+        self.chunk_size = chunk_size
+        self.method = method
+        self.writer = ECLResultsWriter(db, chunk_size=chunk_size, method=write_method)
+
+    def run(
+        self,
+        reporting_date: date,
+        user_id: str,
+        instrument_ids: Optional[List[str]] = None,
+        rules: Optional[SICRRuleSet] = None,
+        rule_version: Optional[str] = None,
+        commit: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Restage instruments and persist the stage changes.
+
+        Args:
+            reporting_date: Reporting date
+            user_id: User the transitions are attributed to
+            instrument_ids: Instruments to stage (default: all active instruments)
+            rules: Compiled SICR rules (default: rules stored for the reporting date)
+            rule_version: SICR rule version to load when rules is not given
+                (default: latest in force)
+            commit: Commit the transaction when done
+
+        Returns:
+            Summary with counts per stage and indicator, changes written and rule statistics
+        """
+        started = time.perf_counter()
+        rows = self.load_rows(instrument_ids)
+        if rules is None:
+            rules = self.staging_service.load_sicr_rules(self.db, reporting_date, rule_version)
+
+        outcome = self.staging_service.stage_portfolio(
+            rows, reporting_date, sector_ratings=self.load_sector_ratings(), rules=rules
+        )
+        results = outcome.results(rows)
+
+        changes = []
+        for i in outcome.changed.nonzero()[0]:
+            row = rows[i]
+            changes.append((row, results[row.instrument_id], int(i)))
+
+        updated = self.update_stages(
+            [(row.instrument_id, result.stage) for row, result, _ in changes], reporting_date
+        )
+        transitions = self.writer.write_rows(
+            StageTransition,
+            (
+                self._transition_values(row, result, outcome, i, reporting_date)
+                for row, result, i in changes
+                if row.current_stage is not None
+            ),
+        )
+        audited = self.writer.write_rows(
+            AuditEntry, (self._audit_values(row, result, user_id) for row, result, _ in changes)
+        )
+        if commit:
+            self.db.commit()
+
+        summary = {
+            "reporting_date": reporting_date.isoformat(),
+            "instruments": len(rows),
+            "changed": updated,
+            "transitions": transitions,
+            "audit_entries": audited,
+            "stage_counts": {stage.value: count for stage, count in outcome.stage_counts().items()},
+            "indicator_counts": outcome.indicator_counts(),
+            "rule_version": rules.version,
+            "rules": rules.report(),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            f"Staged {len(rows)} instruments for {reporting_date}: {updated} changed stage "
+            f"({transitions} transitions, {audited} audit entries) in {summary['seconds']}s"
+        )
+        return summary
+
+    def load_rows(self, instrument_ids: Optional[List[str]] = None) -> List[Any]:
+        """Staging columns for instruments (ordered by instrument_id)"""
+        columns = STAGING_COLUMNS + [
+            name for name in OPTIONAL_COLUMNS if hasattr(FinancialInstrument, name)
+        ]
+        query = select(*(getattr(FinancialInstrument, name) for name in columns))
+        if instrument_ids is None:
+            query = query.where(FinancialInstrument.status == InstrumentStatus.ACTIVE)
+        else:
+            query = query.where(FinancialInstrument.instrument_id.in_(instrument_ids))
+        return self.db.execute(query.order_by(FinancialInstrument.instrument_id)).all()
+
+    def load_sector_ratings(self) -> Dict[str, str]:
+        """Sector risk rating per customer (one query; empty if the model has no such column)"""
+        if not hasattr(Customer, "sector_risk_rating"):
+            return {}
+        query = select(Customer.customer_id, Customer.sector_risk_rating).where(
+            Customer.sector_risk_rating.isnot(None)
+        )
+        return dict(self.db.execute(query).all())
+
+    def update_stages(self, stages: Sequence[Any], reporting_date: date) -> int:
+        """
+        Set current_stage and stage_date for changed instruments.
+
+        Args:
+            stages: (instrument_id, new Stage) pairs
+            reporting_date: Stage date
+
+        Returns:
+            Number of instruments updated
+        """
+        use_values = self._use_values()
+        total = 0
+        for chunk in _chunks(stages, self.chunk_size):
+            if use_values:
+                self.db.execute(self._values_update(chunk, reporting_date))
+            else:
+                self.db.execute(
+                    update(FinancialInstrument),
+                    [
+                        {
+                            "instrument_id": instrument_id,
+                            "current_stage": stage,
+                            "stage_date": reporting_date,
+                        }
+                        for instrument_id, stage in chunk
+                    ],
+                )
+            total += len(chunk)
+        return total
+
+    def _use_values(self) -> bool:
+        supported = self.db.get_bind().dialect.name == "postgresql"
+        if self.method == "values" and not supported:
+            dialect = self.db.get_bind().dialect.name
+            raise ValueError(f"UPDATE ... FROM (VALUES ...) is not supported on {dialect}")
+        return supported and self.method in ("auto", "values")
+
+    @staticmethod
+    def _values_update(chunk: Sequence[Any], reporting_date: date):
+        """UPDATE financial_instrument ... FROM (VALUES (id, stage), ...) for one chunk"""
+        stage_type = FinancialInstrument.__table__.c.current_stage.type
+        new_stages = values(
+            column("instrument_id", String), column("stage", String), name="new_stage"
+        ).data([(instrument_id, stage.name) for instrument_id, stage in chunk])
+        return (
+            update(FinancialInstrument)
+            .where(FinancialInstrument.instrument_id == new_stages.c.instrument_id)
+            .values(current_stage=cast(new_stages.c.stage, stage_type), stage_date=reporting_date)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _transition_values(
+        row: Any, result, outcome, i: int, reporting_date: date
+    ) -> Dict[str, Any]:
+        arrays = outcome.arrays
+        pd0, current_pd = float(arrays.pd_at_origination[i]), float(arrays.current_pd[i])
+        change = (current_pd - pd0) / pd0 * 100 if pd0 else math.nan
+        return {
+            "transition_id": str(uuid.uuid4()),
+            "instrument_id": row.instrument_id,
+            "transition_date": reporting_date,
+            "from_stage": STAGES[int(arrays.previous_stage[i])],
+            "to_stage": result.stage,
+            "sicr_indicators": result.sicr_result.indicators if result.sicr_result else [],
+            "pd_at_transition": round(current_pd, 6) if math.isfinite(current_pd) else None,
+            "pd_at_origination": round(pd0, 6) if math.isfinite(pd0) else None,
+            "pd_change_percentage": (
+                round(change, 4)
+                if math.isfinite(change) and abs(change) <= MAX_PD_CHANGE_PERCENTAGE
+                else None
+            ),
+            "days_past_due": int(arrays.days_past_due[i]),
+            "transition_reason": result.rationale,
+            "is_automatic": True,
+        }
+
+    @staticmethod
+    def _audit_values(row: Any, result, user_id: str) -> Dict[str, Any]:
+        from_stage = row.current_stage.value if row.current_stage is not None else None
+        return build_audit_entry(
+            user_id=user_id,
+            action="STAGE_TRANSITION" if from_stage else "STAGE_ASSIGNMENT",
+            entity_type="FinancialInstrument",
+            entity_id=row.instrument_id,
+            before_state={"stage": from_stage} if from_stage else None,
+            after_state=staging_state(
+                result.stage.value,
+                result.rationale,
+                result.sicr_result.indicators if result.sicr_result else [],
+                row.days_past_due,
+            ),
+        )
@@ -0,0 +1,151 @@
+"""Continuous-time (generator matrix) rating migration for monthly PD horizons"""
+
+from typing import Dict, Optional
+import numpy as np
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Eigenvector matrices worse conditioned than this are treated as defective
+MAX_EIGENVECTOR_CONDITION = 1e10
+
+# Taylor terms for the scaling-and-squaring matrix exponential
+EXPM_TAYLOR_TERMS = 16
+
+
+def regularize_generator(generator: np.ndarray) -> np.ndarray:
+    """
+    Make a matrix a valid generator (diagonal adjustment).
+
+    Negative off-diagonal intensities are set to zero and each diagonal
+    element is set so that its row sums to zero.
+
+    Args:
+        generator: Candidate generator
+
+    Returns:
+        Valid generator
+    """
+    regularized = np.where(generator < 0, 0.0, generator)
+    np.fill_diagonal(regularized, 0.0)
+    np.fill_diagonal(regularized, -regularized.sum(axis=1))
+    return regularized
+
+
+def generator_from_matrix(matrix: np.ndarray, observation_period_months: int) -> np.ndarray:
+    """
+    Monthly generator from a discrete transition matrix (matrix logarithm).
+
+    log(P) is computed from the eigendecomposition of P (with a power series
+    fallback when P is not diagonalizable), scaled to one month and
+    regularized.
+
+    Args:
+        matrix: Transition matrix over observation_period_months
+        observation_period_months: Observation period of the matrix
+
+    Returns:
+        Monthly generator matrix
+    """
+    eigenvalues, vectors = np.linalg.eig(matrix)
+    if np.linalg.cond(vectors) < MAX_EIGENVECTOR_CONDITION:
+        log_matrix = vectors @ np.diag(np.log(eigenvalues.astype(complex))) @ np.linalg.inv(vectors)
+        log_matrix = np.real(log_matrix)
+    else:
+        # log(I + A) = A - A²/2 + A³/3 - ... (converges for matrices near I)
+        delta = matrix - np.eye(matrix.shape[0])
+        log_matrix = np.zeros_like(delta)
+        term = np.eye(matrix.shape[0])
+        for k in range(1, 200):
+            term = term @ delta
+            log_matrix += ((-1) ** (k + 1)) * term / k
+            if np.abs(term).max() / k < 1e-14:
+                break
+
+    return regularize_generator(log_matrix / observation_period_months)
+
+
+def expm(matrix: np.ndarray) -> np.ndarray:
+    """Matrix exponential (scaling and squaring with a Taylor series)"""
+    norm = np.abs(matrix).sum(axis=1).max()
+    squarings = max(0, int(np.ceil(np.log2(norm))) + 1) if norm > 0 else 0
+    scaled = matrix / (2**squarings)
+
+    result = np.eye(matrix.shape[0])
+    term = np.eye(matrix.shape[0])
+    for k in range(1, EXPM_TAYLOR_TERMS + 1):
+        term = term @ scaled / k
+        result += term
+
+    for _ in range(squarings):
+        result = result @ result
+    return result
+
+
+class CachedGenerator:
+    """
+    Monthly generator Q with one eigendecomposition.
+
+    P(t) = exp(Q t) = V diag(exp(λ t)) V⁻¹ for any number of months t, so a
+    full monthly PD curve for every rating is one matrix product. exp(Q t)
+    matrices are cached per month. If Q is not diagonalizable, the one-month
+    matrix is computed once and raised to successive powers instead.
+    """
+
+    def __init__(self, generator: np.ndarray):
+        self.generator = generator
+        self._expm: Dict[int, np.ndarray] = {}
+
+        eigenvalues, vectors = np.linalg.eig(generator)
+        self._eigen: Optional[tuple] = None
+        if np.linalg.cond(vectors) < MAX_EIGENVECTOR_CONDITION:
+            self._eigen = (eigenvalues, vectors, np.linalg.inv(vectors))
+        else:
+            logger.warning("Generator is not diagonalizable, using repeated one-month products")
+
+    def transition_matrix(self, months: int) -> np.ndarray:
+        """Transition matrix over a number of months (cached)"""
+        cached = self._expm.get(months)
+        if cached is not None:
+            return cached
+
+        if months == 0:
+            matrix = np.eye(self.generator.shape[0])
+        elif self._eigen is not None:
+            eigenvalues, vectors, inverse = self._eigen
+            matrix = np.real(vectors @ np.diag(np.exp(eigenvalues * months)) @ inverse)
+        elif months == 1:
+            matrix = expm(self.generator)
+        else:
+            matrix = self.transition_matrix(months - 1) @ self.transition_matrix(1)
+
+        self._expm[months] = matrix
+        return matrix
+
+    def default_probabilities(self, months: np.ndarray, default_idx: int) -> np.ndarray:
+        """
+        Cumulative default probabilities for every rating.
+
+        Args:
+            months: Horizons in months
+            default_idx: Index of the default state
+
+        Returns:
+            Array of shape (ratings, horizons)
+        """
+        months = np.asarray(months)
+        if self._eigen is not None:
+            eigenvalues, vectors, inverse = self._eigen
+            growth = np.exp(np.outer(eigenvalues, months)) * inverse[:, default_idx][:, None]
+            cumulative = np.real(vectors @ growth)
+        else:
+            horizons = months.astype(int)
+            if horizons.size:
+                for month in range(1, int(horizons.max()) + 1):
+                    self.transition_matrix(month)
+            cumulative = np.array(
+                [self.transition_matrix(int(month))[:, default_idx] for month in horizons]
+            ).T.reshape(self.generator.shape[0], horizons.size)
+
+        return np.clip(cumulative, 0.0, 1.0)
@@ -1,16 +1,32 @@
 """Transition matrix service for PD term structure calculation"""
 from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
 from decimal import Decimal
 from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+import uuid
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 import numpy as np
+import pandas as pd
 
 from src.db.models import (
-    TransitionMatrix, RatingHistory, FinancialInstrument,
-    CreditRating, MacroScenario
+    TransitionMatrix,
+    RatingHistory,
+    FinancialInstrument,
+    Customer,
+    CreditRating,
+    MacroScenario,
 )
 from src.services.macro_regression import macro_regression_service
+from src.services.transition_generator import (
+    CachedGenerator,
+    generator_from_matrix,
+    regularize_generator,
+)
+from src.utils.cache import get_or_compute, delete_cache, compact_serializer
 from src.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -48,6 +64,143 @@ class TransitionMatrixResult:
         self.psi = psi  # Population Stability Index
 
 
+class TransitionMatrixBootstrapResult:
+    """Bootstrap confidence bands for a transition matrix"""
+
+    def __init__(
+        self,
+        point_estimate: TransitionMatrixResult,
+        percentile_matrices: Dict[float, np.ndarray],
+        psi_percentiles: Dict[float, Decimal],
+        n_resamples: int,
+        num_customers: int,
+    ):
+        self.point_estimate = point_estimate
+        self.percentile_matrices = percentile_matrices
+        self.psi_percentiles = psi_percentiles  # Empty without a previous calibration
+        self.n_resamples = n_resamples
+        self.num_customers = num_customers
+
+
+# Floor for probabilities in PSI (empty cells would otherwise give log(0))
+PSI_EPSILON = 1e-6
+
+
+def population_stability_index(
+    matrix: np.ndarray, previous_matrix: np.ndarray, row_weights: np.ndarray
+) -> np.ndarray:
+    """
+    PSI between transition matrices.
+    
+    PSI = Σ_i w_i Σ_j (p_ij - q_ij) × ln(p_ij / q_ij), where p is the new
+    matrix, q the previous calibration and w the share of observations
+    starting in rating i.
+    
+    Args:
+        matrix: Transition matrix or stack of matrices (..., n, n)
+        previous_matrix: Previous calibration (n, n)
+        row_weights: Observations per starting rating (..., n)
+        
+    Returns:
+        PSI (one value per matrix in the stack)
+    """
+    p = np.maximum(matrix, PSI_EPSILON)
+    q = np.maximum(previous_matrix, PSI_EPSILON)
+    row_psi = ((p - q) * np.log(p / q)).sum(axis=-1)
+    total = row_weights.sum(axis=-1, keepdims=True)
+    weights = np.divide(
+        row_weights, total, out=np.zeros_like(row_weights, dtype=float), where=total > 0
+    )
+    return (weights * row_psi).sum(axis=-1)
+
+
+def _resample_counts(
+    customer_counts: np.ndarray, n_resamples: int, seed: np.random.SeedSequence
+) -> np.ndarray:
+    """
+    Transition counts for bootstrap resamples of customers.
+    
+    Each resample draws customers with replacement; its counts are the
+    customer count rows weighted by how often each customer was drawn.
+    
+    Returns:
+        Flattened counts of shape (n_resamples, n × n)
+    """
+    rng = np.random.default_rng(seed)
+    num_customers = customer_counts.shape[0]
+    draws = rng.multinomial(
+        num_customers, np.full(num_customers, 1.0 / num_customers), size=n_resamples
+    )
+    return draws @ customer_counts
+
+
+def _bootstrap_block(
+    shm_name: str, shape: Tuple[int, int], n_resamples: int, seed: np.random.SeedSequence
+) -> np.ndarray:
+    """Bootstrap a block of resamples against per-customer counts in shared memory"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        customer_counts = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        return _resample_counts(customer_counts, n_resamples, seed)
+    finally:
+        shm.close()
+
+
+class CachedTransitionMatrix:
+    """
+    Calibrated transition matrix with its powers.
+    
+    Powers are computed incrementally (P^k = P^(k-1) × P) and kept, so a PD
+    curve over any number of periods costs at most one matrix product per
+    period not seen before.
+    """
+
+    def __init__(
+        self,
+        segment: str,
+        calibration_date: date,
+        matrix: np.ndarray,
+        observation_period_months: int,
+    ):
+        self.segment = segment
+        self.calibration_date = calibration_date
+        self.matrix = matrix
+        self.observation_period_months = observation_period_months
+        self._powers = [np.eye(matrix.shape[0])]
+        self._generator: Optional[CachedGenerator] = None
+    
+    @property
+    def generator(self) -> CachedGenerator:
+        """Monthly generator estimated from the matrix (matrix logarithm)"""
+        if self._generator is None:
+            self._generator = CachedGenerator(
+                generator_from_matrix(self.matrix, self.observation_period_months)
+            )
+        return self._generator
+    
+    def power(self, num_periods: int) -> np.ndarray:
+        """Matrix raised to num_periods"""
+        while len(self._powers) <= num_periods:
+            self._powers.append(self._powers[-1] @ self.matrix)
+        return self._powers[num_periods]
+    
+    def default_probabilities(self, num_periods: np.ndarray, default_idx: int) -> np.ndarray:
+        """
+        Cumulative default probabilities for every rating.
+        
+        Args:
+            num_periods: Number of observation periods per horizon
+            default_idx: Index of the default state
+            
+        Returns:
+            Array of shape (ratings, horizons)
+        """
+        num_periods = np.asarray(num_periods, dtype=int)
+        periods, positions = np.unique(num_periods, return_inverse=True)
+        columns = np.array([self.power(int(k))[:, default_idx] for k in periods])
+        return columns[positions].T.reshape(self.matrix.shape[0], num_periods.size)
+
+
 class TransitionMatrixService:
     """Service for building and using transition matrices for PD calculation"""
     
@@ -56,6 +209,131 @@ class TransitionMatrixService:
         "AAA", "AA", "A", "BBB", "BB", "B", "CCC", "CC", "C", "D"
     ]
     
+    # Stored matrices are calibrated over this observation period
+    OBSERVATION_PERIOD_MONTHS = 12
+    
+    # Calibrated matrices kept in memory (segment, matrix type, calibration date)
+    MATRIX_CACHE_SIZE = 64
+    
+    # Seconds a loaded matrix is shared through Redis
+    MATRIX_REDIS_TTL = 3600
+    
+    # PD engines: discrete matrix powers (whole observation periods only, the
+    # default) or the continuous-time generator (any monthly horizon, opt-in)
+    PD_METHODS = ("discrete", "generator")
+    
+    def __init__(self):
+        self._matrix_cache: "OrderedDict[Tuple[str, str, date], CachedTransitionMatrix]" = (
+            OrderedDict()
+        )
+
+    def get_matrix(
+        self,
+        db: Session,
+        segment: str,
+        calibration_date: Optional[date] = None,
+        matrix_type: str = "PIT",
+    ) -> CachedTransitionMatrix:
+        """
+        Load a calibrated transition matrix (cached by segment and calibration date).
+        
+        Args:
+            db: Database session
+            segment: Portfolio segment
+            calibration_date: Calibration date (default: latest calibration)
+            matrix_type: PIT or TTC
+            
+        Returns:
+            CachedTransitionMatrix
+        """
+        if calibration_date is None:
+            calibration_date = (
+                db.query(func.max(TransitionMatrix.calibration_date))
+                .filter(
+                    TransitionMatrix.portfolio_segment == segment,
+                    TransitionMatrix.matrix_type == matrix_type,
+                )
+                .scalar()
+            )
+            if calibration_date is None:
+                raise ValueError(f"No transition matrix found for segment {segment}")
+        
+        key = (segment, matrix_type, calibration_date)
+        cached = self._matrix_cache.get(key)
+        if cached is not None:
+            self._matrix_cache.move_to_end(key)
+            return cached
+
+        matrix = np.asarray(
+            get_or_compute(
+                self._matrix_cache_key(segment, matrix_type, calibration_date),
+                lambda: self._load_matrix(db, segment, matrix_type, calibration_date),
+                expire=self.MATRIX_REDIS_TTL,
+                serializer=compact_serializer(),
+            ),
+            dtype=float,
+        )
+
+        cached = CachedTransitionMatrix(
+            segment=segment,
+            calibration_date=calibration_date,
+            matrix=matrix,
+            observation_period_months=self.OBSERVATION_PERIOD_MONTHS,
+        )
+        self._matrix_cache[key] = cached
+        if len(self._matrix_cache) > self.MATRIX_CACHE_SIZE:
+            self._matrix_cache.popitem(last=False)
+
+        logger.info(
+            f"Loaded transition matrix for segment {segment} calibrated on {calibration_date}"
+        )
+        return cached
+    
+    @staticmethod
+    def _matrix_cache_key(segment: str, matrix_type: str, calibration_date: date) -> str:
+        return f"transition_matrix:{segment}:{matrix_type}:{calibration_date}"
+
+    def _load_matrix(
+        self, db: Session, segment: str, matrix_type: str, calibration_date: date
+    ) -> np.ndarray:
+        """Read a stored matrix from its cells"""
+        # Matrices are stored one row per (rating_from, rating_to) cell
+        cells = (
+            db.query(
+                TransitionMatrix.rating_from,
+                TransitionMatrix.rating_to,
+                TransitionMatrix.transition_probability,
+            )
+            .filter(
+                TransitionMatrix.portfolio_segment == segment,
+                TransitionMatrix.matrix_type == matrix_type,
+                TransitionMatrix.calibration_date == calibration_date,
+            )
+            .all()
+        )
+
+        if not cells:
+            raise ValueError(
+                f"No transition matrix found for segment {segment} calibrated on {calibration_date}"
+            )
+        
+        n_classes = len(self.RATING_CLASSES)
+        matrix = np.zeros((n_classes, n_classes))
+        for rating_from, rating_to, probability in cells:
+            from_idx = self._rating_to_index(rating_from)
+            to_idx = self._rating_to_index(rating_to)
+            if from_idx is not None and to_idx is not None:
+                matrix[from_idx, to_idx] = float(probability)
+        
+        # Ratings without observations do not transition
+        empty_rows = matrix.sum(axis=1) == 0
+        matrix[empty_rows, empty_rows] = 1.0
+        return matrix
+    
+    def clear_cache(self):
+        """Drop cached matrices (e.g. after recalibration)"""
+        self._matrix_cache.clear()
+    
     def build_transition_matrix(
         self,
         db: Session,
@@ -71,7 +349,7 @@ class TransitionMatrixService:
         
         Args:
             db: Database session
-            segment: Customer segment
+            segment: Customer segment (customer type)
             start_date: Start date for historical data
             end_date: End date for historical data
             observation_period_months: Observation period (typically 12 months)
@@ -82,73 +360,28 @@ class TransitionMatrixService:
         logger.info(f"Building transition matrix for segment {segment}")
         
         # Fetch historical rating data
-        rating_history = db.query(RatingHistory).filter(
-            RatingHistory.segment == segment,
-            RatingHistory.rating_date >= start_date,
-            RatingHistory.rating_date <= end_date
-        ).order_by(RatingHistory.instrument_id, RatingHistory.rating_date).all()
+        history = self.load_rating_history(db, segment, start_date, end_date)
         
-        if not rating_history:
+        if history.empty:
             raise ValueError(f"No rating history found for segment {segment}")
         
-        # Build transition counts matrix
-        n_classes = len(self.RATING_CLASSES)
-        transition_counts = np.zeros((n_classes, n_classes))
-        
-        # Group by instrument and track transitions
-        instrument_ratings = {}
-        for record in rating_history:
-            if record.instrument_id not in instrument_ratings:
-                instrument_ratings[record.instrument_id] = []
-            instrument_ratings[record.instrument_id].append(record)
-        
-        num_observations = 0
-        
-        for instrument_id, ratings in instrument_ratings.items():
-            # Sort by date
-            ratings.sort(key=lambda x: x.rating_date)
-            
-            # Track transitions over observation period
-            for i in range(len(ratings) - 1):
-                current_rating = ratings[i].credit_rating
-                next_rating = ratings[i + 1].credit_rating
-                
-                # Check if observation period matches
-                days_diff = (ratings[i + 1].rating_date - ratings[i].rating_date).days
-                if abs(days_diff - (observation_period_months * 30)) < 15:  # Allow 15-day tolerance
-                    from_idx = self._rating_to_index(current_rating)
-                    to_idx = self._rating_to_index(next_rating)
-                    
-                    if from_idx is not None and to_idx is not None:
-                        transition_counts[from_idx, to_idx] += 1
-                        num_observations += 1
+        # Count transitions over the observation period
+        transitions = self.extract_transitions(history, observation_period_months)
+        transition_counts = self.count_transitions(transitions)
+        num_observations = len(transitions)
         
         # Convert counts to probabilities (row-wise normalization)
-        transition_matrix = np.zeros((n_classes, n_classes))
-        for i in range(n_classes):
-            row_sum = transition_counts[i, :].sum()
-            if row_sum > 0:
-                transition_matrix[i, :] = transition_counts[i, :] / row_sum
-            else:
-                # No observations for this rating class, assume no transition
-                transition_matrix[i, i] = 1.0
-        
-        # Calculate Population Stability Index (PSI)
-        psi = self._calculate_psi(transition_matrix)
+        transition_matrix = self._normalize_counts(transition_counts)
+        
+        # Calculate Population Stability Index (PSI) against the previous calibration
+        calibration_date = date.today()
+        previous = self._previous_matrix(db, segment, calibration_date)
+        psi = self._calculate_psi(transition_matrix, previous, transition_counts.sum(axis=1))
         
         # Save to database
-        matrix_record = TransitionMatrix(
-            segment=segment,
-            observation_period_months=observation_period_months,
-            transition_matrix=transition_matrix.tolist(),
-            rating_classes=self.RATING_CLASSES,
-            calibration_date=date.today(),
-            num_observations=num_observations,
-            psi=psi,
-            is_active=True
+        self._save_matrix(
+            db, segment, transition_matrix, start_date, end_date, calibration_date, psi
         )
-        
-        db.add(matrix_record)
         db.commit()
         
         logger.info(f"Transition matrix built: {num_observations} observations, PSI={psi}")
@@ -161,12 +394,334 @@ class TransitionMatrixService:
             psi=psi
         )
     
+    def bootstrap_transition_matrix(
+        self,
+        db: Session,
+        segment: str,
+        start_date: date,
+        end_date: date,
+        observation_period_months: int = 12,
+        n_resamples: int = 1000,
+        percentiles: Tuple[float, ...] = (2.5, 50.0, 97.5),
+        max_workers: Optional[int] = None,
+        block_size: int = 50,
+        seed: Optional[int] = None,
+    ) -> TransitionMatrixBootstrapResult:
+        """
+        Bootstrap confidence bands for a segment's transition matrix.
+        
+        Customers are resampled with replacement (all of a customer's
+        transitions move together). Per-customer transition counts are built
+        once and placed in shared memory; worker processes draw blocks of
+        resamples and return their counts, so each resample costs one
+        weighted sum instead of a recount. Nothing is stored.
+        
+        Args:
+            db: Database session
+            segment: Customer segment (customer type)
+            start_date: Start date for historical data
+            end_date: End date for historical data
+            observation_period_months: Observation period
+            n_resamples: Number of bootstrap resamples
+            percentiles: Percentiles of the resampled matrices to return
+            max_workers: Worker processes (default: CPU count, 0 runs in process)
+            block_size: Resamples per worker task
+            seed: Random seed (results do not depend on max_workers)
+            
+        Returns:
+            TransitionMatrixBootstrapResult with percentile matrices and PSI bands
+        """
+        logger.info(
+            f"Bootstrapping transition matrix for segment {segment} ({n_resamples} resamples)"
+        )
+
+        history = self.load_rating_history(db, segment, start_date, end_date)
+        transitions = self.extract_transitions(history, observation_period_months)
+        if transitions.empty:
+            raise ValueError(f"No rating transitions found for segment {segment}")
+        
+        # Per-customer transition counts (customers × n²)
+        n_classes = len(self.RATING_CLASSES)
+        customer_codes, _ = pd.factorize(transitions["customer_id"])
+        cells = transitions["from_idx"].to_numpy(dtype=int) * n_classes + transitions[
+            "to_idx"
+        ].to_numpy(dtype=int)
+        customer_counts = np.zeros((customer_codes.max() + 1, n_classes * n_classes))
+        np.add.at(customer_counts, (customer_codes, cells), 1.0)
+
+        blocks = [
+            min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)
+        ]
+        seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+        workers = multiprocessing.cpu_count() if max_workers is None else max_workers
+        
+        if workers > 0 and len(blocks) > 1:
+            resampled = self._bootstrap_parallel(customer_counts, blocks, seeds, workers)
+        else:
+            resampled = [
+                _resample_counts(customer_counts, size, block_seed)
+                for size, block_seed in zip(blocks, seeds)
+            ]
+
+        counts = np.concatenate(resampled).reshape(n_resamples, n_classes, n_classes)
+        matrices = self._normalize_counts(counts)
+        
+        point_counts = customer_counts.sum(axis=0).reshape(n_classes, n_classes)
+        point_matrix = self._normalize_counts(point_counts)
+        previous = self._previous_matrix(db, segment, date.today())
+        
+        psi_percentiles = {}
+        if previous is not None:
+            psi_samples = population_stability_index(matrices, previous, counts.sum(axis=2))
+            psi_percentiles = {
+                q: Decimal(str(value))
+                for q, value in zip(percentiles, np.percentile(psi_samples, percentiles))
+            }
+        
+        point_estimate = TransitionMatrixResult(
+            matrix=point_matrix,
+            rating_classes=self.RATING_CLASSES,
+            observation_period_months=observation_period_months,
+            num_observations=len(transitions),
+            psi=self._calculate_psi(point_matrix, previous, point_counts.sum(axis=1)),
+        )
+
+        logger.info(
+            f"Bootstrap complete: {n_resamples} resamples of {customer_counts.shape[0]} customers"
+        )
+
+        return TransitionMatrixBootstrapResult(
+            point_estimate=point_estimate,
+            percentile_matrices=dict(
+                zip(percentiles, np.percentile(matrices, percentiles, axis=0))
+            ),
+            psi_percentiles=psi_percentiles,
+            n_resamples=n_resamples,
+            num_customers=customer_counts.shape[0],
+        )
+    
+    def _bootstrap_parallel(
+        self,
+        customer_counts: np.ndarray,
+        blocks: List[int],
+        seeds: List[np.random.SeedSequence],
+        workers: int,
+    ) -> List[np.ndarray]:
+        """Run bootstrap blocks on a process pool sharing the customer counts"""
+        shm = shared_memory.SharedMemory(create=True, size=customer_counts.nbytes)
+        try:
+            shared = np.ndarray(customer_counts.shape, dtype=np.float64, buffer=shm.buf)
+            shared[:] = customer_counts
+            
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(blocks)), mp_context=context
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _bootstrap_block, shm.name, customer_counts.shape, size, block_seed
+                    )
+                    for size, block_seed in zip(blocks, seeds)
+                ]
+                return [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    def load_rating_history(
+        self, db: Session, segment: str, start_date: date, end_date: date
+    ) -> pd.DataFrame:
+        """
+        Load rating history as a frame (customer_id, rating, rating_date).
+        
+        Only the three needed columns are selected; rows are ordered by
+        customer and date on the server.
+        
+        Args:
+            db: Database session
+            segment: Customer segment (customer type)
+            start_date: Start date for historical data
+            end_date: End date for historical data
+            
+        Returns:
+            DataFrame with one row per rating observation
+        """
+        statement = (
+            select(RatingHistory.customer_id, RatingHistory.rating, RatingHistory.rating_date)
+            .join(Customer, Customer.customer_id == RatingHistory.customer_id)
+            .where(
+                Customer.customer_type == segment,
+                RatingHistory.rating_date >= start_date,
+                RatingHistory.rating_date <= end_date,
+            )
+            .order_by(RatingHistory.customer_id, RatingHistory.rating_date)
+        )
+
+        rows = db.execute(statement).all()
+        return pd.DataFrame(rows, columns=["customer_id", "rating", "rating_date"])
+    
+    def extract_transitions(
+        self, history: pd.DataFrame, observation_period_months: int = 12
+    ) -> pd.DataFrame:
+        """
+        Pair each rating with the same customer's rating one observation period later.
+        
+        A pair counts when the later rating is within 15 days of
+        observation_period_months × 30 days; with monthly ratings every month
+        starts an overlapping cohort.
+        
+        Args:
+            history: Rating history (customer_id, rating, rating_date)
+            observation_period_months: Observation period
+            
+        Returns:
+            DataFrame (customer_id, from_idx, to_idx) with one row per transition
+        """
+        columns = ["customer_id", "from_idx", "to_idx"]
+        rating_index = {rating: idx for idx, rating in enumerate(self.RATING_CLASSES)}
+        ratings = (
+            history["rating"]
+            .map(lambda rating: rating_index.get(getattr(rating, "value", rating), -1))
+            .to_numpy()
+        )
+        valid = ratings >= 0
+        if not valid.any():
+            return pd.DataFrame(columns=columns)
+        
+        customers = history["customer_id"].to_numpy()[valid]
+        ratings = ratings[valid]
+        days = (
+            pd.to_datetime(history["rating_date"])
+            .to_numpy()[valid]
+            .astype("datetime64[D]")
+            .astype(np.int64)
+        )
+
+        # One sortable key per observation: customer block, then day
+        customer_codes, customer_ids = pd.factorize(customers)
+        span = int(days.max() - days.min()) + observation_period_months * 30 + 30
+        keys = customer_codes.astype(np.int64) * span + (days - days.min())
+        order = np.argsort(keys, kind="stable")
+        keys, ratings, customer_codes = keys[order], ratings[order], customer_codes[order]
+        
+        # First observation within ±14 days of one observation period later
+        period_days = observation_period_months * 30
+        later = np.searchsorted(keys, keys + period_days - 14, side="left")
+        found = later < len(keys)
+        later = np.where(found, later, 0)
+        found &= keys[later] <= keys + period_days + 14
+
+        return pd.DataFrame(
+            {
+                "customer_id": customer_ids[customer_codes[found]],
+                "from_idx": ratings[found],
+                "to_idx": ratings[later[found]],
+            },
+            columns=columns,
+        )
+
+    def count_transitions(
+        self, transitions: pd.DataFrame, weights: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Transition counts matrix.
+        
+        Args:
+            transitions: Transitions (from_idx, to_idx)
+            weights: Optional weight per transition
+            
+        Returns:
+            Counts array of shape (ratings, ratings)
+        """
+        n_classes = len(self.RATING_CLASSES)
+        counts = np.zeros((n_classes, n_classes))
+        np.add.at(
+            counts,
+            (
+                transitions["from_idx"].to_numpy(dtype=int),
+                transitions["to_idx"].to_numpy(dtype=int),
+            ),
+            1.0 if weights is None else weights,
+        )
+        return counts
+    
+    def _normalize_counts(self, transition_counts: np.ndarray) -> np.ndarray:
+        """
+        Row-normalize counts (a matrix or a stack of matrices); ratings
+        without observations do not transition.
+        """
+        row_sums = transition_counts.sum(axis=-1, keepdims=True)
+        transition_matrix = np.divide(
+            transition_counts,
+            row_sums,
+            out=np.zeros_like(transition_counts, dtype=float),
+            where=row_sums > 0,
+        )
+        diagonal = np.einsum("...ii->...i", transition_matrix)
+        diagonal[row_sums[..., 0] == 0] = 1.0
+        return transition_matrix
+    
+    def _previous_matrix(self, db: Session, segment: str, before: date) -> Optional[np.ndarray]:
+        """Latest calibration of the segment before a date (None if there is none)"""
+        calibration_date = (
+            db.query(func.max(TransitionMatrix.calibration_date))
+            .filter(
+                TransitionMatrix.portfolio_segment == segment,
+                TransitionMatrix.matrix_type == "PIT",
+                TransitionMatrix.calibration_date < before,
+            )
+            .scalar()
+        )
+        if calibration_date is None:
+            return None
+        return self.get_matrix(db, segment, calibration_date).matrix
+    
+    def _save_matrix(
+        self,
+        db: Session,
+        segment: str,
+        transition_matrix: np.ndarray,
+        start_date: date,
+        end_date: date,
+        calibration_date: date,
+        psi: Decimal,
+        matrix_type: str = "PIT",
+    ):
+        """Store a matrix as one row per cell, replacing a calibration from the same date"""
+        db.query(TransitionMatrix).filter(
+            TransitionMatrix.portfolio_segment == segment,
+            TransitionMatrix.matrix_type == matrix_type,
+            TransitionMatrix.calibration_date == calibration_date,
+        ).delete(synchronize_session=False)
+        self._matrix_cache.pop((segment, matrix_type, calibration_date), None)
+        delete_cache(self._matrix_cache_key(segment, matrix_type, calibration_date))
+
+        db.add_all(
+            [
+                TransitionMatrix(
+                    matrix_id=str(uuid.uuid4()),
+                    portfolio_segment=segment,
+                    rating_from=rating_from,
+                    rating_to=rating_to,
+                    transition_probability=Decimal(str(round(float(transition_matrix[i, j]), 8))),
+                    observation_period_start=start_date,
+                    observation_period_end=end_date,
+                    calibration_date=calibration_date,
+                    matrix_type=matrix_type,
+                    psi_value=psi,
+                )
+                for i, rating_from in enumerate(self.RATING_CLASSES)
+                for j, rating_to in enumerate(self.RATING_CLASSES)
+            ]
+        )
+
     def calculate_pit_pd(
         self,
         db: Session,
         current_rating: CreditRating,
         segment: str,
-        horizon_months: int = 12
+        horizon_months: int = 12,
+        method: str = "discrete",
     ) -> Decimal:
         """
         Calculate Point-in-Time (PIT) PD using transition matrix.
@@ -178,35 +733,31 @@ class TransitionMatrixService:
             current_rating: Current credit rating
             segment: Customer segment
             horizon_months: Time horizon in months
+            method: "discrete" (P^(horizon // observation period)) or "generator"
+                (exp(Q × horizon))
             
         Returns:
             PIT PD
         """
         logger.info(f"Calculating PIT PD for rating {current_rating}, horizon {horizon_months} months")
         
-        # Fetch transition matrix
-        matrix_record = db.query(TransitionMatrix).filter(
-            TransitionMatrix.segment == segment,
-            TransitionMatrix.is_active == True
-        ).first()
-        
-        if not matrix_record:
-            raise ValueError(f"No transition matrix found for segment {segment}")
-        
-        # Convert to numpy array
-        transition_matrix = np.array(matrix_record.transition_matrix)
+        self._check_method(method)
+        matrix = self.get_matrix(db, segment)
         
         # Get current rating index
         current_idx = self._rating_to_index(current_rating)
         if current_idx is None:
             raise ValueError(f"Invalid rating: {current_rating}")
         
-        # Calculate number of periods
-        observation_period = matrix_record.observation_period_months
-        num_periods = horizon_months // observation_period
-        
-        # Raise matrix to power of num_periods to get multi-period transition probabilities
-        multi_period_matrix = np.linalg.matrix_power(transition_matrix, num_periods)
+        if method == "generator":
+            # Transition probabilities over the horizon (cached exp(Q t))
+            multi_period_matrix = matrix.generator.transition_matrix(horizon_months)
+        else:
+            # Calculate number of periods
+            num_periods = horizon_months // matrix.observation_period_months
+            
+            # Multi-period transition probabilities (cached powers)
+            multi_period_matrix = matrix.power(num_periods)
         
         # PD is probability of transitioning to default state (last column)
         default_idx = len(self.RATING_CLASSES) - 1  # "D" is last rating
@@ -262,12 +813,89 @@ class TransitionMatrixService:
         
         return ttc_pd
     
+    def default_probability_curves(
+        self,
+        db: Session,
+        segment: str,
+        months: int,
+        scenario: Optional[MacroScenario] = None,
+        calibration_date: Optional[date] = None,
+        method: str = "discrete",
+    ) -> np.ndarray:
+        """
+        Cumulative PD for every rating and monthly horizon 1..months.
+        
+        Args:
+            db: Database session
+            segment: Customer segment
+            months: Number of monthly horizons
+            scenario: Optional macro scenario for adjustment
+            calibration_date: Calibration date (default: latest calibration)
+            method: "discrete" (matrix powers, constant within an observation period)
+                or "generator" (one eigendecomposition for all months)
+            
+        Returns:
+            Array of shape (ratings, months)
+        """
+        self._check_method(method)
+        matrix = self.get_matrix(db, segment, calibration_date)
+        
+        horizons = np.arange(1, months + 1)
+        default_idx = len(self.RATING_CLASSES) - 1  # "D" is last rating
+        if method == "generator":
+            cumulative = matrix.generator.default_probabilities(horizons, default_idx)
+        else:
+            cumulative = matrix.default_probabilities(
+                horizons // matrix.observation_period_months, default_idx
+            )
+        
+        # Apply macro adjustment if scenario provided (one multiplicative factor per scenario)
+        if scenario:
+            adjustment_result = macro_regression_service.apply_macro_adjustment_pd(
+                db, Decimal("1.0"), scenario, segment
+            )
+            cumulative = np.minimum(cumulative * float(adjustment_result.adjustment_factor), 1.0)
+        
+        return cumulative
+    
+    def project_pd_curves(
+        self,
+        db: Session,
+        segment: str,
+        months: int,
+        scenario: Optional[MacroScenario] = None,
+        calibration_date: Optional[date] = None,
+        method: str = "discrete",
+    ) -> Dict[str, PDCurve]:
+        """
+        Project PD curves for every rating class at once.
+        
+        Args:
+            db: Database session
+            segment: Customer segment
+            months: Number of months to project
+            scenario: Optional macro scenario for adjustment
+            calibration_date: Calibration date (default: latest calibration)
+            method: PD engine (see default_probability_curves)
+            
+        Returns:
+            Dict mapping rating class to PDCurve
+        """
+        cumulative = self.default_probability_curves(
+            db, segment, months, scenario, calibration_date, method
+        )
+        return {
+            rating: self._build_pd_curve(cumulative[idx], method)
+            for idx, rating in enumerate(self.RATING_CLASSES)
+        }
+    
     def project_pd_curve(
         self,
         db: Session,
         instrument: FinancialInstrument,
         segment: str,
-        scenario: Optional[MacroScenario] = None
+        scenario: Optional[MacroScenario] = None,
+        method: str = "discrete",
     ) -> PDCurve:
         """
         Project PD curve over remaining maturity of instrument.
@@ -277,6 +905,7 @@ class TransitionMatrixService:
             instrument: Financial instrument
             segment: Customer segment
             scenario: Optional macro scenario for adjustment
+            method: PD engine (see default_probability_curves)
             
         Returns:
             PDCurve with term structure
@@ -286,50 +915,90 @@ class TransitionMatrixService:
         # Calculate remaining maturity in months
         remaining_months = self._calculate_remaining_months(instrument)
         
-        # Get current rating
-        current_rating = instrument.credit_rating or CreditRating.BBB
+        # Get current rating (held on the customer)
+        customer_rating = instrument.customer.credit_rating if instrument.customer else None
+        current_idx = self._rating_to_index(customer_rating or CreditRating.BBB)
+        if current_idx is None:
+            current_idx = self._rating_to_index(CreditRating.BBB)
         
-        # Calculate PIT PD for each period
-        pd_by_period = {}
-        cumulative_pd = {}
-        marginal_pd = {}
+        cumulative = self.default_probability_curves(
+            db, segment, remaining_months, scenario, method=method
+        )
         
-        cumulative_survival = Decimal("1.0")
+        logger.info(f"PD curve projected for {remaining_months} months")
         
-        for month in range(1, remaining_months + 1):
-            # Calculate PIT PD for this horizon
-            pit_pd = self.calculate_pit_pd(db, current_rating, segment, month)
-            
-            # Apply macro adjustment if scenario provided
-            if scenario:
-                adjustment_result = macro_regression_service.apply_macro_adjustment_pd(
-                    db, pit_pd, scenario, segment
-                )
-                adjusted_pd = adjustment_result.adjusted_value
-            else:
-                adjusted_pd = pit_pd
-            
-            pd_by_period[month] = adjusted_pd
-            
-            # Calculate marginal PD (PD for this specific period)
-            if month == 1:
-                marginal_pd[month] = adjusted_pd
-            else:
-                marginal_pd[month] = adjusted_pd - cumulative_pd[month - 1]
-            
-            # Update cumulative PD
-            cumulative_pd[month] = adjusted_pd
+        return self._build_pd_curve(cumulative[current_idx], method)
+    
+    def estimate_generator(self, history: pd.DataFrame) -> CachedGenerator:
+        """
+        Duration-based monthly generator estimate from rating history.
+        
+        Q_ij = N_ij / T_i, where N_ij counts observed changes from rating i to
+        j between consecutive observations of a customer and T_i is the time
+        (in 30-day months) spent in rating i.
+        
+        Args:
+            history: Rating history (customer_id, rating, rating_date)
             
-            # Update cumulative survival probability
-            cumulative_survival *= (Decimal("1.0") - marginal_pd[month])
+        Returns:
+            CachedGenerator
+        """
+        n_classes = len(self.RATING_CLASSES)
+        rating_index = {rating: idx for idx, rating in enumerate(self.RATING_CLASSES)}
+        frame = pd.DataFrame(
+            {
+                "customer_id": history["customer_id"].to_numpy(),
+                "rating_idx": history["rating"]
+                .map(lambda rating: rating_index.get(getattr(rating, "value", rating), -1))
+                .to_numpy(),
+                "rating_date": pd.to_datetime(history["rating_date"]).to_numpy(),
+            }
+        )
+        frame = frame[frame["rating_idx"] >= 0].sort_values(
+            ["customer_id", "rating_date"], kind="stable"
+        )
+
+        next_idx = frame.groupby("customer_id")["rating_idx"].shift(-1)
+        next_date = frame.groupby("customer_id")["rating_date"].shift(-1)
+        observed = next_idx.notna().to_numpy()
         
-        logger.info(f"PD curve projected for {remaining_months} months")
+        from_idx = frame["rating_idx"].to_numpy()[observed]
+        to_idx = next_idx.to_numpy()[observed].astype(int)
+        months = ((next_date - frame["rating_date"]).dt.days.to_numpy()[observed]) / 30.0
+        
+        exposure = np.zeros(n_classes)
+        np.add.at(exposure, from_idx, months)
+        jumps = np.zeros((n_classes, n_classes))
+        moved = from_idx != to_idx
+        np.add.at(jumps, (from_idx[moved], to_idx[moved]), 1.0)
+
+        generator = np.divide(
+            jumps, exposure[:, None], out=np.zeros_like(jumps), where=exposure[:, None] > 0
+        )
+        return CachedGenerator(regularize_generator(generator))
+    
+    def _check_method(self, method: str):
+        if method not in self.PD_METHODS:
+            raise ValueError(f"Invalid PD method: {method}. Must be one of {self.PD_METHODS}")
+    
+    def _build_pd_curve(self, cumulative: np.ndarray, method: str = "discrete") -> PDCurve:
+        """Build a PDCurve from cumulative PDs for months 1..n"""
+        pd_by_period = {}
+        cumulative_pd = {}
+        marginal_pd = {}
+        previous = Decimal("0")
+        for month, value in enumerate(cumulative.tolist(), start=1):
+            pd_by_period[month] = Decimal(str(value))
+            cumulative_pd[month] = pd_by_period[month]
+            # Marginal PD (PD for this specific period)
+            marginal_pd[month] = pd_by_period[month] - previous
+            previous = pd_by_period[month]
         
         return PDCurve(
             pd_by_period=pd_by_period,
             cumulative_pd=cumulative_pd,
             marginal_pd=marginal_pd,
-            calculation_method="transition_matrix"
+            calculation_method="generator_matrix" if method == "generator" else "transition_matrix",
         )
     
     def _rating_to_index(self, rating: CreditRating) -> Optional[int]:
@@ -374,27 +1043,37 @@ class TransitionMatrixService:
         
         return months_remaining
     
-    def _calculate_psi(self, transition_matrix: np.ndarray) -> Decimal:
+    def _calculate_psi(
+        self,
+        transition_matrix: np.ndarray,
+        previous_matrix: Optional[np.ndarray] = None,
+        row_weights: Optional[np.ndarray] = None,
+    ) -> Decimal:
         """
         Calculate Population Stability Index (PSI) for model validation.
         
-        PSI measures stability of transition probabilities over time.
+        PSI measures stability of transition probabilities against the
+        previous calibration (see population_stability_index).
         PSI < 0.1: No significant change
         0.1 <= PSI < 0.25: Some change
         PSI >= 0.25: Significant change (recalibration needed)
         
         Args:
             transition_matrix: Transition probability matrix
+            previous_matrix: Previous calibration (None for a first calibration)
+            row_weights: Observations per starting rating (default: equal weights)
             
         Returns:
-            PSI value
+            PSI value (0 for a first calibration)
         """
-        # For simplicity, calculate PSI as variance of diagonal elements
-        # (stability of non-transition probabilities)
-        diagonal = np.diag(transition_matrix)
-        psi = Decimal(str(np.var(diagonal)))
+        if previous_matrix is None:
+            return Decimal("0")
+        
+        if row_weights is None:
+            row_weights = np.ones(transition_matrix.shape[0])
+        psi = population_stability_index(transition_matrix, previous_matrix, row_weights)
         
-        return psi
+        return Decimal(str(round(float(psi), 6)))
 
 
 # Global service instance
@@ -0,0 +1,339 @@
+"""ECL worker: consumer pool for the ecl_calculations queue
+
+Run with ``python -m src.services.worker``. Each container consumes the queue
+with a prefetch window, collects deliveries into batches and processes them on
+a pool of worker processes. Scale throughput horizontally by adding containers.
+
+Configuration (environment):
+    WORKER_PROCESSES      worker processes per container (default: CPU count,
+                          0 processes messages inline in the consumer)
+    WORKER_BATCH_SIZE     deliveries collected per batch (default: 2 × processes)
+    WORKER_BATCH_TIMEOUT  seconds to wait for a batch to fill (default: 1.0)
+    WORKER_PREFETCH       unacknowledged deliveries per consumer (default: batch size)
+    WORKER_MAX_RETRIES    retries before a message goes to the DLX queue (default: 3)
+"""
+
+from typing import Dict, Any, List, Optional, Callable
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+import json
+import multiprocessing
+import os
+import signal
+import pika
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.session import DATABASE_URL
+from src.services.ecl_engine import ECLCalculationService
+from src.services.ecl_incremental import IncrementalECLCalculator
+from src.services.ecl_results_writer import ECLResultsWriter
+from src.services.portfolio_runner import load_instruments, process_shard, SHARD_MESSAGE_TYPE
+from src.utils.queue import RABBITMQ_URL
+from src.utils.logging_config import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+ECL_QUEUE = "ecl_calculations"
+DEAD_LETTER_QUEUE = "ecl_calculations_dlx"
+ECL_BATCH_MESSAGE_TYPE = "ecl_batch"
+
+# Message headers used for retry bookkeeping
+RETRY_COUNT_HEADER = "x-retry-count"
+ERROR_HEADER = "x-last-error"
+ORIGINAL_QUEUE_HEADER = "x-original-queue"
+
+# Seconds between broker heartbeats while a batch is being processed
+KEEPALIVE_INTERVAL = 5.0
+
+# Per-process session factory (set by _init_worker_process)
+_session_factory: Optional[sessionmaker] = None
+
+
+class Delivery:
+    """A message received from the queue"""
+
+    def __init__(self, delivery_tag: int, properties: Any, body: bytes):
+        self.delivery_tag = delivery_tag
+        self.properties = properties
+        self.body = body
+
+    @property
+    def retry_count(self) -> int:
+        headers = getattr(self.properties, "headers", None) or {}
+        return int(headers.get(RETRY_COUNT_HEADER, 0))
+
+
+def _init_worker_process(database_url: str):
+    """Open one engine per worker process (connections are not shared across processes)"""
+    global _session_factory
+    engine = create_engine(database_url, pool_pre_ping=True, pool_size=1, max_overflow=0)
+    _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def handle_portfolio_run_shard(db: Session, message: Dict[str, Any]) -> Dict[str, Any]:
+    """Process one shard of a portfolio run (see portfolio_runner)"""
+    shard = process_shard(db, message["shard_id"])
+    return {"shard_id": shard.shard_id, "status": shard.status}
+
+
+def handle_ecl_batch(db: Session, message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calculate and store ECL for a batch of instruments.
+
+    Message: {"type": "ecl_batch", "instrument_ids": [...], "reporting_date": "YYYY-MM-DD",
+              "incremental": true, "scenarios": [...], "user_id": "..."}
+    """
+    reporting_date = date.fromisoformat(message["reporting_date"])
+    instruments = load_instruments(db, message["instrument_ids"])
+    service = ECLCalculationService()
+    results = IncrementalECLCalculator(db, service, message.get("scenarios")).calculate(
+        instruments, reporting_date, carry_forward=message.get("incremental", True)
+    )
+
+    ECLResultsWriter(db).write_results(
+        service, instruments, results, reporting_date, user_id=message.get("user_id", "system")
+    )
+    db.commit()
+    return {"instruments_calculated": len(results)}
+
+
+MESSAGE_HANDLERS: Dict[str, Callable[[Session, Dict[str, Any]], Dict[str, Any]]] = {
+    SHARD_MESSAGE_TYPE: handle_portfolio_run_shard,
+    ECL_BATCH_MESSAGE_TYPE: handle_ecl_batch,
+}
+
+
+def process_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dispatch a message to its handler (runs in a worker process).
+
+    Args:
+        message: Decoded message payload
+
+    Returns:
+        Handler result
+    """
+    handler = MESSAGE_HANDLERS.get(message.get("type"))
+    if handler is None:
+        raise ValueError(f"Unknown message type: {message.get('type')}")
+
+    db = _session_factory()
+    try:
+        return handler(db, message)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ECLWorker:
+    """
+    Batched consumer for the ecl_calculations queue.
+
+    Deliveries are collected into batches (up to batch_size, or whatever
+    arrived within batch_timeout) and processed in parallel on a process pool.
+    Every delivery is acknowledged once it has either succeeded, been
+    republished for a retry (with an incremented x-retry-count header) or,
+    after max_retries, been routed to the ecl_calculations_dlx queue.
+    """
+
+    def __init__(
+        self,
+        database_url: str = DATABASE_URL,
+        processes: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_timeout: float = 1.0,
+        prefetch: Optional[int] = None,
+        max_retries: int = 3,
+        queue: str = ECL_QUEUE,
+        dead_letter_queue: str = DEAD_LETTER_QUEUE,
+    ):
+        self.database_url = database_url
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.batch_size = batch_size or max(2 * self.processes, 1)
+        self.batch_timeout = batch_timeout
+        self.prefetch = max(prefetch or self.batch_size, self.batch_size)
+        self.max_retries = max_retries
+        self.queue = queue
+        self.dead_letter_queue = dead_letter_queue
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._stopping = False
+
+    def start(self):
+        """Start the process pool (or the inline session factory)"""
+        if self.processes > 0:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker_process,
+                initargs=(self.database_url,),
+            )
+        else:
+            _init_worker_process(self.database_url)
+        logger.info(
+            f"ECL worker started: processes={self.processes}, batch_size={self.batch_size}, "
+            f"prefetch={self.prefetch}, max_retries={self.max_retries}"
+        )
+
+    def stop(self):
+        """Finish the current batch and stop consuming"""
+        self._stopping = True
+
+    def shutdown(self):
+        """Shut down the process pool"""
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def consume(self, channel):
+        """
+        Consume the queue until stop() is called.
+
+        Args:
+            channel: pika BlockingChannel
+        """
+        channel.queue_declare(queue=self.queue, durable=True)
+        channel.queue_declare(queue=self.dead_letter_queue, durable=True)
+        channel.basic_qos(prefetch_count=self.prefetch)
+
+        batch: List[Delivery] = []
+        for method, properties, body in channel.consume(
+            self.queue, inactivity_timeout=self.batch_timeout
+        ):
+            if method is not None:
+                batch.append(Delivery(method.delivery_tag, properties, body))
+
+            if batch and (method is None or len(batch) >= self.batch_size or self._stopping):
+                self.handle_batch(channel, batch)
+                batch = []
+
+            if self._stopping and not batch:
+                break
+
+        channel.cancel()
+
+    def handle_batch(self, channel, deliveries: List[Delivery]):
+        """
+        Process a batch of deliveries and acknowledge each one.
+
+        Args:
+            channel: pika BlockingChannel
+            deliveries: Deliveries in the batch
+        """
+        pending: Dict[Future, Delivery] = {}
+
+        for delivery in deliveries:
+            try:
+                message = json.loads(delivery.body)
+            except (ValueError, TypeError) as e:
+                # Malformed payloads cannot succeed on retry
+                self._dead_letter(channel, delivery, f"Invalid message: {e}")
+                channel.basic_ack(delivery_tag=delivery.delivery_tag)
+                continue
+
+            if self.executor:
+                pending[self.executor.submit(process_message, message)] = delivery
+            else:
+                self._complete(channel, delivery, *self._run_inline(message))
+
+        while pending:
+            done, _ = wait(pending, timeout=KEEPALIVE_INTERVAL)
+            for future in done:
+                delivery = pending.pop(future)
+                error = future.exception()
+                self._complete(channel, delivery, error is None, error)
+            if pending:
+                self._keepalive(channel)
+
+        logger.info(f"Processed batch of {len(deliveries)} messages")
+
+    def _run_inline(self, message: Dict[str, Any]):
+        try:
+            process_message(message)
+            return True, None
+        except Exception as e:
+            return False, e
+
+    def _complete(
+        self, channel, delivery: Delivery, succeeded: bool, error: Optional[BaseException]
+    ):
+        if not succeeded:
+            self._retry_or_dead_letter(channel, delivery, error)
+        channel.basic_ack(delivery_tag=delivery.delivery_tag)
+
+    def _retry_or_dead_letter(self, channel, delivery: Delivery, error: Optional[BaseException]):
+        """Republish a failed message with an incremented retry count, or dead-letter it"""
+        if delivery.retry_count >= self.max_retries:
+            logger.error(
+                f"Message failed after {delivery.retry_count} retries, dead-lettering: {error}"
+            )
+            self._dead_letter(channel, delivery, str(error))
+            return
+
+        logger.warning(
+            f"Message failed (retry {delivery.retry_count + 1}/{self.max_retries}): {error}"
+        )
+        self._publish(channel, self.queue, delivery, delivery.retry_count + 1, str(error))
+
+    def _dead_letter(self, channel, delivery: Delivery, error: str):
+        self._publish(channel, self.dead_letter_queue, delivery, delivery.retry_count, error)
+
+    def _publish(self, channel, queue: str, delivery: Delivery, retry_count: int, error: str):
+        headers = dict(getattr(delivery.properties, "headers", None) or {})
+        headers.update(
+            {
+                RETRY_COUNT_HEADER: retry_count,
+                ERROR_HEADER: error[:1000],
+                ORIGINAL_QUEUE_HEADER: self.queue,
+            }
+        )
+        channel.basic_publish(
+            exchange="",
+            routing_key=queue,
+            body=delivery.body,
+            properties=pika.BasicProperties(
+                delivery_mode=2, headers=headers  # Make message persistent
+            ),
+        )
+
+    @staticmethod
+    def _keepalive(channel):
+        """Service broker heartbeats while waiting on long-running batches"""
+        connection = getattr(channel, "connection", None)
+        if connection is not None:
+            connection.process_data_events(time_limit=0)
+
+
+def main():
+    """Run the worker until SIGTERM/SIGINT"""
+    setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+
+    processes = os.getenv("WORKER_PROCESSES")
+    batch_size = os.getenv("WORKER_BATCH_SIZE")
+    prefetch = os.getenv("WORKER_PREFETCH")
+    worker = ECLWorker(
+        processes=int(processes) if processes else None,
+        batch_size=int(batch_size) if batch_size else None,
+        batch_timeout=float(os.getenv("WORKER_BATCH_TIMEOUT", "1.0")),
+        prefetch=int(prefetch) if prefetch else None,
+        max_retries=int(os.getenv("WORKER_MAX_RETRIES", "3")),
+    )
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+
+    worker.start()
+    connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+    try:
+        worker.consume(connection.channel())
+    finally:
+        worker.shutdown()
+        if not connection.is_closed:
+            connection.close()
+        logger.info("ECL worker stopped")
+
+
+if __name__ == "__main__":
+    main()
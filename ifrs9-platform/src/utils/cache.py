@@ -1,36 +1,294 @@
-"""Redis cache utilities"""
-import redis
+"""Redis cache utilities
+
+The Redis client is created on first use from a connection pool
+(REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT). Set CACHE_BACKEND=memory, or
+call set_redis_client(InMemoryRedis()), to run without a Redis server.
+"""
+
 import json
+import math
 import os
-from typing import Any, Optional
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from datetime import timedelta
 
-# Redis connection
+from src.utils.logging_config import get_logger
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+logger = get_logger(__name__)
+
+# Redis connection (values are bytes; serializers decode them)
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")
+
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Shared Redis client (created on first use)"""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_client_lock:
+            if _redis_client is None:
+                if CACHE_BACKEND == "memory":
+                    _redis_client = InMemoryRedis()
+                else:
+                    import redis
+
+                    pool = redis.ConnectionPool.from_url(
+                        REDIS_URL,
+                        max_connections=REDIS_MAX_CONNECTIONS,
+                        socket_timeout=REDIS_SOCKET_TIMEOUT,
+                        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                    )
+                    _redis_client = redis.Redis(connection_pool=pool)
+    return _redis_client
+
+
+def set_redis_client(client) -> Any:
+    """
+    Replace the shared Redis client (e.g. with InMemoryRedis).
+    
+    Args:
+        client: Client, or None to create a new one on next use
+        
+    Returns:
+        The previous client
+    """
+    global _redis_client
+    with _redis_client_lock:
+        previous, _redis_client = _redis_client, client
+    return previous
+
+
+def redis_health() -> Dict[str, Any]:
+    """Readiness probe: PING the Redis server"""
+    started = time.perf_counter()
+    try:
+        get_redis_client().ping()
+        return {"status": "up", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"status": "down", "error": str(e)}
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class InMemoryRedis:
+    """
+    In-process stand-in for the Redis commands used by this module.
+    
+    For tests and batch jobs without a Redis server. Values are stored as
+    bytes with optional expiry; eval only supports the lease release script.
+    """
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.RLock()
+    
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= self.clock():
+            del self._data[key]
+            return None
+        return entry[0]
+    
+    def ping(self) -> bool:
+        return True
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+    
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [self._live(key) for key in keys]
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ex: Optional[float] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+    ) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            self._data[key] = (_encode(value), self.clock() + ttl if ttl is not None else None)
+            return True
+    
+    def setex(self, key: str, expire: float, value: Any) -> bool:
+        return self.set(key, value, ex=expire)
+    
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+    
+    unlink = delete
+    
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            expires_at = self._data.get(key, (None, None))[1]
+            self._data[key] = (_encode(value), expires_at)
+            return value
+    
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        with self._lock:
+            keys = [key for key in list(self._data) if self._live(key) is not None]
+        return iter([key for key in keys if match is None or fnmatchcase(key, match)])
+    
+    def eval(self, script: str, numkeys: int, key: str, token: str) -> int:
+        if script != RELEASE_LEASE_SCRIPT:
+            raise NotImplementedError("InMemoryRedis only evaluates the lease release script")
+        with self._lock:
+            if self._live(key) == _encode(token):
+                del self._data[key]
+                return 1
+            return 0
+    
+    def pipeline(self, transaction: bool = True) -> "_InMemoryPipeline":
+        return _InMemoryPipeline(self)
+
+
+class _InMemoryPipeline:
+    """Buffers commands and runs them on execute()"""
+    
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+    
+    def __getattr__(self, name: str):
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return command
+    
+    def execute(self) -> List[Any]:
+        with self._client._lock:
+            results = [
+                getattr(self._client, name)(*args, **kwargs)
+                for name, args, kwargs in self._commands
+            ]
+        self._commands = []
+        return results
+
+
+# Keys per pipeline / SCAN batch
+CACHE_BATCH_SIZE = int(os.getenv("CACHE_BATCH_SIZE", "1000"))
+
 
+class JSONSerializer:
+    """JSON payloads (default; readable and language neutral)"""
 
-def get_cache(key: str) -> Optional[Any]:
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=str).encode()
+
+    def loads(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+
+class PickleSerializer:
+    """
+    Pickle protocol 5 payloads (compact for NumPy arrays and Decimals).
+
+    Only use for keys written by this application: unpickling runs code.
+    """
+
+    name = "pickle"
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=5)
+
+    def loads(self, payload: bytes) -> Any:
+        return pickle.loads(payload)
+
+
+class MsgpackSerializer:
+    """msgpack payloads (compact for lists of numbers; needs the msgpack package)"""
+
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Any:
+        return msgpack.unpackb(payload, raw=False)
+
+
+def _msgpack_default(value: Any) -> Any:
+    # NumPy arrays and scalars become lists and numbers; anything else its string
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def compact_serializer():
+    """Serializer for numeric payloads: msgpack if installed and enabled, else pickle"""
+    if os.getenv("CACHE_SERIALIZER", "msgpack") == "msgpack" and msgpack is not None:
+        return MsgpackSerializer()
+    return PickleSerializer()
+
+
+DEFAULT_SERIALIZER = JSONSerializer()
+
+
+def _batches(items: Iterable, size: int) -> Iterable[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_cache(key: str, serializer=None) -> Optional[Any]:
     """
     Get value from cache.
     
     Args:
         key: Cache key
+        serializer: Payload serializer (default: JSON)
         
     Returns:
         Cached value or None if not found
     """
     try:
-        value = redis_client.get(key)
+        value = get_redis_client().get(key)
         if value:
-            return json.loads(value)
+            return (serializer or DEFAULT_SERIALIZER).loads(value)
         return None
     except Exception as e:
-        print(f"Cache get error: {e}")
+        logger.warning(f"Cache get error: {e}")
         return None
 
 
-def set_cache(key: str, value: Any, expire: Optional[int] = None) -> bool:
+def set_cache(key: str, value: Any, expire: Optional[int] = None, serializer=None) -> bool:
     """
     Set value in cache.
     
@@ -38,19 +296,80 @@ def set_cache(key: str, value: Any, expire: Optional[int] = None) -> bool:
         key: Cache key
         value: Value to cache
         expire: Expiration time in seconds (optional)
+        serializer: Payload serializer (default: JSON)
         
     Returns:
         True if successful, False otherwise
     """
     try:
-        serialized = json.dumps(value, default=str)
+        serialized = (serializer or DEFAULT_SERIALIZER).dumps(value)
         if expire:
-            redis_client.setex(key, expire, serialized)
+            get_redis_client().setex(key, expire, serialized)
         else:
-            redis_client.set(key, serialized)
+            get_redis_client().set(key, serialized)
         return True
     except Exception as e:
-        print(f"Cache set error: {e}")
+        logger.warning(f"Cache set error: {e}")
+        return False
+
+
+def mget_cache(
+    keys: List[str], serializer=None, batch_size: int = CACHE_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Get many values, one MGET round trip per batch of keys.
+    
+    Args:
+        keys: Cache keys
+        serializer: Payload serializer (default: JSON)
+        batch_size: Keys per MGET
+        
+    Returns:
+        Cached values by key (missing keys are left out)
+    """
+    serializer = serializer or DEFAULT_SERIALIZER
+    found: Dict[str, Any] = {}
+    try:
+        for batch in _batches(keys, batch_size):
+            for key, value in zip(batch, get_redis_client().mget(batch)):
+                if value:
+                    found[key] = serializer.loads(value)
+    except Exception as e:
+        logger.warning(f"Cache mget error: {e}")
+    return found
+
+
+def mset_cache(
+    values: Dict[str, Any],
+    expire: Optional[int] = None,
+    serializer=None,
+    batch_size: int = CACHE_BATCH_SIZE,
+) -> bool:
+    """
+    Set many values, one pipelined round trip per batch of keys.
+    
+    Args:
+        values: Values by cache key
+        expire: Expiration time in seconds (optional)
+        serializer: Payload serializer (default: JSON)
+        batch_size: Keys per pipeline
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    serializer = serializer or DEFAULT_SERIALIZER
+    try:
+        for batch in _batches(values.items(), batch_size):
+            pipe = get_redis_client().pipeline(transaction=False)
+            for key, value in batch:
+                if expire:
+                    pipe.setex(key, expire, serializer.dumps(value))
+                else:
+                    pipe.set(key, serializer.dumps(value))
+            pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Cache mset error: {e}")
         return False
 
 
@@ -65,28 +384,373 @@ def delete_cache(key: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        redis_client.delete(key)
+        get_redis_client().delete(key)
         return True
     except Exception as e:
-        print(f"Cache delete error: {e}")
+        logger.warning(f"Cache delete error: {e}")
         return False
 
 
-def clear_cache_pattern(pattern: str) -> int:
+def clear_cache_pattern(pattern: str, batch_size: int = CACHE_BATCH_SIZE) -> int:
     """
     Delete all keys matching pattern.
     
+    Keys are found with SCAN (never KEYS, which blocks Redis on a large
+    keyspace) and removed with UNLINK in batches of batch_size, so Redis
+    keeps serving other clients between batches.
+    
     Args:
         pattern: Key pattern (e.g., "parameter:*")
+        batch_size: Keys per SCAN call and per UNLINK
         
     Returns:
         Number of keys deleted
     """
+    deleted = 0
+    try:
+        for batch in _batches(
+            get_redis_client().scan_iter(match=pattern, count=batch_size), batch_size
+        ):
+            deleted += get_redis_client().unlink(*batch)
+        return deleted
+    except Exception as e:
+        logger.warning(f"Cache clear error: {e}")
+        return deleted
+
+
+# Compare-and-delete, so a lease is only released by its holder
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    """An in-progress computation that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key: str, compute: Callable[[], Any], stale: Optional[Tuple] = None) -> Any:
+    """
+    Run compute once per key within this process.
+
+    Concurrent callers for the same key wait for the first caller's result,
+    or return the stale value immediately when there is one.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if stale is not None:
+            return stale[0]
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = compute()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _read_entry(key: str, serializer) -> Optional[Tuple]:
+    """(value, compute seconds, expiry timestamp) stored by get_or_compute, or None"""
+    try:
+        payload = get_redis_client().get(key)
+        if payload:
+            return tuple(serializer.loads(payload))
+    except Exception as e:
+        logger.warning(f"Cache get error: {e}")
+    return None
+
+
+def _write_entry(key: str, value: Any, delta: float, expire: int, serializer):
+    try:
+        get_redis_client().set(
+            key, serializer.dumps([value, delta, time.time() + expire]), ex=expire
+        )
+    except Exception as e:
+        logger.warning(f"Cache set error: {e}")
+
+
+def _should_refresh(entry: Tuple, beta: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch).
+
+    Refresh with a probability that rises as expiry approaches, scaled by
+    how long the value took to compute, so one caller recomputes before the
+    key expires instead of every caller after it.
+    """
+    _, delta, expires_at = entry
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _acquire_lease(lease_key: str, token: str, lease_ttl: float) -> Optional[bool]:
+    """SET NX lease; None if Redis is unavailable"""
+    try:
+        return bool(get_redis_client().set(lease_key, token, nx=True, px=int(lease_ttl * 1000)))
+    except Exception as e:
+        logger.warning(f"Cache lease error: {e}")
+        return None
+
+
+def _release_lease(lease_key: str, token: str):
+    try:
+        get_redis_client().eval(RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+    except Exception as e:
+        logger.warning(f"Cache lease error: {e}")
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], Any],
+    expire: int,
+    serializer=None,
+    beta: float = 1.0,
+    lease_ttl: float = 30.0,
+    wait_timeout: float = 10.0,
+    poll_interval: float = 0.05,
+) -> Any:
+    """
+    Cached value, computed at most once at a time across threads and processes.
+
+    On a miss, one thread per process competes for a Redis SET NX lease
+    (others in the process wait for it). The lease holder computes and
+    stores the value; other processes poll for it until wait_timeout and
+    then compute it themselves. Values are refreshed early with XFetch
+    (see _should_refresh); during a refresh other callers keep getting the
+    stale value. Without Redis, misses are still coalesced within the process.
+
+    Values are stored as [value, compute seconds, expiry timestamp]; read
+    them with get_or_compute or mget_computed.
+
+    Args:
+        key: Cache key
+        compute: Produces the value on a miss
+        expire: Expiration time in seconds
+        serializer: Payload serializer (default: JSON)
+        beta: Early refresh aggressiveness (0 disables early refresh)
+        lease_ttl: Seconds before an abandoned lease expires
+        wait_timeout: Seconds to wait for another process's computation
+        poll_interval: Seconds between polls while waiting
+
+    Returns:
+        Value
+    """
+    serializer = serializer or DEFAULT_SERIALIZER
+    entry = _read_entry(key, serializer)
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry[0]
+
+    def compute_shared():
+        lease_key = f"{key}:lease"
+        token = uuid.uuid4().hex
+        leased = _acquire_lease(lease_key, token, lease_ttl)
+
+        if leased is False:
+            if entry is not None:
+                return entry[0]  # another process is refreshing
+            deadline = time.monotonic() + wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                filled = _read_entry(key, serializer)
+                if filled is not None:
+                    return filled[0]
+            logger.warning(f"Timed out waiting for {key} to be computed, computing locally")
+        elif leased and entry is None:
+            # Filled between the first read and the lease
+            filled = _read_entry(key, serializer)
+            if filled is not None:
+                _release_lease(lease_key, token)
+                return filled[0]
+
+        try:
+            started = time.perf_counter()
+            value = compute()
+            _write_entry(key, value, time.perf_counter() - started, expire, serializer)
+            return value
+        finally:
+            if leased:
+                _release_lease(lease_key, token)
+
+    return _single_flight(key, compute_shared, stale=entry)
+
+
+def mget_computed(
+    keys: List[str], serializer=None, batch_size: int = CACHE_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Get many values stored by get_or_compute (one MGET per batch).
+
+    Args:
+        keys: Cache keys
+        serializer: Payload serializer (default: JSON)
+        batch_size: Keys per MGET
+
+    Returns:
+        Values by key (missing keys are left out)
+    """
+    return {key: entry[0] for key, entry in mget_cache(keys, serializer, batch_size).items()}
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL (L1 in front of Redis).
+    
+    Thread-safe; values are stored as-is (no serialization).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_version(key: str) -> Optional[int]:
+    """
+    Read a version counter.
+    
+    Args:
+        key: Counter key
+        
+    Returns:
+        Version (0 if never bumped), or None if Redis is unavailable
+    """
+    try:
+        return int(get_redis_client().get(key) or 0)
+    except Exception as e:
+        logger.warning(f"Cache version error: {e}")
+        return None
+
+
+def bump_version(key: str) -> Optional[int]:
+    """
+    Increment a version counter (invalidates versioned caches in all processes).
+    
+    Args:
+        key: Counter key
+        
+    Returns:
+        New version, or None if Redis is unavailable
+    """
     try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            return redis_client.delete(*keys)
-        return 0
+        return int(get_redis_client().incr(key))
     except Exception as e:
-        print(f"Cache clear error: {e}")
-        return 0
+        logger.warning(f"Cache version error: {e}")
+        return None
+
+
+class VersionedLocalCache(LocalCache):
+    """
+    LocalCache invalidated by a version counter in Redis.
+    
+    The counter is read at most once per version_check_interval seconds, so
+    hot lookups are served from memory; when it changes (bump_version from
+    any process) the local entries are dropped. Keys for the shared Redis
+    layer should include the version (see versioned_key) so that stale L2
+    entries are not read back after a bump.
+    """
+
+    def __init__(
+        self,
+        version_key: str,
+        maxsize: int = 100_000,
+        ttl: float = 300.0,
+        version_check_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.version_key = version_key
+        self.version_check_interval = version_check_interval
+        self.version = 0
+        self._version_checked_at: Optional[float] = None
+    
+    def get(self, key: str) -> Optional[Any]:
+        self.check_version()
+        return super().get(key)
+    
+    def check_version(self, force: bool = False):
+        """Drop local entries if the shared version changed"""
+        now = self.clock()
+        if (
+            not force
+            and self._version_checked_at is not None
+            and now - self._version_checked_at < self.version_check_interval
+        ):
+            return
+        self._version_checked_at = now
+        
+        version = get_version(self.version_key)
+        if version is not None and version != self.version:
+            self.clear()
+            self.version = version
+    
+    def bump(self) -> int:
+        """Bump the shared version and drop local entries"""
+        version = bump_version(self.version_key)
+        self.clear()
+        # Without Redis, invalidate this process only
+        self.version = version if version is not None else self.version + 1
+        self._version_checked_at = self.clock()
+        return self.version
+    
+    def versioned_key(self, key: str) -> str:
+        """Redis key for the current version"""
+        return f"{key}:v{self.version}"
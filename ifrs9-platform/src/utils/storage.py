@@ -1,40 +1,84 @@
-"""MinIO object storage utilities"""
-from minio import Minio
-from minio.error import S3Error
+"""MinIO object storage utilities
+
+Nothing connects at import time: the shared StorageManager (get_storage_manager,
+also available as ``storage_manager``) creates its client, with a pooled HTTP
+connection manager (MINIO_POOL_SIZE), on first use and checks the buckets
+once. Set STORAGE_BACKEND=memory, or call
+set_storage_manager(InMemoryStorageManager()), to run without MinIO.
+"""
+
 import os
-from typing import Optional
+import threading
+import time
+from typing import Any, Dict, Optional
 from io import BytesIO
 
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", "10"))
+MINIO_TIMEOUT = float(os.getenv("MINIO_TIMEOUT", "5.0"))
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio")
+
+# Buckets created on first use
+BUCKETS = ("reports", "audit-documents", "imports")
 
 
 class StorageManager:
     """MinIO storage manager"""
     
     def __init__(self):
-        self.client = Minio(
-            MINIO_ENDPOINT,
-            access_key=MINIO_ACCESS_KEY,
-            secret_key=MINIO_SECRET_KEY,
-            secure=MINIO_SECURE
-        )
-        self._ensure_buckets()
+        self._client = None
+        self._lock = threading.Lock()
     
-    def _ensure_buckets(self):
+    @property
+    def client(self):
+        """MinIO client (created, and buckets ensured, on first use)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from minio import Minio
+                    import urllib3
+
+                    http_client = urllib3.PoolManager(
+                        maxsize=MINIO_POOL_SIZE,
+                        timeout=urllib3.Timeout(connect=MINIO_TIMEOUT, read=MINIO_TIMEOUT * 6),
+                        retries=urllib3.Retry(total=2, backoff_factor=0.2),
+                    )
+                    client = Minio(
+                        MINIO_ENDPOINT,
+                        access_key=MINIO_ACCESS_KEY,
+                        secret_key=MINIO_SECRET_KEY,
+                        secure=MINIO_SECURE,
+                        http_client=http_client,
+                    )
+                    self._ensure_buckets(client)
+                    self._client = client
+        return self._client
+    
+    def _ensure_buckets(self, client):
         """Ensure required buckets exist"""
-        buckets = ["reports", "audit-documents", "imports"]
-        for bucket in buckets:
+        from minio.error import S3Error
+
+        for bucket in BUCKETS:
             try:
-                if not self.client.bucket_exists(bucket):
-                    self.client.make_bucket(bucket)
+                if not client.bucket_exists(bucket):
+                    client.make_bucket(bucket)
             except S3Error as e:
-                print(f"Bucket creation error for {bucket}: {e}")
-    
-    def upload_file(self, bucket: str, object_name: str, data: bytes, 
-                   content_type: str = "application/octet-stream") -> bool:
+                logger.warning(f"Bucket creation error for {bucket}: {e}")
+
+    def upload_file(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> bool:
         """
         Upload file to storage.
         
@@ -43,7 +87,7 @@ class StorageManager:
             object_name: Object name/path
             data: File data
             content_type: Content type
-            
+        
         Returns:
             True if successful, False otherwise
         """
@@ -56,8 +100,8 @@ class StorageManager:
                 content_type=content_type
             )
             return True
-        except S3Error as e:
-            print(f"Upload error: {e}")
+        except Exception as e:
+            logger.warning(f"Upload error: {e}")
             return False
     
     def download_file(self, bucket: str, object_name: str) -> Optional[bytes]:
@@ -67,7 +111,7 @@ class StorageManager:
         Args:
             bucket: Bucket name
             object_name: Object name/path
-            
+        
         Returns:
             File data or None if not found
         """
@@ -77,8 +121,8 @@ class StorageManager:
             response.close()
             response.release_conn()
             return data
-        except S3Error as e:
-            print(f"Download error: {e}")
+        except Exception as e:
+            logger.warning(f"Download error: {e}")
             return None
     
     def delete_file(self, bucket: str, object_name: str) -> bool:
@@ -88,15 +132,15 @@ class StorageManager:
         Args:
             bucket: Bucket name
             object_name: Object name/path
-            
+        
         Returns:
             True if successful, False otherwise
         """
         try:
             self.client.remove_object(bucket, object_name)
             return True
-        except S3Error as e:
-            print(f"Delete error: {e}")
+        except Exception as e:
+            logger.warning(f"Delete error: {e}")
             return False
     
     def list_files(self, bucket: str, prefix: str = "") -> list:
@@ -106,17 +150,96 @@ class StorageManager:
         Args:
             bucket: Bucket name
             prefix: Object prefix filter
-            
+        
         Returns:
             List of object names
         """
         try:
             objects = self.client.list_objects(bucket, prefix=prefix)
             return [obj.object_name for obj in objects]
-        except S3Error as e:
-            print(f"List error: {e}")
+        except Exception as e:
+            logger.warning(f"List error: {e}")
             return []
+    
+    def health(self) -> Dict[str, Any]:
+        """Readiness probe: check that the first bucket is reachable"""
+        started = time.perf_counter()
+        try:
+            self.client.bucket_exists(BUCKETS[0])
+            return {"status": "up", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            return {"status": "down", "error": str(e)}
+
+
+class InMemoryStorageManager:
+    """In-process stand-in for StorageManager (tests and batch jobs)"""
+    
+    def __init__(self):
+        self.objects: Dict[str, Dict[str, bytes]] = {bucket: {} for bucket in BUCKETS}
+        self._lock = threading.Lock()
+
+    def upload_file(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+    ) -> bool:
+        with self._lock:
+            self.objects.setdefault(bucket, {})[object_name] = bytes(data)
+        return True
+    
+    def download_file(self, bucket: str, object_name: str) -> Optional[bytes]:
+        with self._lock:
+            return self.objects.get(bucket, {}).get(object_name)
+    
+    def delete_file(self, bucket: str, object_name: str) -> bool:
+        with self._lock:
+            self.objects.get(bucket, {}).pop(object_name, None)
+        return True
+    
+    def list_files(self, bucket: str, prefix: str = "") -> list:
+        with self._lock:
+            return sorted(name for name in self.objects.get(bucket, {}) if name.startswith(prefix))
+    
+    def health(self) -> Dict[str, Any]:
+        return {"status": "up", "backend": "memory"}
+
+
+_storage_manager = None
+_storage_manager_lock = threading.Lock()
+
+
+def get_storage_manager():
+    """Shared storage manager (created on first use; does not connect)"""
+    global _storage_manager
+    if _storage_manager is None:
+        with _storage_manager_lock:
+            if _storage_manager is None:
+                _storage_manager = (
+                    InMemoryStorageManager() if STORAGE_BACKEND == "memory" else StorageManager()
+                )
+    return _storage_manager
+
+
+def set_storage_manager(manager) -> Any:
+    """
+    Replace the shared storage manager (e.g. with InMemoryStorageManager).
+    
+    Args:
+        manager: Storage manager, or None to create a new one on next use
+    
+    Returns:
+        The previous storage manager
+    """
+    global _storage_manager
+    with _storage_manager_lock:
+        previous, _storage_manager = _storage_manager, manager
+    return previous
 
 
-# Global storage manager instance
-storage_manager = StorageManager()
+def __getattr__(name: str):
+    # Global storage manager instance (``from src.utils.storage import storage_manager``)
+    if name == "storage_manager":
+        return get_storage_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,80 @@
+"""Shared fixtures: an in-memory SQLite database with the full schema, and a staging book"""
+
+from datetime import date
+from decimal import Decimal
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.models import Base, Customer, CustomerType, FinancialInstrument, InstrumentType, Stage
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite engine (one connection, usable from TestClient threads)"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_book():
+    """Factory for staging books (build_book)"""
+    return build_book
+
+
+def build_book(n=400, seed=7, reporting_date=REPORTING_DATE):
+    """Random unsaved book covering every staging rule (customers carry sector ratings)"""
+    rng = random.Random(seed)
+    customers = []
+    for c in range(20):
+        customer = Customer(
+            customer_id=f"CUST{c}", customer_name=f"Customer {c}", customer_type=CustomerType.RETAIL
+        )
+        customer.sector_risk_rating = rng.choice([None, "AA", "BBB", "BB", "CCC"])
+        customers.append(customer)
+
+    instruments = []
+    for i in range(n):
+        customer = rng.choice(customers)
+        instruments.append(
+            FinancialInstrument(
+                instrument_id=f"INST{i:04d}",
+                instrument_type=InstrumentType.TERM_LOAN,
+                customer_id=customer.customer_id,
+                customer=customer,
+                origination_date=reporting_date if i % 50 == 0 else date(2023, 1, 1),
+                maturity_date=date(2028, 1, 1),
+                principal_amount=Decimal("1000"),
+                interest_rate=Decimal("12"),
+                current_stage=rng.choice([Stage.STAGE_1, Stage.STAGE_2, Stage.STAGE_3, None]),
+                days_past_due=rng.choice([0, 15, 30, 31, 60, 90, 91, 180]),
+                initial_recognition_pd=rng.choice(
+                    [
+                        None,
+                        Decimal("0.010000"),
+                        Decimal("0.040000"),
+                        Decimal("0.040001"),
+                        Decimal("0.120000"),
+                    ]
+                ),
+                is_modified=rng.random() < 0.1,
+                modification_date=date(2025, 6, 30),
+            )
+        )
+    return instruments
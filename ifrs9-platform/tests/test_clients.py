@@ -0,0 +1,112 @@
+"""
+Unit tests for the lazily created Redis, queue and storage clients.
+
+Tests cover:
+- No connections at import time
+- In-memory stand-ins injected in place of the real clients
+- Readiness probes on /health/ready
+"""
+
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.utils import cache
+from src.utils.cache import (
+    InMemoryRedis,
+    get_or_compute,
+    clear_cache_pattern,
+    mget_cache,
+    mset_cache,
+)
+from src.utils.queue import InMemoryQueueManager, set_queue_manager, get_queue_manager
+from src.utils.storage import InMemoryStorageManager, set_storage_manager
+
+
+@pytest.fixture
+def stand_ins():
+    previous = (
+        cache.set_redis_client(InMemoryRedis()),
+        set_queue_manager(InMemoryQueueManager()),
+        set_storage_manager(InMemoryStorageManager()),
+    )
+    yield
+    cache.set_redis_client(previous[0])
+    set_queue_manager(previous[1])
+    set_storage_manager(previous[2])
+
+
+def test_importing_does_not_create_clients():
+    # Fresh interpreter: nothing may connect, or import the client libraries, at import time
+    code = (
+        "import sys\n"
+        "from src.utils import cache, queue, storage\n"
+        "assert cache._redis_client is None and queue._queue_manager is None\n"
+        "assert storage._storage_manager is None\n"
+        "assert not {'redis', 'pika', 'minio'} & set(sys.modules), sys.modules.keys()\n"
+        "assert isinstance(queue.queue_manager, queue.QueueManager)\n"
+        "assert queue.queue_manager._idle.empty()\n"
+        "assert storage.storage_manager._client is None\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parents[1],
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_in_memory_redis_supports_the_cache_helpers(stand_ins):
+    clock = [0.0]
+    client = InMemoryRedis(clock=lambda: clock[0])
+    cache.set_redis_client(client)
+
+    assert mset_cache({"a:1": 1, "a:2": 2, "b:1": 3}, expire=10)
+    assert mget_cache(["a:1", "a:2", "missing"]) == {"a:1": 1, "a:2": 2}
+    assert get_or_compute("c", lambda: [1.5], expire=60) == [1.5]
+    assert get_or_compute("c", lambda: pytest.fail("computed twice"), expire=60, beta=0.0) == [1.5]
+    assert clear_cache_pattern("a:*") == 2
+
+    clock[0] = 11.0
+    assert mget_cache(["b:1"]) == {}
+    assert cache.redis_health()["status"] == "up"
+
+
+def test_injected_queue_receives_portfolio_shards(stand_ins):
+    from src.services.portfolio_runner import PortfolioRunner, SHARD_QUEUE
+
+    published = PortfolioRunner(max_workers=1, dispatch="queue")._publish(
+        "run-1", ["run-1-0000", "run-1-0001"]
+    )
+
+    assert published == 2
+    assert [m["shard_id"] for m in get_queue_manager().messages(SHARD_QUEUE)] == [
+        "run-1-0000",
+        "run-1-0001",
+    ]
+
+
+def test_readiness_reports_each_dependency(stand_ins, monkeypatch):
+    from src.api import main
+
+    monkeypatch.setattr(main, "database_health", lambda: {"status": "up"})
+    client = TestClient(main.app)
+
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert set(response.json()["checks"]) == {"database", "redis", "rabbitmq", "storage"}
+
+    cache.set_redis_client(None)
+    monkeypatch.setattr(cache, "REDIS_URL", "redis://localhost:1")
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["checks"]["redis"]["status"] == "down"
+
+    monkeypatch.setattr(main, "database_health", lambda: {"status": "down", "error": "unavailable"})
+    assert client.get("/health/ready").status_code == 503
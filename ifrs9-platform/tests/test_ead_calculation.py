@@ -0,0 +1,152 @@
+"""
+Unit tests for batch EAD calculation.
+
+Tests cover:
+- Same EAD and CCF as calculate_ead for on- and off-balance sheet exposures
+- CCFConfig read once per batch
+- Instrument CCF overrides
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from src.db.models import CCFConfig, FacilityType, FinancialInstrument, InstrumentType
+from src.services.ead_calculation import EADCalculationService
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+@pytest.fixture(autouse=True)
+def ccf_config(db):
+    db.add_all(
+        [
+            CCFConfig(
+                config_id="CCF1",
+                facility_type="REVOLVING_CREDIT",
+                ccf_value=Decimal("0.6000"),
+                effective_date=date(2024, 1, 1),
+                is_active=True,
+            ),
+            CCFConfig(
+                config_id="CCF2",
+                facility_type="GUARANTEE",
+                ccf_value=Decimal("0.3500"),
+                effective_date=date(2024, 1, 1),
+                is_active=True,
+            ),
+            CCFConfig(
+                config_id="CCF3",
+                facility_type="GUARANTEE",
+                ccf_value=Decimal("0.9000"),
+                effective_date=date(2023, 1, 1),
+                is_active=False,
+            ),
+        ]
+    )
+    db.commit()
+
+
+def make_facilities(n=400, seed=7):
+    rng = np.random.default_rng(seed)
+    facility_types = list(FacilityType) + [None]
+    instruments = []
+    for i in range(n):
+        instruments.append(
+            FinancialInstrument(
+                instrument_id=f"INST{i:04d}",
+                instrument_type=InstrumentType.TERM_LOAN,
+                customer_id="CUST1",
+                outstanding_balance=(
+                    Decimal(str(round(float(rng.uniform(0, 100000)), 2))) if i % 17 else None
+                ),
+                undrawn_commitment_amount=(
+                    Decimal(str(round(float(rng.uniform(0, 50000)), 2))) if i % 13 else None
+                ),
+                is_off_balance_sheet=bool(i % 3),
+                facility_type=facility_types[i % len(facility_types)],
+                credit_conversion_factor=Decimal("0.4500") if i % 11 == 0 else None,
+            )
+        )
+    return instruments
+
+
+def test_batch_matches_per_instrument_calculation(engine, db):
+    service = EADCalculationService()
+    instruments = make_facilities()
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, context, executemany: statements.append(
+            statement
+        ),
+    )
+
+    batch = service.calculate_ead_batch(db, instruments, REPORTING_DATE)
+
+    assert len(statements) == 1
+    assert len(batch) == 400
+    for i, instrument in enumerate(instruments):
+        result = service.calculate_ead(db, instrument, REPORTING_DATE)
+        assert batch.instrument_ids[i] == instrument.instrument_id
+        assert batch.is_off_balance_sheet[i] == result.is_off_balance_sheet
+        assert batch.ccf[i] == pytest.approx(float(result.ccf))
+        assert batch.ead_amount[i] == pytest.approx(float(result.ead_amount), abs=1e-6)
+    assert batch.total_ead == pytest.approx(sum(batch.as_dict().values()))
+
+
+def test_config_and_overrides_set_the_ccf(db):
+    service = EADCalculationService()
+    instruments = [
+        FinancialInstrument(
+            instrument_id="RCF",
+            outstanding_balance=Decimal("100"),
+            undrawn_commitment_amount=Decimal("1000"),
+            is_off_balance_sheet=True,
+            facility_type=FacilityType.REVOLVING_CREDIT,
+        ),
+        FinancialInstrument(
+            instrument_id="GTE",
+            outstanding_balance=None,
+            undrawn_commitment_amount=Decimal("1000"),
+            is_off_balance_sheet=True,
+            facility_type=FacilityType.GUARANTEE,
+        ),
+        FinancialInstrument(
+            instrument_id="LC",
+            outstanding_balance=Decimal("0"),
+            undrawn_commitment_amount=Decimal("1000"),
+            is_off_balance_sheet=True,
+            facility_type=FacilityType.LETTER_OF_CREDIT,
+        ),
+        FinancialInstrument(
+            instrument_id="OVR",
+            outstanding_balance=Decimal("0"),
+            undrawn_commitment_amount=Decimal("1000"),
+            is_off_balance_sheet=True,
+            facility_type=FacilityType.REVOLVING_CREDIT,
+            credit_conversion_factor=Decimal("0.1000"),
+        ),
+        FinancialInstrument(
+            instrument_id="ON",
+            outstanding_balance=Decimal("500"),
+            undrawn_commitment_amount=Decimal("1000"),
+            is_off_balance_sheet=False,
+            facility_type=FacilityType.REVOLVING_CREDIT,
+        ),
+    ]
+
+    batch = service.calculate_ead_batch(db, instruments, REPORTING_DATE)
+
+    assert service.load_ccf_map(db) == {
+        "REVOLVING_CREDIT": Decimal("0.6000"),
+        "GUARANTEE": Decimal("0.3500"),
+    }
+    assert batch.ccf.tolist() == pytest.approx([0.6, 0.35, 0.2, 0.1, 1.0])
+    assert batch.as_dict() == pytest.approx(
+        {"RCF": 700.0, "GTE": 350.0, "LC": 200.0, "OVR": 100.0, "ON": 500.0}
+    )
@@ -0,0 +1,202 @@
+"""
+Unit tests for the ECL calculation engines.
+
+Tests cover:
+- Vectorized portfolio engine parity with the per-instrument path
+- Monthly term-structure ECL (Property 11) and discount factor tables
+- Batched scenario-weighted ECL (Property 12)
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from src.db.models import FinancialInstrument, Stage, InstrumentType
+from src.services.ecl_engine import ECLCalculationService
+from src.services.ecl_term_structure import DiscountFactorTable
+from src.services.macro_scenario_service import ScenarioResult
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+def make_instrument(instrument_id, principal, maturity_date, stage):
+    """Build a transient financial instrument (not persisted)"""
+    return FinancialInstrument(
+        instrument_id=instrument_id,
+        instrument_type=InstrumentType.TERM_LOAN,
+        customer_id="CUST001",
+        origination_date=date(2024, 1, 1),
+        maturity_date=maturity_date,
+        principal_amount=principal,
+        interest_rate=Decimal("12.0"),
+        current_stage=stage,
+    )
+
+
+@pytest.fixture
+def portfolio():
+    """Random portfolio spanning all stages and maturities"""
+    rng = random.Random(42)
+    stages = [Stage.STAGE_1, Stage.STAGE_2, Stage.STAGE_3]
+    instruments = []
+    for i in range(500):
+        principal = Decimal(rng.randint(1, 5_000_000_000)) / Decimal("100")
+        maturity = REPORTING_DATE + timedelta(days=rng.randint(-30, 30 * 365))
+        instruments.append(make_instrument(f"INST{i:04d}", principal, maturity, rng.choice(stages)))
+    return instruments
+
+
+# ============================================================================
+# VECTORIZED PORTFOLIO ENGINE TESTS
+# ============================================================================
+
+
+def test_vectorized_portfolio_matches_per_instrument_path(portfolio):
+    """Columnar engine must match calculate_ecl to the cent"""
+    service = ECLCalculationService()
+
+    vectorized = service.recalculate_portfolio(portfolio, REPORTING_DATE)
+    legacy = service.recalculate_portfolio(portfolio, REPORTING_DATE, vectorized=False)
+
+    assert vectorized.keys() == legacy.keys()
+    for instrument_id, expected in legacy.items():
+        result = vectorized[instrument_id]
+        assert result.ecl_amount == expected.ecl_amount, instrument_id
+        assert result.time_horizon == expected.time_horizon
+        assert result.pd == expected.pd
+        assert result.lgd == expected.lgd
+        assert result.ead == expected.ead
+
+
+def test_vectorized_portfolio_is_chunk_independent(portfolio):
+    """Chunking the portfolio must not change any amount"""
+    service = ECLCalculationService()
+    expected = service.recalculate_portfolio(portfolio, REPORTING_DATE)
+
+    service.term_structure_engine.chunk_size = 7
+    chunked = service.recalculate_portfolio(portfolio, REPORTING_DATE)
+
+    for instrument_id, result in expected.items():
+        assert chunked[instrument_id].ecl_amount == result.ecl_amount
+
+
+# ============================================================================
+# TERM-STRUCTURE ENGINE TESTS
+# ============================================================================
+
+
+def reference_monthly_ecl(pd, lgd, ead, rate, months, horizon, amortising):
+    """Straightforward monthly Σ(PD_t × LGD_t × EAD_t × DF_t) loop"""
+    hazard = 1 - (1 - pd) ** (1 / 12)
+    total = 0.0
+    for t in range(1, min(months, horizon) + 1):
+        marginal = (1 - hazard) ** (t - 1) * hazard
+        exposure = ead * (months - t + 1) / months if amortising else ead
+        total += marginal * lgd * exposure * (1 + rate) ** (-t / 12)
+    return total
+
+
+def test_12m_and_lifetime_ecl_are_monthly_sums():
+    """Property 11: ECL is the monthly sum of PD × LGD × EAD × DF"""
+    service = ECLCalculationService()
+    instrument = make_instrument("MONTHLY", Decimal("1000000.00"), date(2030, 6, 30), Stage.STAGE_2)
+
+    ecl_12m = service.calculate_12m_ecl(instrument, REPORTING_DATE)
+    ecl_lifetime = service.calculate_lifetime_ecl(instrument, REPORTING_DATE)
+
+    months = 54
+    expected_12m = reference_monthly_ecl(0.02, 0.45, 1_000_000, 0.12, months, 12, True)
+    expected_lifetime = reference_monthly_ecl(0.02, 0.45, 1_000_000, 0.12, months, months, True)
+    assert abs(float(ecl_12m) - expected_12m) < 0.01
+    assert abs(float(ecl_lifetime) - expected_lifetime) < 0.01
+    assert ecl_lifetime > ecl_12m
+
+
+def test_short_dated_12m_ecl_equals_lifetime_ecl():
+    """Instruments maturing within 12 months have equal 12-month and lifetime ECL"""
+    service = ECLCalculationService()
+    instrument = make_instrument(
+        "SHORT", Decimal("250000.00"), REPORTING_DATE + timedelta(days=200), Stage.STAGE_1
+    )
+
+    assert service.calculate_12m_ecl(instrument, REPORTING_DATE) == service.calculate_lifetime_ecl(
+        instrument, REPORTING_DATE
+    )
+
+
+def test_discount_factor_table_reuses_vectors_per_bucket():
+    """One discount vector is built per (EIR bucket, horizon)"""
+    table = DiscountFactorTable(bucket_width=0.0025)
+    rates = np.array([0.12, 0.1201, 0.125, 0.12])
+
+    matrix = table.matrix(rates, 24)
+
+    assert matrix.shape == (4, 24)
+    assert len(table) == 2
+    np.testing.assert_array_equal(matrix[0], matrix[1])
+    assert matrix[0, 11] == pytest.approx(1 / 1.12)
+
+
+# ============================================================================
+# SCENARIO-WEIGHTED ECL TESTS
+# ============================================================================
+
+MACRO_SCENARIOS = [
+    ScenarioResult("S-BASE", "Base", "BASELINE", Decimal("0.5"), Decimal("1.0"), Decimal("1.0")),
+    ScenarioResult("S-UP", "Upside", "OPTIMISTIC", Decimal("0.2"), Decimal("0.8"), Decimal("0.9")),
+    ScenarioResult(
+        "S-DOWN", "Downside", "DOWNTURN", Decimal("0.3"), Decimal("1.6"), Decimal("1.2")
+    ),
+]
+
+
+def test_scenario_ecl_applies_pd_and_lgd_multipliers():
+    """Property 12: weighted ECL = Σ weight × ECL under adjusted PD/LGD"""
+    service = ECLCalculationService()
+    instrument = make_instrument("SCEN", Decimal("1000000.00"), date(2030, 6, 30), Stage.STAGE_2)
+
+    result = service.calculate_ecl(instrument, Stage.STAGE_2, REPORTING_DATE, MACRO_SCENARIOS)
+
+    expected = {
+        "S-BASE": reference_monthly_ecl(0.02, 0.45, 1_000_000, 0.12, 54, 54, True),
+        "S-UP": reference_monthly_ecl(0.016, 0.405, 1_000_000, 0.12, 54, 54, True),
+        "S-DOWN": reference_monthly_ecl(0.032, 0.54, 1_000_000, 0.12, 54, 54, True),
+    }
+    for scenario_id, amount in expected.items():
+        assert abs(float(result.scenario_results[scenario_id]) - amount) < 0.01
+    weighted = 0.5 * expected["S-BASE"] + 0.2 * expected["S-UP"] + 0.3 * expected["S-DOWN"]
+    assert abs(float(result.ecl_amount) - weighted) < 0.01
+    assert result.scenario_results["S-BASE"] == service.calculate_lifetime_ecl(
+        instrument, REPORTING_DATE
+    )
+
+    record = service.build_calculation_record(instrument, result, REPORTING_DATE)
+    assert record.base_scenario_ecl == result.scenario_results["S-BASE"]
+    assert record.upside_scenario_ecl == result.scenario_results["S-UP"]
+    assert record.downside_scenario_ecl == result.scenario_results["S-DOWN"]
+
+
+def test_portfolio_scenario_ecl_matches_per_instrument_path(portfolio):
+    """Batched scenarios × instruments evaluation matches calculate_ecl"""
+    service = ECLCalculationService()
+    scenarios = [
+        {"scenario_id": "base", "weight": 0.6, "adjustment": 1.0},
+        {"scenario_id": "downside", "weight": 0.4, "adjustment": 1.25, "pd_adjustment": 1.5},
+    ]
+
+    batched = service.recalculate_portfolio(portfolio, REPORTING_DATE, scenarios=scenarios)
+
+    for instrument in portfolio[:50]:
+        expected = service.calculate_ecl(
+            instrument, instrument.current_stage, REPORTING_DATE, scenarios
+        )
+        result = batched[instrument.instrument_id]
+        assert result.ecl_amount == expected.ecl_amount
+        assert result.scenario_results == expected.scenario_results
+        assert result.scenario_ecl_by_type == {
+            "BASE": expected.scenario_results["base"],
+            "DOWNSIDE": expected.scenario_results["downside"],
+        }
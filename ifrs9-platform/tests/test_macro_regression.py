@@ -0,0 +1,163 @@
+"""
+Unit tests for the macro regression service.
+
+Tests cover:
+- Batched macro adjustment factors for segments, scenarios and horizons
+- Per-call adjustment as a wrapper around the batch
+- Multi-segment calibration from a long-format frame
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.db.models import MacroRegressionModel, MacroScenario, ParameterType
+from src.services.macro_regression import MacroRegressionService
+
+
+def scenario(scenario_id: str, gdp, inflation) -> MacroScenario:
+    return MacroScenario(
+        scenario_id=scenario_id,
+        scenario_name=scenario_id,
+        effective_date=date(2026, 1, 1),
+        probability_weight=Decimal("0.5"),
+        gdp_growth_rate=gdp,
+        inflation_rate=inflation,
+    )
+
+
+def add_model(
+    db,
+    segment: str,
+    dependent_variable: str,
+    intercept: float,
+    gdp: float,
+    inflation: float,
+    calibration_date: date = date(2025, 12, 31),
+):
+    db.add(
+        MacroRegressionModel(
+            model_id=f"{segment}-{dependent_variable}-{calibration_date}",
+            dependent_variable=dependent_variable,
+            coefficients={
+                "intercept": intercept,
+                "gdp_growth_rate": gdp,
+                "inflation_rate": inflation,
+            },
+            r_squared=Decimal("0.8"),
+            calibration_date=calibration_date,
+            portfolio_segment=segment,
+        )
+    )
+    db.commit()
+
+
+def test_batch_factors_for_all_segments_scenarios_and_horizons(db):
+    """Factors equal clip(1 + β0 + β·x) per segment, scenario and period"""
+    add_model(db, "RETAIL", "PD", 0.1, -0.05, 0.02, calibration_date=date(2024, 12, 31))
+    add_model(db, "RETAIL", "PD", 0.2, -0.04, 0.03)
+    add_model(db, "SME", "PD", -0.3, -0.2, 0.0)
+    add_model(db, "SME", "LGD", 5.0, 0.0, 0.0)
+    scenarios = [
+        scenario(
+            "BASE", {"2026": 5.5, "2027": 5.8, "2028": 6.0}, {"2026": 4.0, "2027": 3.8, "2028": 3.5}
+        ),
+        scenario("DOWN", [3.0, 2.5], 6.0),
+    ]
+    service = MacroRegressionService()
+
+    batch = service.batch_macro_adjustment(db, scenarios, ["RETAIL", "SME", "CORPORATE"])
+
+    assert batch.factors.shape == (3, 2, 3)
+    gdp = np.array([[5.5, 5.8, 6.0], [3.0, 2.5, 2.5]])
+    inflation = np.array([[4.0, 3.8, 3.5], [6.0, 6.0, 6.0]])
+    np.testing.assert_allclose(
+        batch.factors[0], np.clip(1.2 - 0.04 * gdp + 0.03 * inflation, 0.5, 2.0)
+    )
+    np.testing.assert_allclose(batch.factors[1], np.clip(0.7 - 0.2 * gdp, 0.5, 2.0))
+    np.testing.assert_array_equal(batch.factors[2], 1.0)
+
+    lgd = service.batch_macro_adjustment(db, scenarios, ["SME"], ParameterType.LGD)
+    np.testing.assert_array_equal(lgd.factors, 1.5)
+
+
+def test_per_call_adjustment_wraps_the_batch(db):
+    """apply_macro_adjustment_pd uses the first scenario period"""
+    add_model(db, "RETAIL", "PD", 0.2, -0.04, 0.03)
+    base = scenario("BASE", {"2026": 5.5, "2027": 5.8}, {"2026": 4.0, "2027": 3.8})
+    service = MacroRegressionService()
+
+    result = service.apply_macro_adjustment_pd(db, Decimal("0.05"), base, "RETAIL")
+    missing = service.apply_macro_adjustment_pd(db, Decimal("0.05"), base, "SME")
+
+    factor = service.batch_macro_adjustment(db, [base], ["RETAIL"]).factors[0, 0, 0]
+    assert float(result.adjustment_factor) == pytest.approx(factor)
+    assert result.adjusted_value == Decimal("0.05") * result.adjustment_factor
+    assert result.macro_variables["gdp_growth_rate"] == 5.5
+    assert missing.adjusted_value == Decimal("0.05")
+    assert missing.adjustment_factor == Decimal("1.0")
+
+
+def calibration_frame(segments: int = 6, periods: int = 40, seed: int = 1) -> pd.DataFrame:
+    """PD driven by GDP growth and inflation with segment-specific sensitivities"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for g in range(segments):
+        gdp = rng.normal(5.0, 1.5, periods)
+        inflation = rng.normal(4.0, 1.0, periods)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "segment": f"SEG{g}",
+                    "gdp_growth_rate": gdp,
+                    "inflation_rate": inflation,
+                    "pd": 0.02
+                    + 0.001 * g
+                    - 0.002 * gdp
+                    + 0.001 * inflation
+                    + rng.normal(0, 1e-5, periods),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_calibrate_segments_fits_all_segments_in_one_transaction(db):
+    """Parallel and in-process fits agree; every segment is stored"""
+    data = calibration_frame()
+    service = MacroRegressionService()
+
+    pooled = service.calibrate_segments(
+        db, data, max_workers=2, calibration_date=date(2025, 12, 31)
+    )
+    inline = service.calibrate_segments(
+        db, data, max_workers=0, calibration_date=date(2025, 12, 31)
+    )
+
+    assert [m.portfolio_segment for m in pooled] == [f"SEG{g}" for g in range(6)]
+    assert db.query(MacroRegressionModel).count() == 12
+    for parallel, serial in zip(pooled, inline):
+        assert parallel.coefficients == pytest.approx(serial.coefficients)
+        assert parallel.dependent_variable == "PD"
+        assert parallel.r_squared > Decimal("0.99")
+    assert pooled[3].coefficients["intercept"] == pytest.approx(0.023, abs=1e-4)
+    assert pooled[3].coefficients["gdp_growth_rate"] == pytest.approx(-0.002, abs=1e-4)
+    assert pooled[3].coefficients["oil_price_usd"] == 0.0
+
+
+def test_single_segment_calibration_is_used_by_adjustments(db):
+    """calibrate_pd_macro_model stores a model the adjustment API finds"""
+    records = calibration_frame(segments=1).drop(columns="segment").to_dict("records")
+    service = MacroRegressionService()
+
+    model = service.calibrate_pd_macro_model(db, records, "RETAIL")
+    batch = service.batch_macro_adjustment(
+        db, [{"gdp_growth_rate": 5.0, "inflation_rate": 4.0}], ["RETAIL"]
+    )
+
+    assert batch.models["RETAIL"].model_id == model.model_id
+    expected = 1.0 + model.coefficients["intercept"] - 0.002 * 5.0 + 0.001 * 4.0
+    assert batch.factors[0, 0, 0] == pytest.approx(expected, abs=1e-4)
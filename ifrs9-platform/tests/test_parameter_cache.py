@@ -0,0 +1,308 @@
+"""
+Unit tests for the in-process parameter cache.
+
+Tests cover:
+- LRU bound and TTL expiry of the local cache
+- Invalidation through the shared version counter
+- Parameter lookups served from memory, Redis, then the loader
+- Batched Redis reads/writes, SCAN-based invalidation and serializers
+- Single-flight computation of misses and early refresh
+"""
+
+from decimal import Decimal
+from fnmatch import fnmatch
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.db.models import CustomerType
+from src.utils import cache
+from src.utils.cache import (
+    LocalCache,
+    VersionedLocalCache,
+    PickleSerializer,
+    mget_cache,
+    mset_cache,
+    clear_cache_pattern,
+    get_or_compute,
+)
+from src.services import parameter_service
+from src.services.parameter_service import ParameterService
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the Redis commands used by the cache"""
+
+    def __init__(self):
+        self.store = {}
+        self.gets = 0
+        self.round_trips = 0
+
+    def get(self, key):
+        self.gets += 1
+        self.round_trips += 1
+        return self.store.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def scan_iter(self, match=None, count=None):
+        for key in list(self.store):
+            if match is None or fnmatch(key, match):
+                yield key
+
+    def unlink(self, *keys):
+        self.round_trips += 1
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+    def keys(self, pattern):
+        raise AssertionError("KEYS blocks Redis")
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def setex(self, key, expire, value):
+        self.store[key] = value
+
+    def eval(self, script, numkeys, key, token):
+        # Compare-and-delete lease release
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value):
+        self.commands.append((key, value))
+
+    def setex(self, key, expire, value):
+        self.commands.append((key, value))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        self.redis.store.update(self.commands)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", fake)
+    return fake
+
+
+def test_local_cache_evicts_least_recently_used_and_expires():
+    clock = Clock()
+    local = LocalCache(maxsize=2, ttl=10.0, clock=clock)
+
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == 1
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert local.get("a") == 1 and local.get("c") == 3
+    clock.now = 10.0
+    assert local.get("a") is None
+    assert len(local) == 1
+
+
+def test_version_bump_in_another_process_clears_local_entries(redis):
+    clock = Clock()
+    worker = VersionedLocalCache("parameter:version", version_check_interval=1.0, clock=clock)
+    api = VersionedLocalCache("parameter:version", clock=clock)
+
+    worker.set("pd:RETAIL", Decimal("0.02"))
+    assert worker.get("pd:RETAIL") == Decimal("0.02")
+
+    assert api.bump() == 1
+    # Served from memory until the next version check
+    assert worker.get("pd:RETAIL") == Decimal("0.02")
+    clock.now = 1.0
+    assert worker.get("pd:RETAIL") is None
+    assert worker.versioned_key("pd:RETAIL") == "pd:RETAIL:v1"
+
+
+def test_lookup_reads_memory_then_redis_then_database(redis, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(
+        parameter_service,
+        "parameter_cache",
+        VersionedLocalCache(parameter_service.PARAMETER_VERSION_KEY, clock=clock),
+    )
+    service = ParameterService(db=None)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return Decimal("0.0125")
+
+    assert service._lookup("pd:key", load) == Decimal("0.0125")
+    gets = redis.gets
+    for _ in range(1000):
+        assert service._lookup("pd:key", load) == Decimal("0.0125")
+    assert len(loads) == 1
+    assert redis.gets == gets
+
+    # Another worker with an empty local cache is served from Redis
+    parameter_service.parameter_cache.clear()
+    assert service._lookup("pd:key", load) == Decimal("0.0125")
+    assert len(loads) == 1
+
+    # Invalidation moves lookups to a new version
+    service.invalidate_cache()
+    assert service._lookup("pd:key", load) == Decimal("0.0125")
+    assert len(loads) == 2
+    assert set(redis.store) == {"parameter:version", "pd:key:v0", "pd:key:v1"}
+
+
+def test_batched_reads_and_writes_use_one_round_trip_per_batch(redis):
+    values = {f"pd:curve:{i}": [0.01 * i, 0.02 * i] for i in range(2500)}
+
+    assert mset_cache(values, expire=60, batch_size=1000)
+    assert redis.round_trips == 3
+    found = mget_cache(list(values) + ["missing"], batch_size=1000)
+
+    assert redis.round_trips == 6
+    assert found == values
+
+
+def test_clear_cache_pattern_scans_and_unlinks_in_batches(redis):
+    redis.store.update({f"parameter:{i}": "1" for i in range(25)})
+    redis.store["other"] = "1"
+
+    assert clear_cache_pattern("parameter:*", batch_size=10) == 25
+    assert redis.round_trips == 3
+    assert set(redis.store) == {"other"}
+
+
+def test_compact_serializer_round_trips_numeric_payloads(redis):
+    curve = np.linspace(0.0, 0.3, 360)
+    cache.set_cache("curve", {"pd": curve, "lgd": Decimal("0.45")}, serializer=PickleSerializer())
+
+    value = cache.get_cache("curve", serializer=PickleSerializer())
+    np.testing.assert_array_equal(value["pd"], curve)
+    assert value["lgd"] == Decimal("0.45")
+    assert len(redis.store["curve"]) < len(cache.DEFAULT_SERIALIZER.dumps(curve.tolist()))
+
+
+def test_prefetch_warms_local_cache_with_one_round_trip(redis, monkeypatch):
+    monkeypatch.setattr(
+        parameter_service,
+        "parameter_cache",
+        VersionedLocalCache(parameter_service.PARAMETER_VERSION_KEY, clock=Clock()),
+    )
+    service = ParameterService(db=None)
+    keys = [
+        ParameterService.pd_cache_key(CustomerType.RETAIL, "TERM_LOAN", rating, 12, "2025-12-31")
+        for rating in ["AAA", "AA", "A", "BBB", "BB"]
+    ]
+    mset_cache(
+        {f"{key}:v0": [str(0.01 * i), 0.001, time.time() + 60] for i, key in enumerate(keys)}
+    )
+    redis.round_trips = 0
+
+    assert service.prefetch(keys + keys) == 5
+    assert redis.round_trips == 2  # version check and one MGET
+    assert service._lookup(keys[3], lambda: pytest.fail("loaded")) == Decimal("0.03")
+
+
+class SlowCompute:
+    def __init__(self, value, seconds=0.2):
+        self.value = value
+        self.seconds = seconds
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.seconds)
+        return self.value
+
+
+def run_concurrently(target, threads=8):
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(target())) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def test_concurrent_misses_compute_once(redis):
+    compute = SlowCompute([1, 2, 3])
+
+    results = run_concurrently(lambda: get_or_compute("matrix", compute, expire=60))
+
+    assert compute.calls == 1
+    assert results == [[1, 2, 3]] * 8
+    assert get_or_compute("matrix", compute, expire=60) == [1, 2, 3]
+    assert compute.calls == 1
+    assert "matrix:lease" not in redis.store
+
+
+def test_waits_for_the_lease_holder_in_another_process(redis):
+    redis.store["matrix:lease"] = "other-process"
+    compute = SlowCompute("local")
+
+    def other_process_finishes():
+        time.sleep(0.1)
+        redis.store["matrix"] = cache.DEFAULT_SERIALIZER.dumps(["remote", 0.1, time.time() + 60])
+
+    threading.Thread(target=other_process_finishes).start()
+
+    assert get_or_compute("matrix", compute, expire=60, poll_interval=0.01) == "remote"
+    assert compute.calls == 0
+
+
+def test_early_refresh_serves_stale_value_while_one_caller_recomputes(redis, monkeypatch):
+    # Expires in 1 second after a 10 second computation: refreshed early
+    monkeypatch.setattr(cache.random, "random", lambda: 0.5)
+    redis.store["matrix"] = cache.DEFAULT_SERIALIZER.dumps(["stale", 10.0, time.time() + 1])
+    compute = SlowCompute("fresh")
+
+    results = run_concurrently(lambda: get_or_compute("matrix", compute, expire=60))
+
+    assert compute.calls == 1
+    assert sorted(results) == ["fresh"] + ["stale"] * 7
+    assert get_or_compute("matrix", compute, expire=60, beta=0.0) == "fresh"
+
+
+def test_misses_are_coalesced_in_process_without_redis(monkeypatch):
+    class DownRedis:
+        def __getattr__(self, name):
+            def unavailable(*args, **kwargs):
+                raise ConnectionError("Redis unavailable")
+
+            return unavailable
+
+    monkeypatch.setattr(cache, "_redis_client", DownRedis())
+    compute = SlowCompute(42)
+
+    assert run_concurrently(lambda: get_or_compute("matrix", compute, expire=60)) == [42] * 8
+    assert compute.calls == 1
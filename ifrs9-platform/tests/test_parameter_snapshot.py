@@ -0,0 +1,230 @@
+"""
+Unit tests for parameter snapshots.
+
+Tests cover:
+- Effective-date intervals and segment fallback
+- Vectorized portfolio resolution matching per-instrument lookups
+- Frozen parameter versions for reproducible ECL runs
+"""
+
+from datetime import date
+from decimal import Decimal
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from src.db.models import (
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    ParameterSet,
+    ParameterType,
+    ECLCalculation,
+)
+from src.services.ecl_engine import ECLCalculationService
+from src.services.parameter_service import ParameterService
+from src.services.parameter_snapshot import ParameterSnapshot, KEY_COLUMNS
+from src.services.portfolio_runner import PortfolioRunner, process_shard
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+def parameter(
+    parameter_id,
+    parameter_type,
+    value,
+    effective_date=date(2025, 1, 1),
+    expiry_date=None,
+    segment=None,
+    product=None,
+    rating=None,
+    version="2025.1",
+):
+    return ParameterSet(
+        parameter_id=parameter_id,
+        parameter_type=parameter_type,
+        parameter_value=Decimal(value),
+        effective_date=effective_date,
+        expiry_date=expiry_date,
+        customer_segment=segment,
+        product_type=product,
+        credit_rating=rating,
+        version=version,
+    )
+
+
+def add_parameters(db):
+    db.add_all(
+        [
+            parameter("PD-ALL", ParameterType.PD, "0.030"),
+            parameter("PD-RETAIL", ParameterType.PD, "0.040", segment="RETAIL"),
+            parameter(
+                "PD-RETAIL-OD", ParameterType.PD, "0.050", segment="RETAIL", product="OVERDRAFT"
+            ),
+            parameter(
+                "PD-RETAIL-OD-B-OLD",
+                ParameterType.PD,
+                "0.070",
+                date(2024, 1, 1),
+                date(2025, 7, 1),
+                segment="RETAIL",
+                product="OVERDRAFT",
+                rating="B",
+            ),
+            parameter(
+                "PD-RETAIL-OD-B",
+                ParameterType.PD,
+                "0.080",
+                date(2025, 7, 1),
+                segment="RETAIL",
+                product="OVERDRAFT",
+                rating="B",
+            ),
+            parameter("PD-SME-FUTURE", ParameterType.PD, "0.090", date(2026, 3, 1), segment="SME"),
+            parameter(
+                "PD-SME-EXPIRED",
+                ParameterType.PD,
+                "0.100",
+                date(2024, 1, 1),
+                date(2025, 1, 1),
+                segment="SME",
+            ),
+            parameter("LGD-CORP", ParameterType.LGD, "0.350", segment="CORPORATE"),
+            parameter("EAD-OD", ParameterType.EAD, "0.750", segment="RETAIL", product="OVERDRAFT"),
+            parameter(
+                "PD-RETAIL-V2",
+                ParameterType.PD,
+                "0.200",
+                date(2025, 6, 1),
+                segment="RETAIL",
+                version="2025.2",
+            ),
+        ]
+    )
+    db.commit()
+
+
+def test_resolve_uses_intervals_and_falls_back_to_broader_segments(db):
+    add_parameters(db)
+    snapshot = ParameterSnapshot.load(db, REPORTING_DATE, version="2025.1")
+
+    assert snapshot.parameter_count == 8  # the future SME parameter is not loaded
+    assert snapshot.resolve(ParameterType.PD, "RETAIL", "OVERDRAFT", "B") == Decimal("0.080")
+    assert snapshot.resolve(
+        ParameterType.PD, "RETAIL", "OVERDRAFT", "B", as_of=date(2025, 3, 31)
+    ) == Decimal("0.070")
+    assert snapshot.resolve(ParameterType.PD, "RETAIL", "OVERDRAFT", "A") == Decimal("0.050")
+    assert snapshot.resolve(ParameterType.PD, "RETAIL", "TERM_LOAN") == Decimal("0.040")
+    # Future and expired SME parameters do not apply
+    assert snapshot.resolve(ParameterType.PD, "SME", "TERM_LOAN") == Decimal("0.030")
+    assert snapshot.resolve(ParameterType.LGD, "RETAIL", "TERM_LOAN") is None
+
+    latest = ParameterSnapshot.load(db, REPORTING_DATE)
+    assert latest.resolve(ParameterType.PD, "RETAIL", "TERM_LOAN") == Decimal("0.200")
+    assert latest.fingerprint != snapshot.fingerprint
+    assert (
+        ParameterSnapshot.load(db, REPORTING_DATE, version="2025.1").fingerprint
+        == snapshot.fingerprint
+    )
+
+
+def test_resolve_frame_matches_scalar_lookups(db):
+    add_parameters(db)
+    snapshot = ParameterSnapshot.load(db, REPORTING_DATE, version="2025.1")
+    keys = list(
+        itertools.product(
+            ["RETAIL", "SME", "CORPORATE", None], ["OVERDRAFT", "TERM_LOAN", None], ["A", "B", None]
+        )
+    )
+    portfolio = pd.DataFrame(keys * 3, columns=KEY_COLUMNS)
+
+    for parameter_type, default in [
+        (ParameterType.PD, "0.02"),
+        (ParameterType.LGD, "0.45"),
+        (ParameterType.EAD, "1.0"),
+    ]:
+        values = snapshot.resolve_frame(portfolio, parameter_type)
+        expected = [
+            float(snapshot.resolve(parameter_type, *key) or Decimal(default)) for key in keys * 3
+        ]
+        np.testing.assert_allclose(values, expected)
+
+
+def add_portfolio(db):
+    for c, customer_type in enumerate(
+        [CustomerType.RETAIL, CustomerType.SME, CustomerType.CORPORATE]
+    ):
+        db.add(
+            Customer(
+                customer_id=f"CUST{c}",
+                customer_name=f"Customer {c}",
+                customer_type=customer_type,
+                credit_rating="B",
+            )
+        )
+        for j, instrument_type in enumerate([InstrumentType.TERM_LOAN, InstrumentType.OVERDRAFT]):
+            db.add(
+                FinancialInstrument(
+                    instrument_id=f"INST{c}{j}",
+                    instrument_type=instrument_type,
+                    customer_id=f"CUST{c}",
+                    origination_date=date(2024, 1, 1),
+                    maturity_date=date(2028, 6, 30),
+                    principal_amount=Decimal("1000000"),
+                    interest_rate=Decimal("12.5"),
+                )
+            )
+    db.commit()
+
+
+def test_services_resolve_parameters_from_the_snapshot(db):
+    add_parameters(db)
+    add_portfolio(db)
+    snapshot = ParameterSnapshot.load(db, REPORTING_DATE, version="2025.1")
+    instruments = db.query(FinancialInstrument).order_by(FinancialInstrument.instrument_id).all()
+
+    arrays = ECLCalculationService(parameter_snapshot=snapshot).build_portfolio_arrays(
+        instruments, REPORTING_DATE
+    )
+    np.testing.assert_allclose(arrays.pd, [0.04, 0.08, 0.03, 0.03, 0.03, 0.03])
+    np.testing.assert_allclose(arrays.lgd, [0.45, 0.45, 0.45, 0.45, 0.35, 0.35])
+    np.testing.assert_allclose(arrays.ead, [1e6, 7.5e5, 1e6, 1e6, 1e6, 1e6])
+
+    service = ParameterService(db, snapshot=snapshot)
+    assert service.get_pd(CustomerType.RETAIL, "OVERDRAFT", "B", 12, REPORTING_DATE) == Decimal(
+        "0.080"
+    )
+    assert service.get_lgd(CustomerType.CORPORATE, "BOND", None, REPORTING_DATE) == Decimal("0.350")
+    assert service.get_ead(
+        CustomerType.RETAIL, "OVERDRAFT", Decimal("100"), REPORTING_DATE
+    ) == Decimal("75.000")
+
+
+def test_portfolio_run_with_frozen_parameter_version(db):
+    add_parameters(db)
+    add_portfolio(db)
+    runner = PortfolioRunner(max_workers=1)
+
+    first = runner.create_run(
+        db, REPORTING_DATE, user_id="tester", incremental=False, parameter_version="2025.1"
+    )
+    for shard in first.shards:
+        process_shard(db, shard.shard_id)
+    # Newer parameters do not change a rerun pinned to the same version
+    db.add(parameter("PD-ALL-NEW", ParameterType.PD, "0.500", date(2025, 11, 1), version="2025.3"))
+    db.commit()
+    second = runner.create_run(
+        db, REPORTING_DATE, user_id="tester", incremental=False, parameter_version="2025.1"
+    )
+    for shard in second.shards:
+        process_shard(db, shard.shard_id)
+
+    assert runner.get_run(db, second.run_id)["parameter_version"] == "2025.1"
+    assert (
+        runner.get_run(db, second.run_id)["total_ecl"]
+        == runner.get_run(db, first.run_id)["total_ecl"]
+    )
+    versions = {calc.parameters_version for calc in db.query(ECLCalculation).all()}
+    assert len(versions) == 1 and versions.pop().startswith("2025.1:")
@@ -0,0 +1,247 @@
+"""
+Unit tests for portfolio ECL runs.
+
+Tests cover:
+- Customer and segment sharding
+- Sharded process-pool runs matching the single-process calculation
+- Chunk checkpoints and resume of interrupted runs
+- Incremental recalculation of changed instruments only
+- Bulk persistence of results and audit entries
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.models import (
+    Base,
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    Stage,
+    ECLCalculation,
+    PortfolioRunShard,
+    AuditEntry,
+)
+from src.services.audit_trail import AuditTrailService
+from src.services.ecl_engine import ECLCalculationService
+from src.services.ecl_incremental import IncrementalECLCalculator
+from src.services.ecl_results_writer import ECLResultsWriter
+from src.services.portfolio_runner import (
+    PortfolioRunner,
+    process_shard,
+    summarize_results,
+    COMPLETED,
+    FAILED,
+)
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+@pytest.fixture
+def portfolio_db(tmp_path):
+    """File-backed SQLite database (shared with worker processes)"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'portfolio.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    customer_types = [CustomerType.RETAIL, CustomerType.SME, CustomerType.CORPORATE]
+    stages = [Stage.STAGE_1, Stage.STAGE_2, Stage.STAGE_3]
+    for c in range(12):
+        db.add(
+            Customer(
+                customer_id=f"CUST{c:03d}",
+                customer_name=f"Customer {c}",
+                customer_type=customer_types[c % 3],
+            )
+        )
+        for j in range(5):
+            db.add(
+                FinancialInstrument(
+                    instrument_id=f"INST{c:03d}{j}",
+                    instrument_type=InstrumentType.TERM_LOAN,
+                    customer_id=f"CUST{c:03d}",
+                    origination_date=date(2023, 1, 1),
+                    maturity_date=date(2026 + j, 6, 30),
+                    principal_amount=Decimal(1_000_000 * (c + 1) + j),
+                    interest_rate=Decimal("12.5"),
+                    current_stage=stages[(c + j) % 3],
+                )
+            )
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def test_customer_sharding_keeps_customers_together(portfolio_db):
+    """All instruments of a customer land in the same shard"""
+    runner = PortfolioRunner(max_workers=4, shard_by="customer")
+
+    shards = runner.plan_shards(portfolio_db)
+
+    assert sum(len(shard) for shard in shards) == 60
+    shard_of = {}
+    for index, shard in enumerate(shards):
+        for instrument_id in shard:
+            customer = instrument_id[:7]
+            assert shard_of.setdefault(customer, index) == index
+
+
+def test_segment_sharding_splits_large_segments(portfolio_db):
+    """Segments larger than shard_size are split into several shards"""
+    runner = PortfolioRunner(max_workers=2, shard_by="segment", shard_size=10)
+
+    shards = runner.plan_shards(portfolio_db)
+
+    assert sum(len(shard) for shard in shards) == 60
+    assert len(shards) >= 3
+
+
+def test_sharded_run_matches_single_process(portfolio_db):
+    """Merged shard totals equal the single-process portfolio calculation"""
+    instruments = portfolio_db.query(FinancialInstrument).all()
+    results = ECLCalculationService().recalculate_portfolio(instruments, REPORTING_DATE)
+    expected = summarize_results(instruments, results)
+
+    runner = PortfolioRunner(max_workers=2, shard_by="customer", chunk_size=7, dispatch="local")
+    summary = runner.run(portfolio_db, REPORTING_DATE)
+
+    assert summary["status"] == COMPLETED
+    assert summary["shards_completed"] == summary["shards_total"]
+    assert summary["instruments_calculated"] == 60
+    assert summary["total_ecl"] == float(expected.total_ecl)
+    assert summary["stage_totals"] == {k: float(v) for k, v in expected.stage_totals.items()}
+    assert portfolio_db.query(ECLCalculation).count() == 60
+
+
+class CrashingECLService(ECLCalculationService):
+    """ECL service that fails on a given call (simulates a crashed worker)"""
+
+    def __init__(self, fail_on_call):
+        super().__init__()
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def recalculate_portfolio(self, instruments, reporting_date, vectorized=True, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("worker lost")
+        return super().recalculate_portfolio(instruments, reporting_date, vectorized, **kwargs)
+
+
+def test_interrupted_shard_resumes_from_last_chunk(portfolio_db):
+    """A failed shard keeps committed chunks and resumes without duplicates"""
+    runner = PortfolioRunner(max_workers=1, chunk_size=10, dispatch="local")
+    run = runner.create_run(portfolio_db, REPORTING_DATE, user_id="tester")
+    shard = (
+        portfolio_db.query(PortfolioRunShard).filter(PortfolioRunShard.run_id == run.run_id).one()
+    )
+    assert shard.chunks_total == 6
+
+    with pytest.raises(RuntimeError):
+        process_shard(portfolio_db, shard.shard_id, CrashingECLService(fail_on_call=3))
+
+    assert shard.status == FAILED
+    assert shard.chunks_completed == 2
+    assert portfolio_db.query(ECLCalculation).count() == 20
+    assert runner.get_run(portfolio_db, run.run_id)["status"] == FAILED
+
+    service = CrashingECLService(fail_on_call=None)
+    process_shard(portfolio_db, shard.shard_id, service)
+
+    assert service.calls == 4
+    assert shard.status == COMPLETED
+    assert shard.attempts == 2
+    assert portfolio_db.query(ECLCalculation).count() == 60
+    assert portfolio_db.query(ECLCalculation.instrument_id).distinct().count() == 60
+
+    instruments = portfolio_db.query(FinancialInstrument).all()
+    expected = summarize_results(
+        instruments, ECLCalculationService().recalculate_portfolio(instruments, REPORTING_DATE)
+    )
+    summary = runner.get_run(portfolio_db, run.run_id)
+    assert summary["status"] == COMPLETED
+    assert summary["total_ecl"] == float(expected.total_ecl)
+
+
+def test_incremental_run_recomputes_changed_instruments_only(portfolio_db):
+    """Unchanged instruments are carried forward, changed ones recomputed"""
+    service = ECLCalculationService()
+    instruments = (
+        portfolio_db.query(FinancialInstrument).order_by(FinancialInstrument.instrument_id).all()
+    )
+    first = IncrementalECLCalculator(portfolio_db, service).calculate(instruments, REPORTING_DATE)
+    for instrument in instruments:
+        portfolio_db.add(
+            service.build_calculation_record(
+                instrument, first[instrument.instrument_id], REPORTING_DATE
+            )
+        )
+    portfolio_db.commit()
+
+    changed = instruments[:3]
+    changed[0].principal_amount += Decimal("1000")
+    changed[1].current_stage = Stage.STAGE_3
+    changed[2].days_past_due = 45
+    portfolio_db.commit()
+
+    second = IncrementalECLCalculator(portfolio_db, service).calculate(instruments, REPORTING_DATE)
+
+    recomputed = {k for k, r in second.items() if r.carried_forward_from is None}
+    assert recomputed == {i.instrument_id for i in changed}
+    for instrument in instruments[3:]:
+        result = second[instrument.instrument_id]
+        assert result.carried_forward_from == first[instrument.instrument_id].calculation_id
+        assert result.ecl_amount == first[instrument.instrument_id].ecl_amount
+    assert second[changed[0].instrument_id].ecl_amount > first[changed[0].instrument_id].ecl_amount
+
+
+def test_new_reporting_date_recomputes_everything(portfolio_db):
+    """The reporting date is part of the fingerprint"""
+    service = ECLCalculationService()
+    instruments = portfolio_db.query(FinancialInstrument).all()
+    first = IncrementalECLCalculator(portfolio_db, service).calculate(instruments, REPORTING_DATE)
+    for instrument in instruments:
+        portfolio_db.add(
+            service.build_calculation_record(
+                instrument, first[instrument.instrument_id], REPORTING_DATE
+            )
+        )
+    portfolio_db.commit()
+
+    later = IncrementalECLCalculator(portfolio_db, service).calculate(
+        instruments, date(2026, 1, 31)
+    )
+
+    assert all(result.carried_forward_from is None for result in later.values())
+
+
+def test_results_writer_bulk_inserts_calculations_and_audit_entries(portfolio_db):
+    """Results and audit entries are written in chunks; audit hashes verify"""
+    service = ECLCalculationService()
+    instruments = portfolio_db.query(FinancialInstrument).all()
+    results = IncrementalECLCalculator(portfolio_db, service).calculate(instruments, REPORTING_DATE)
+
+    written = ECLResultsWriter(portfolio_db, chunk_size=7).write_results(
+        service, instruments, results, REPORTING_DATE, user_id="analyst"
+    )
+    portfolio_db.commit()
+
+    assert written == 60
+    stored = {c.instrument_id: c for c in portfolio_db.query(ECLCalculation).all()}
+    assert len(stored) == 60
+    for instrument_id, result in results.items():
+        assert stored[instrument_id].calculation_id == result.calculation_id
+        assert stored[instrument_id].ecl_amount == result.ecl_amount
+        assert stored[instrument_id].input_fingerprint == result.input_fingerprint
+
+    entries = portfolio_db.query(AuditEntry).all()
+    assert len(entries) == 60
+    audit = AuditTrailService(portfolio_db, user_id="analyst")
+    assert all(entry.action == "ECL_CALCULATION" and not entry.is_deleted for entry in entries)
+    assert all(audit.verify_integrity(entry) for entry in entries)
@@ -0,0 +1,161 @@
+"""
+Unit tests for stage transition history.
+
+Tests cover:
+- Range queries per instrument and across the portfolio
+- Keyset pagination without gaps or duplicates
+- Streaming in batches
+- The /staging/transitions route and its page cursor
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from src.db.models import (
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    Stage,
+    StageTransition,
+)
+from src.services.staging import StagingService, transition_key
+
+
+@pytest.fixture(autouse=True)
+def history(db):
+    add_history(db)
+
+
+def add_history(db, instruments=5, months=24):
+    db.add(
+        Customer(customer_id="CUST1", customer_name="Customer 1", customer_type=CustomerType.SME)
+    )
+    for i in range(instruments):
+        db.add(
+            FinancialInstrument(
+                instrument_id=f"INST{i}",
+                instrument_type=InstrumentType.TERM_LOAN,
+                customer_id="CUST1",
+                origination_date=date(2023, 1, 1),
+                maturity_date=date(2030, 1, 1),
+                principal_amount=Decimal("1000"),
+                interest_rate=Decimal("10"),
+            )
+        )
+        stages = [Stage.STAGE_1, Stage.STAGE_2]
+        for month in range(months):
+            db.add(
+                StageTransition(
+                    transition_id=f"T{i}-{month:02d}",
+                    instrument_id=f"INST{i}",
+                    # Two transitions per date for every other month
+                    transition_date=date(2024, 1, 31) + timedelta(days=30 * (month // 2 * 2)),
+                    from_stage=stages[month % 2],
+                    to_stage=stages[(month + 1) % 2],
+                    transition_reason=f"month {month}",
+                )
+            )
+    db.commit()
+
+
+def test_range_queries_use_the_indexes(db):
+    service = StagingService(db)
+
+    history = service.get_stage_transitions("INST2", date(2024, 3, 1), date(2024, 12, 31))
+
+    assert history and all(t.instrument_id == "INST2" for t in history)
+    assert all(date(2024, 3, 1) <= t.transition_date <= date(2024, 12, 31) for t in history)
+    assert [transition_key(t) for t in history] == sorted(transition_key(t) for t in history)
+
+    plan = " ".join(
+        str(row)
+        for row in db.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT * FROM stage_transition WHERE instrument_id = 'INST2' "
+                "AND transition_date >= '2024-03-01' ORDER BY transition_date, transition_id"
+            )
+        )
+    )
+    assert "ix_stage_transition_instrument_date" in plan
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_cover_every_transition_once(db, descending):
+    service = StagingService(db)
+    expected = service.get_stage_transitions(descending=descending)
+
+    pages, after = [], None
+    while True:
+        page = service.get_stage_transitions(limit=7, after=after, descending=descending)
+        pages.extend(page)
+        if len(page) < 7:
+            break
+        after = transition_key(page[-1])
+
+    assert len(expected) == 120
+    assert [t.transition_id for t in pages] == [t.transition_id for t in expected]
+
+
+def test_streaming_matches_the_full_query(db):
+    service = StagingService(db)
+
+    streamed = list(service.iter_stage_transitions(start_date=date(2024, 6, 1), batch_size=10))
+
+    expected = service.get_stage_transitions(start_date=date(2024, 6, 1))
+    assert [row.transition_id for row in streamed] == [t.transition_id for t in expected]
+    assert streamed[0].to_stage in (Stage.STAGE_1, Stage.STAGE_2)
+    with pytest.raises(ValueError):
+        list(StagingService().iter_stage_transitions())
+
+
+def test_transitions_route_pages_with_cursor(engine, db):
+    from src.api.main import app
+    from src.api.dependencies import get_db
+
+    def override_get_db():
+        session = sessionmaker(bind=engine)()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        first = client.get(
+            "/api/v1/staging/transitions", params={"instrument_id": "INST1", "limit": 15}
+        )
+        assert first.status_code == 200
+        assert first.json()[0] == {
+            "id": "T1-23",
+            "instrument_id": "INST1",
+            "transition_date": "2025-11-21",
+            "from_stage": "STAGE_2",
+            "to_stage": "STAGE_1",
+            "reason": "month 23",
+            "sicr_indicators": None,
+            "days_past_due": None,
+        }
+
+        second = client.get(
+            "/api/v1/staging/transitions",
+            params={
+                "instrument_id": "INST1",
+                "limit": 15,
+                "cursor": first.headers["X-Next-Cursor"],
+            },
+        )
+        ids = [t["id"] for t in first.json() + second.json()]
+        assert len(ids) == len(set(ids)) == 24
+        assert "X-Next-Cursor" not in second.headers
+        assert (
+            client.get("/api/v1/staging/transitions", params={"cursor": "bad"}).status_code == 400
+        )
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,136 @@
+"""
+Unit tests for the portfolio staging job.
+
+Tests cover:
+- Only instruments whose stage changed are updated, with transitions and audit entries
+- A constant number of statements per chunk
+- Reruns write nothing
+- UPDATE ... FROM (VALUES ...) on PostgreSQL
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from src.db.models import (
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    Stage,
+    StageTransition,
+    AuditEntry,
+)
+from src.services.staging_job import StagingJob
+
+REPORTING_DATE = date(2025, 12, 31)
+
+
+def add_book(db, n=300):
+    db.add(
+        Customer(customer_id="CUST1", customer_name="Customer 1", customer_type=CustomerType.SME)
+    )
+    stages = [Stage.STAGE_1, Stage.STAGE_2, Stage.STAGE_3, Stage.STAGE_1]
+    for i in range(n):
+        db.add(
+            FinancialInstrument(
+                instrument_id=f"INST{i:04d}",
+                instrument_type=InstrumentType.TERM_LOAN,
+                customer_id="CUST1",
+                origination_date=date(2023, 1, 1),
+                maturity_date=date(2028, 1, 1),
+                principal_amount=Decimal("1000"),
+                interest_rate=Decimal("12"),
+                current_stage=stages[i % 4],
+                days_past_due=[0, 45, 120][i % 3],
+                initial_recognition_pd=Decimal("0.050000") if i % 5 == 0 else None,
+            )
+        )
+    db.commit()
+
+
+def count_statements(engine):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, context, executemany: statements.append(
+            statement
+        ),
+    )
+    return statements
+
+
+def test_job_persists_only_changed_stages_in_bulk(engine, db):
+    add_book(db)
+    before = {i.instrument_id: i.current_stage for i in db.query(FinancialInstrument)}
+    statements = count_statements(engine)
+
+    summary = StagingJob(db, chunk_size=100).run(REPORTING_DATE, user_id="tester")
+    executed = len(statements)
+
+    db.expire_all()
+    after = {i.instrument_id: i for i in db.query(FinancialInstrument)}
+    changed = [
+        instrument_id
+        for instrument_id, stage in before.items()
+        if after[instrument_id].current_stage != stage
+    ]
+    assert summary["changed"] == len(changed) > 0
+    assert summary["instruments"] == 300
+    assert all(after[i].stage_date == REPORTING_DATE for i in changed)
+    for instrument in after.values():
+        expected = (
+            Stage.STAGE_3
+            if instrument.days_past_due > 90
+            else (
+                Stage.STAGE_2
+                if instrument.days_past_due > 30 or instrument.initial_recognition_pd
+                else Stage.STAGE_1
+            )
+        )
+        assert instrument.current_stage == expected
+
+    transitions = db.query(StageTransition).all()
+    assert len(transitions) == summary["transitions"] == len(changed)
+    assert {t.instrument_id for t in transitions} <= set(changed)
+    audits = db.query(AuditEntry).all()
+    assert len(audits) == summary["audit_entries"] == len(changed)
+    assert {a.action for a in audits} == {"STAGE_TRANSITION"}
+    assert {a.entity_id for a in audits} == set(changed)
+
+    sample = next(t for t in transitions if t.to_stage == Stage.STAGE_2 and t.pd_at_origination)
+    assert sample.from_stage != Stage.STAGE_2
+    assert "PD_ABSOLUTE_INCREASE" in sample.sicr_indicators
+    assert float(sample.pd_change_percentage) == pytest.approx(50.0)
+    assert sample.transition_reason.startswith("SICR detected")
+
+    # Instruments and rules, then one UPDATE and two INSERTs per chunk of changes
+    chunks = -(-len(changed) // 100)
+    assert executed == 2 + chunks * 3
+
+
+def test_rerun_writes_nothing(db):
+    add_book(db, n=40)
+    job = StagingJob(db)
+    job.run(REPORTING_DATE, user_id="tester")
+
+    summary = job.run(REPORTING_DATE, user_id="tester")
+
+    assert summary["changed"] == summary["transitions"] == summary["audit_entries"] == 0
+    assert summary["rule_version"] == "default"
+
+
+def test_postgresql_update_uses_values_list():
+    statement = StagingJob._values_update(
+        [("INST1", Stage.STAGE_2), ("INST2", Stage.STAGE_3)], REPORTING_DATE
+    )
+
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "UPDATE financial_instrument SET current_stage=CAST(new_stage.stage AS stage)" in sql
+    assert "FROM (VALUES" in sql
+    assert "WHERE financial_instrument.instrument_id = new_stage.instrument_id" in sql
@@ -0,0 +1,45 @@
+"""
+Unit tests for lazy service registration.
+
+Tests cover:
+- API and worker startup without sklearn, scipy or pandas
+- Services loaded on first access through src.services
+"""
+
+from pathlib import Path
+import subprocess
+import sys
+
+import src.services
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parents[1],
+    )
+
+
+def test_startup_does_not_import_scientific_stack():
+    result = run_python(
+        "import sys\n"
+        "import src.api.main, src.services.worker\n"
+        "loaded = {'sklearn', 'scipy', 'pandas'} & set(sys.modules)\n"
+        "assert not loaded, loaded\n"
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_services_load_on_first_access():
+    result = run_python(
+        "import sys\n"
+        "import src.services as services\n"
+        "assert 'src.services.scorecard' not in sys.modules\n"
+        "from src.services import scorecard_service\n"
+        "assert services.scorecard_service is scorecard_service\n"
+        "assert 'sklearn' not in sys.modules\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert set(src.services.__all__) <= set(dir(src.services))
@@ -0,0 +1,346 @@
+"""
+Unit tests for the transition matrix PD service.
+
+Tests cover:
+- Cached matrix loading from long-form TransitionMatrix rows
+- PD curves for all ratings from cached matrix powers
+- Vectorized calibration from rating history
+- Bootstrap confidence bands and PSI against the previous calibration
+- Generator-matrix PD curves for arbitrary monthly horizons
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event
+
+from src.db.models import (
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    Stage,
+    TransitionMatrix,
+    RatingHistory,
+)
+from src.services.transition_generator import CachedGenerator, expm, generator_from_matrix
+from src.services.transition_matrix import TransitionMatrixService
+
+SEGMENT = "RETAIL"
+CALIBRATION_DATE = date(2025, 12, 31)
+
+
+def sample_matrix(stress: float = 0.0) -> np.ndarray:
+    """Upper-triangular-heavy 10×10 annual matrix with an absorbing default state"""
+    n = 10
+    matrix = np.zeros((n, n))
+    for i in range(n - 1):
+        default = min(0.0005 * (2.2**i) + stress, 0.5)
+        down = 0.06
+        up = 0.03 if i > 0 else 0.0
+        matrix[i, n - 1] = default
+        matrix[i, min(i + 1, n - 2)] += down
+        if i > 0:
+            matrix[i, i - 1] = up
+        matrix[i, i] += 1.0 - default - down - up
+    matrix[n - 1, n - 1] = 1.0
+    return matrix
+
+
+def store_matrix(db, matrix: np.ndarray, calibration_date: date, segment: str = SEGMENT):
+    ratings = TransitionMatrixService.RATING_CLASSES
+    for i, rating_from in enumerate(ratings):
+        for j, rating_to in enumerate(ratings):
+            if matrix[i, j] == 0:
+                continue
+            db.add(
+                TransitionMatrix(
+                    matrix_id=f"{segment}-{calibration_date}-{i}-{j}",
+                    portfolio_segment=segment,
+                    rating_from=rating_from,
+                    rating_to=rating_to,
+                    transition_probability=Decimal(str(round(matrix[i, j], 8))),
+                    observation_period_start=date(2015, 1, 1),
+                    observation_period_end=calibration_date,
+                    calibration_date=calibration_date,
+                    matrix_type="PIT",
+                )
+            )
+    db.commit()
+
+
+def count_queries(db):
+    statements = []
+    event.listen(
+        db.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def test_pd_curves_for_all_ratings_use_one_matrix_load(db):
+    """A 20-year curve for every rating loads the matrix once and matches matrix powers"""
+    matrix = sample_matrix()
+    store_matrix(db, matrix, CALIBRATION_DATE)
+    service = TransitionMatrixService()
+    statements = count_queries(db)
+
+    curves = service.project_pd_curves(db, SEGMENT, 240, method="discrete")
+
+    assert len(statements) == 2  # latest calibration date + matrix cells
+    stored = np.round(matrix, 8)
+    for idx, rating in enumerate(service.RATING_CLASSES):
+        for month in (1, 11, 12, 37, 240):
+            expected = np.linalg.matrix_power(stored, month // 12)[idx, -1]
+            assert float(curves[rating].cumulative_pd[month]) == pytest.approx(expected, abs=1e-12)
+    bbb = curves["BBB"]
+    assert sum(bbb.marginal_pd.values()) == bbb.cumulative_pd[240]
+
+    service.project_pd_curves(db, SEGMENT, 240, method="discrete")
+    assert len(statements) == 3  # cached: calibration date lookup only
+
+
+def test_matrix_cache_is_keyed_by_calibration_date(db):
+    """A new calibration is picked up; the previous one stays addressable"""
+    store_matrix(db, sample_matrix(), CALIBRATION_DATE)
+    service = TransitionMatrixService()
+    before = service.calculate_pit_pd(db, "B", SEGMENT, 24, method="discrete")
+
+    store_matrix(db, sample_matrix(stress=0.02), CALIBRATION_DATE + timedelta(days=90))
+    after = service.calculate_pit_pd(db, "B", SEGMENT, 24, method="discrete")
+
+    assert after > before
+    previous = service.get_matrix(db, SEGMENT, CALIBRATION_DATE)
+    assert Decimal(str(previous.power(2)[5, -1])) == before
+
+
+def test_instrument_pd_curve_uses_customer_rating(db):
+    store_matrix(db, sample_matrix(), CALIBRATION_DATE)
+    db.add(
+        Customer(
+            customer_id="C1",
+            customer_name="C1",
+            customer_type=CustomerType.RETAIL,
+            credit_rating="CCC",
+        )
+    )
+    instrument = FinancialInstrument(
+        instrument_id="I1",
+        instrument_type=InstrumentType.TERM_LOAN,
+        customer_id="C1",
+        origination_date=date.today(),
+        maturity_date=date.today() + timedelta(days=30 * 36 + 5),
+        principal_amount=Decimal("1000"),
+        interest_rate=Decimal("10"),
+        current_stage=Stage.STAGE_2,
+    )
+    db.add(instrument)
+    db.commit()
+    service = TransitionMatrixService()
+
+    curve = service.project_pd_curve(db, instrument, SEGMENT)
+
+    assert len(curve.cumulative_pd) == 36
+    assert curve.cumulative_pd == service.project_pd_curves(db, SEGMENT, 36)["CCC"].cumulative_pd
+
+
+def store_rating_history(db, customers: int = 40, years: int = 10, seed: int = 7):
+    """Monthly ratings following a random walk on the rating scale"""
+    rng = np.random.default_rng(seed)
+    ratings = TransitionMatrixService.RATING_CLASSES
+    start = date(2014, 1, 1)
+    for c in range(customers):
+        customer_type = CustomerType.RETAIL if c % 4 else CustomerType.SME
+        db.add(
+            Customer(customer_id=f"C{c:03d}", customer_name=f"C{c}", customer_type=customer_type)
+        )
+        idx = int(rng.integers(0, 7))
+        for month in range(years * 12):
+            db.add(
+                RatingHistory(
+                    history_id=f"H{c:03d}-{month:03d}",
+                    customer_id=f"C{c:03d}",
+                    rating=ratings[idx],
+                    rating_date=start + timedelta(days=30 * month + int(rng.integers(-3, 4))),
+                )
+            )
+            if idx < 9:
+                idx = int(np.clip(idx + rng.choice([-1, 0, 0, 0, 0, 1]), 0, 9))
+    db.commit()
+
+
+def reference_counts(db, segment: str, period_months: int = 12) -> np.ndarray:
+    """Pairwise loop over each customer's ratings with the same matching rule"""
+    service = TransitionMatrixService()
+    counts = np.zeros((10, 10))
+    rows = db.query(RatingHistory).join(Customer).filter(Customer.customer_type == segment).all()
+    by_customer = {}
+    for row in rows:
+        by_customer.setdefault(row.customer_id, []).append(row)
+    for history in by_customer.values():
+        history.sort(key=lambda row: row.rating_date)
+        for i, row in enumerate(history):
+            for later in history[i + 1 :]:
+                if abs((later.rating_date - row.rating_date).days - period_months * 30) < 15:
+                    counts[
+                        service._rating_to_index(row.rating), service._rating_to_index(later.rating)
+                    ] += 1
+                    break
+    return counts
+
+
+def test_vectorized_calibration_matches_reference_counts(db):
+    """Transition counts match a loop over each customer's history"""
+    store_rating_history(db)
+    service = TransitionMatrixService()
+
+    history = service.load_rating_history(db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+    transitions = service.extract_transitions(history, 12)
+
+    assert list(history.columns) == ["customer_id", "rating", "rating_date"]
+    assert transitions["customer_id"].nunique() == 30
+    np.testing.assert_array_equal(
+        service.count_transitions(transitions), reference_counts(db, "RETAIL")
+    )
+
+
+def test_built_matrix_is_stored_and_reloaded(db):
+    """The calibrated matrix is stored one row per cell and read back by get_matrix"""
+    store_rating_history(db)
+    service = TransitionMatrixService()
+
+    result = service.build_transition_matrix(db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+    service.build_transition_matrix(db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+
+    assert result.num_observations == reference_counts(db, "RETAIL").sum()
+    np.testing.assert_allclose(result.matrix.sum(axis=1), 1.0)
+    assert db.query(TransitionMatrix).count() == 100
+    loaded = service.get_matrix(db, "RETAIL")
+    np.testing.assert_allclose(loaded.matrix, result.matrix, atol=1e-8)
+
+
+def test_bootstrap_bands_are_reproducible_across_worker_counts(db):
+    """Percentile matrices bracket the point estimate and do not depend on the pool"""
+    store_rating_history(db, customers=24, years=6)
+    service = TransitionMatrixService()
+    args = (db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+
+    inline = service.bootstrap_transition_matrix(
+        *args, n_resamples=60, block_size=20, max_workers=0, seed=11
+    )
+    pooled = service.bootstrap_transition_matrix(
+        *args, n_resamples=60, block_size=20, max_workers=2, seed=11
+    )
+
+    assert inline.num_customers == 18
+    for q in (2.5, 50.0, 97.5):
+        np.testing.assert_array_equal(inline.percentile_matrices[q], pooled.percentile_matrices[q])
+    lower, upper = inline.percentile_matrices[2.5], inline.percentile_matrices[97.5]
+    point = inline.point_estimate.matrix
+    assert np.all(lower <= point + 1e-12) and np.all(point <= upper + 1e-12)
+    assert np.any(upper - lower > 0)
+    assert inline.psi_percentiles == {}
+
+
+def test_psi_is_measured_against_previous_calibration(db):
+    """A first calibration has PSI 0; a shifted history gives a positive PSI"""
+    store_rating_history(db)
+    service = TransitionMatrixService()
+    previous = service.build_transition_matrix(db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+    db.query(TransitionMatrix).update({TransitionMatrix.calibration_date: date(2024, 12, 31)})
+    db.commit()
+    service.clear_cache()
+
+    assert previous.psi == Decimal("0")
+    same = service.build_transition_matrix(db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31))
+    shifted = service.build_transition_matrix(db, "RETAIL", date(2019, 1, 1), date(2023, 12, 31))
+    bootstrap = service.bootstrap_transition_matrix(
+        db, "RETAIL", date(2013, 12, 1), date(2023, 12, 31), n_resamples=40, max_workers=0, seed=3
+    )
+
+    assert same.psi == Decimal("0")
+    assert shifted.psi > Decimal("0")
+    assert bootstrap.psi_percentiles[2.5] <= bootstrap.psi_percentiles[97.5]
+    assert bootstrap.psi_percentiles[97.5] > Decimal("0")
+
+
+def sample_generator() -> np.ndarray:
+    """Monthly generator: one-notch migrations plus default intensity rising with rating"""
+    n = 10
+    generator = np.zeros((n, n))
+    for i in range(n - 1):
+        generator[i, n - 1] = 0.00005 * (2.2**i)
+        if i < n - 2:
+            generator[i, i + 1] = 0.005
+        if i > 0:
+            generator[i, i - 1] = 0.0025
+    generator[np.arange(n), np.arange(n)] = -generator.sum(axis=1)
+    return generator
+
+
+def test_generator_recovers_monthly_intensities_from_annual_matrix():
+    """log of an embeddable annual matrix gives back the monthly generator"""
+    generator = sample_generator()
+    annual = expm(12 * generator)
+
+    estimated = generator_from_matrix(annual, 12)
+
+    np.testing.assert_allclose(estimated, generator, atol=1e-10)
+    np.testing.assert_allclose(
+        CachedGenerator(estimated).transition_matrix(24), annual @ annual, atol=1e-10
+    )
+
+
+def test_generator_pd_curves_cover_months_within_the_observation_period(db):
+    """Monthly cumulative PDs are positive before month 12 and agree with exp(Q t) per month"""
+    store_matrix(db, expm(12 * sample_generator()), CALIBRATION_DATE)
+    service = TransitionMatrixService()
+
+    cumulative = service.default_probability_curves(db, SEGMENT, 360, method="generator")
+    curves = service.project_pd_curves(db, SEGMENT, 24, method="generator")
+
+    generator = service.get_matrix(db, SEGMENT).generator
+    assert np.all(cumulative[:9, :11] > 0)
+    assert np.all(np.diff(cumulative[:9], axis=1) >= 0)
+    for month in (1, 5, 12, 100, 360):
+        np.testing.assert_allclose(
+            cumulative[:, month - 1], generator.transition_matrix(month)[:, -1], atol=1e-12
+        )
+    assert float(
+        service.calculate_pit_pd(db, "BB", SEGMENT, 6, method="generator")
+    ) == pytest.approx(cumulative[4, 5], abs=1e-12)
+    assert curves["BB"].calculation_method == "generator_matrix"
+    # Discrete matrix powers stay the default
+    assert service.calculate_pit_pd(db, "BB", SEGMENT, 12) == Decimal(
+        str(service.get_matrix(db, SEGMENT).power(1)[4, -1])
+    )
+    assert curves["BB"].cumulative_pd[12] == Decimal(str(cumulative[4, 11]))
+
+    fallback = CachedGenerator(generator.generator)
+    fallback._eigen = None
+    np.testing.assert_allclose(
+        fallback.default_probabilities(np.arange(1, 361), 9), cumulative, atol=1e-10
+    )
+
+
+def test_duration_based_generator_estimate():
+    """Intensities are jumps per month spent in the starting rating"""
+    history = pd.DataFrame(
+        {
+            "customer_id": ["A", "A", "A", "A", "B", "B"],
+            "rating": ["AAA", "AAA", "AAA", "AA", "AA", "D"],
+            "rating_date": [date(2020, 1, 1) + timedelta(days=30 * m) for m in (0, 1, 2, 3)]
+            + [date(2020, 1, 1), date(2020, 1, 1) + timedelta(days=60)],
+        }
+    )
+
+    estimate = TransitionMatrixService().estimate_generator(history)
+
+    q = estimate.generator
+    assert q[0, 1] == pytest.approx(1 / 3)
+    assert q[1, 9] == pytest.approx(1 / 2)
+    np.testing.assert_allclose(q.sum(axis=1), 0.0, atol=1e-12)
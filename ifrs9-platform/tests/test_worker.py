@@ -0,0 +1,131 @@
+"""
+Unit tests for the ECL queue worker.
+
+Tests cover:
+- Batched processing and acknowledgement
+- Retry counting and routing to the dead-letter queue
+"""
+
+import json
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.models import (
+    Base,
+    Customer,
+    CustomerType,
+    FinancialInstrument,
+    InstrumentType,
+    Stage,
+    ECLCalculation,
+)
+from src.services.worker import (
+    ECLWorker,
+    Delivery,
+    RETRY_COUNT_HEADER,
+    ECL_QUEUE,
+    DEAD_LETTER_QUEUE,
+)
+
+
+class FakeChannel:
+    """Records acks and publishes instead of talking to RabbitMQ"""
+
+    def __init__(self):
+        self.acked = []
+        self.published = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, body, properties.headers))
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'worker.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        Customer(customer_id="CUST001", customer_name="Customer", customer_type=CustomerType.RETAIL)
+    )
+    for i in range(3):
+        db.add(
+            FinancialInstrument(
+                instrument_id=f"INST{i}",
+                instrument_type=InstrumentType.TERM_LOAN,
+                customer_id="CUST001",
+                origination_date=date(2024, 1, 1),
+                maturity_date=date(2029, 1, 1),
+                principal_amount=Decimal("100000.00"),
+                interest_rate=Decimal("12.0"),
+                current_stage=Stage.STAGE_1,
+            )
+        )
+    db.commit()
+    db.close()
+    yield url
+    engine.dispose()
+
+
+def delivery(tag, message, retry_count=None):
+    headers = {RETRY_COUNT_HEADER: retry_count} if retry_count is not None else None
+    return Delivery(tag, SimpleNamespace(headers=headers), json.dumps(message).encode())
+
+
+def test_batch_is_processed_and_acknowledged(database_url):
+    """Successful messages are acked and their results stored"""
+    worker = ECLWorker(database_url=database_url, processes=0)
+    worker.start()
+    channel = FakeChannel()
+
+    worker.handle_batch(
+        channel,
+        [
+            delivery(
+                1,
+                {
+                    "type": "ecl_batch",
+                    "instrument_ids": ["INST0", "INST1"],
+                    "reporting_date": "2025-12-31",
+                },
+            ),
+            delivery(
+                2,
+                {"type": "ecl_batch", "instrument_ids": ["INST2"], "reporting_date": "2025-12-31"},
+            ),
+        ],
+    )
+
+    assert channel.acked == [1, 2]
+    assert channel.published == []
+    db = sessionmaker(bind=create_engine(database_url))()
+    assert db.query(ECLCalculation).count() == 3
+    db.close()
+
+
+def test_failed_message_is_retried_then_dead_lettered(database_url):
+    """Failures are republished with an incremented retry count until max_retries"""
+    worker = ECLWorker(database_url=database_url, processes=0, max_retries=2)
+    worker.start()
+    channel = FakeChannel()
+
+    worker.handle_batch(
+        channel,
+        [
+            delivery(1, {"type": "unknown"}),
+            delivery(2, {"type": "unknown"}, retry_count=2),
+            Delivery(3, SimpleNamespace(headers=None), b"not json"),
+        ],
+    )
+
+    assert channel.acked == [1, 2, 3]
+    routes = [(queue, headers[RETRY_COUNT_HEADER]) for queue, _, headers in channel.published]
+    assert routes == [(ECL_QUEUE, 1), (DEAD_LETTER_QUEUE, 2), (DEAD_LETTER_QUEUE, 0)]